@@ -0,0 +1,7 @@
+"""Host-side tooling for RescueNet Pro.
+
+These modules run on a laptop or build server, not on the phones. They read
+the logcat captures produced by ``capture_logs.ps1`` / ``scripts/logcat_filter.bat``
+and re-implement the parts of the mesh stack that need to be measured at
+a scale the app itself cannot reach.
+"""
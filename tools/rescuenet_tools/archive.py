@@ -0,0 +1,662 @@
+"""Columnar archive of field captures, and queries across every session.
+
+Each test session leaves a pair of UTF-16 logcat captures behind, and
+questions across sessions ("connect() failure codes per device over the
+last month") otherwise mean re-parsing every text file. ``ingest``
+converts each capture once into an append-only archive file. ``query``
+then reads only the columns and row groups it needs, from a memory map.
+
+Layout, framed like :mod:`rescuenet_tools.colfile`::
+
+    b'RNARC1\\n'
+    block*    [kind:1][payload length:u32][CRC32 of payload:u32][payload]
+
+``D``
+    JSON: values newly added to the ``level``, ``tag`` and ``device``
+    dictionaries. A value's code is its position in the concatenated list.
+``C``
+    one zlib-compressed column chunk of a row group. ``ts`` holds epoch
+    milliseconds, delta-encoded as int64. ``level``, ``tag`` and
+    ``device`` are uint16 dictionary codes, ``pid`` is int32, and
+    ``message`` is the UTF-8 messages joined by newlines.
+``G``
+    JSON index entry of one row group: its session, row count, time range,
+    the tag and level codes present, and the offset of each chunk.
+``S``
+    JSON session record, written after the session's groups: the source
+    file, its content hash, the device label and the time range.
+
+A row group belongs to one session. Its time range and tag set are the
+time index. A query skips a group whose range misses the window or that
+lacks every requested tag, without decompressing anything. Blocks after
+the last ``S`` (a crash mid-ingest) are ignored and truncated by the next
+ingest, so a session is archived completely or not at all. Re-ingesting a
+capture with the same content is a no-op.
+
+Usage::
+
+    python -m rescuenet_tools.archive ingest captures.rna ../d1_*.txt ../d2_*.txt
+    python -m rescuenet_tools.archive ingest captures.rna ../device1_oppo_logs.txt --device "OPPO A78 5G"
+    python -m rescuenet_tools.archive query captures.rna --tag ConnectionManager \\
+        --contains "connect() returned" --extract "returned (\\w+)" --count-by device
+    python -m rescuenet_tools.archive sessions captures.rna
+    python -m rescuenet_tools.archive bench ../*.txt --copies 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import mmap
+import os
+import re
+import sys
+import tempfile
+import time
+import zlib
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Iterator, Sequence
+
+from .colfile import BLOCK
+from .logcat import LogEvent, format_clock, iter_events, parse_clock
+
+MAGIC = b'RNARC1\n'
+GROUP_ROWS = 16384
+DICT_COLUMNS = ('level', 'tag', 'device')
+COLUMNS = ('ts', 'level', 'tag', 'pid', 'device', 'message')
+
+# Words in a capture's file name that identify the phone.
+_MODELS = {'oppo': 'OPPO', 'redmi': 'Redmi', 'samsung': 'Samsung', 'pixel': 'Pixel', 'vivo': 'vivo'}
+_STEM = re.compile(r'^(d\d+|device\d+)')
+
+
+def device_label(path: str) -> str:
+    """Device label from a capture's name: a known brand, else its ``d1``/``device1`` prefix."""
+    stem = os.path.splitext(os.path.basename(path))[0].lower()
+    for word, model in _MODELS.items():
+        if word in stem:
+            return model
+    m = _STEM.match(stem)
+    return m.group(1) if m else stem
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _ints(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _pack(values: array) -> bytes:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def encode_chunk(name: str, values: Sequence) -> bytes:
+    if name == 'ts':
+        prev, deltas = 0, array('q')
+        for v in values:
+            deltas.append(v - prev)
+            prev = v
+        raw = _pack(deltas)
+    elif name == 'message':
+        raw = '\n'.join(values).encode('utf-8')
+    elif name == 'pid':
+        raw = _pack(array('i', values))
+    else:
+        raw = _pack(array('H', values))
+    return zlib.compress(raw, 6)
+
+
+def decode_chunk(name: str, payload: bytes) -> list:
+    raw = zlib.decompress(payload)
+    if name == 'ts':
+        return list(itertools.accumulate(_ints('q', raw)))
+    if name == 'message':
+        return raw.decode('utf-8').split('\n')
+    return _ints('i' if name == 'pid' else 'H', raw).tolist()
+
+
+@dataclass
+class Session:
+    id: int
+    source: str
+    digest: str
+    device: str
+    rows: int
+    first_ts: float
+    last_ts: float
+    groups: int
+
+
+@dataclass
+class _Group:
+    session: int
+    rows: int
+    ts_min: int  # epoch ms
+    ts_max: int
+    tags: frozenset[int]
+    levels: frozenset[int]
+    device: int
+    chunks: dict[str, tuple[int, int]]  # column -> (payload offset, length)
+
+
+class Archive:
+    """Read side: dictionaries, sessions and the group index of one archive file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.dictionaries: dict[str, list[str]] = {name: [] for name in DICT_COLUMNS}
+        self.sessions: list[Session] = []
+        self.groups: list[_Group] = []
+        self.end = len(MAGIC)  # offset after the last complete session
+        self.chunks_read = 0
+        self._file = open(path, 'rb')
+        size = os.path.getsize(path)
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a capture archive')
+        self._load()
+
+    def _load(self) -> None:
+        data, pos, size = self._map, len(MAGIC), len(self._map)
+        pending_dicts: list[dict] = []
+        pending_groups: list[_Group] = []
+        while pos + BLOCK.size <= size:
+            kind, length, crc = BLOCK.unpack_from(data, pos)
+            start = pos + BLOCK.size
+            stop = start + length
+            if stop > size:
+                break
+            if kind != b'C':
+                payload = data[start:stop]
+                if zlib.crc32(payload) != crc:
+                    break
+                if kind == b'D':
+                    pending_dicts.append(json.loads(payload))
+                elif kind == b'G':
+                    g = json.loads(payload)
+                    pending_groups.append(_Group(
+                        g['session'], g['rows'], g['ts'][0], g['ts'][1], frozenset(g['tags']),
+                        frozenset(g['levels']), g['device'], {k: tuple(v) for k, v in g['chunks'].items()}))
+                elif kind == b'S':
+                    s = json.loads(payload)
+                    for added in pending_dicts:
+                        for name, values in added.items():
+                            self.dictionaries[name].extend(values)
+                    self.groups.extend(pending_groups)
+                    self.sessions.append(Session(**s))
+                    pending_dicts, pending_groups = [], []
+                    self.end = stop
+            pos = stop
+        self._codes = {name: {v: i for i, v in enumerate(values)} for name, values in self.dictionaries.items()}
+
+    def close(self) -> None:
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> Archive:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    @property
+    def rows(self) -> int:
+        return sum(s.rows for s in self.sessions)
+
+    def _chunk(self, group: _Group, name: str) -> list:
+        offset, length = group.chunks[name]
+        self.chunks_read += 1
+        return decode_chunk(name, self._map[offset:offset + length])
+
+    def _codes_for(self, name: str, values: Iterable[str] | None) -> frozenset[int] | None:
+        if values is None:
+            return None
+        codes = self._codes[name]
+        return frozenset(codes[v] for v in values if v in codes)
+
+    def scan(
+        self,
+        columns: Sequence[str] = COLUMNS,
+        *,
+        since: float | None = None,
+        until: float | None = None,
+        tags: Iterable[str] | None = None,
+        levels: Iterable[str] | None = None,
+        devices: Iterable[str] | None = None,
+        sessions: Iterable[int] | None = None,
+        contains: str | None = None,
+    ) -> Iterator[dict[str, list]]:
+        """Matching rows, one dict of columns per row group.
+
+        Dictionary columns come back decoded and ``ts`` in epoch seconds
+        (the [LogEvent.ts] scale). [since] and [until] are inclusive.
+        Only the chunks of the filter columns and of [columns] are
+        decompressed, and only for groups the index cannot rule out.
+        """
+        for name in columns:
+            if name not in COLUMNS:
+                raise ValueError(f'unknown column {name!r}; have {", ".join(COLUMNS)}')
+        tag_codes = self._codes_for('tag', tags)
+        level_codes = self._codes_for('level', levels)
+        device_codes = self._codes_for('device', devices)
+        session_ids = frozenset(sessions) if sessions is not None else None
+        lo = None if since is None else round(since * 1000)
+        hi = None if until is None else round(until * 1000)
+        for group in self.groups:
+            if session_ids is not None and group.session not in session_ids:
+                continue
+            if device_codes is not None and group.device not in device_codes:
+                continue
+            if lo is not None and group.ts_max < lo or hi is not None and group.ts_min > hi:
+                continue
+            if tag_codes is not None and not tag_codes & group.tags:
+                continue
+            if level_codes is not None and not level_codes & group.levels:
+                continue
+            loaded: dict[str, list] = {}
+            keep: list[int] | None = None  # row numbers that passed so far
+
+            def column(name: str) -> list:
+                if name not in loaded:
+                    loaded[name] = self._chunk(group, name)
+                return loaded[name]
+
+            def narrow(name: str, test) -> None:
+                nonlocal keep
+                values = column(name)
+                rows = range(group.rows) if keep is None else keep
+                keep = [i for i in rows if test(values[i])]
+
+            if tag_codes is not None and not group.tags <= tag_codes:
+                narrow('tag', tag_codes.__contains__)
+            if level_codes is not None and not group.levels <= level_codes:
+                narrow('level', level_codes.__contains__)
+            if lo is not None and group.ts_min < lo or hi is not None and group.ts_max > hi:
+                low = -2**63 if lo is None else lo
+                high = 2**63 if hi is None else hi
+                narrow('ts', lambda t: low <= t <= high)
+            if contains is not None and keep != []:
+                narrow('message', lambda m: contains in m)
+            if keep == []:
+                continue
+            out = {}
+            for name in columns:
+                if name == 'device':
+                    values = [group.device] * group.rows if keep is None else [group.device] * len(keep)
+                else:
+                    values = column(name)
+                    if keep is not None:
+                        values = [values[i] for i in keep]
+                if name in DICT_COLUMNS:
+                    names = self.dictionaries[name]
+                    values = [names[c] for c in values]
+                elif name == 'ts':
+                    values = [t / 1000 for t in values]
+                out[name] = values
+            yield out
+
+    def events(self, **filters) -> Iterator[LogEvent]:
+        """[scan] as [LogEvent]s (offsets are not kept)."""
+        for group in self.scan(('ts', 'level', 'tag', 'pid', 'message'), **filters):
+            for ts, level, tag, pid, message in zip(*group.values()):
+                yield LogEvent(ts, level, tag, pid, message)
+
+    def count(self, by: Sequence[str], extract: str | None = None, **filters) -> Counter:
+        """Rows per value of the [by] columns, plus [extract]'s first group if given."""
+        pattern = re.compile(extract) if extract else None
+        columns = list(by) + (['message'] if pattern is not None and 'message' not in by else [])
+        counts: Counter = Counter()
+        for group in self.scan(columns, **filters):
+            keys = [group[name] for name in by]
+            if pattern is None:
+                counts.update(zip(*keys))
+                continue
+            for row, message in zip(zip(*keys) if keys else itertools.repeat(()), group['message']):
+                m = pattern.search(message)
+                if m:
+                    counts[row + (m.group(1) if m.groups() else m.group(0),)] += 1
+        return counts
+
+
+class ArchiveWriter:
+    """Appends sessions; opening truncates any incomplete session at the end."""
+
+    def __init__(self, path: str, group_rows: int = GROUP_ROWS) -> None:
+        if group_rows < 1:
+            raise ValueError(f'need group_rows >= 1, got {group_rows}')
+        self.path = path
+        self.group_rows = group_rows
+        self.recovered_bytes = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with Archive(path) as archive:
+                self.dictionaries = {k: list(v) for k, v in archive.dictionaries.items()}
+                self.digests = {s.digest for s in archive.sessions}
+                self.next_session = len(archive.sessions)
+                end = archive.end
+            self.recovered_bytes = os.path.getsize(path) - end
+            self._f = open(path, 'r+b')
+            self._f.truncate(end)
+            self._f.seek(end)
+        else:
+            self.dictionaries = {name: [] for name in DICT_COLUMNS}
+            self.digests = set()
+            self.next_session = 0
+            self._f = open(path, 'wb')
+            self._f.write(MAGIC)
+        self._codes = {name: {v: i for i, v in enumerate(values)} for name, values in self.dictionaries.items()}
+
+    def _block(self, kind: bytes, payload: bytes) -> int:
+        """Writes one block; returns the offset of its payload."""
+        self._f.write(BLOCK.pack(kind, len(payload), zlib.crc32(payload)))
+        offset = self._f.tell()
+        self._f.write(payload)
+        return offset
+
+    def _code(self, name: str, value: str, added: dict[str, list[str]]) -> int:
+        codes = self._codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            if code > 0xFFFF:
+                raise ValueError(f'more than 65536 distinct {name} values')
+            self.dictionaries[name].append(value)
+            added.setdefault(name, []).append(value)
+        return code
+
+    def add_session(self, events: Iterable[LogEvent], source: str, device: str,
+                    digest: str | None = None) -> Session | None:
+        """Archives one capture's [events]; None if empty or [digest] is archived already."""
+        if digest is not None and digest in self.digests:
+            return None
+        session = self.next_session
+        start = self._f.tell()
+        added: dict[str, list[str]] = {}
+        device_code = self._code('device', device, added)
+        rows = groups = 0
+        first = last = None
+        batch: list[LogEvent] = []
+
+        def flush() -> None:
+            nonlocal groups, first, last
+            ts = [round(e.ts * 1000) for e in batch]
+            columns = {
+                'ts': ts,
+                'level': [level_code(e.level) for e in batch],
+                'tag': [tag_code(e.tag) for e in batch],
+                'pid': [e.pid for e in batch],
+                'message': [e.message.replace('\n', ' ') for e in batch],
+            }
+            if added:  # codes first seen in this group
+                self._block(b'D', json.dumps(added).encode('utf-8'))
+                added.clear()
+            chunks = {}
+            for name, values in columns.items():
+                payload = encode_chunk(name, values)
+                chunks[name] = [self._block(b'C', payload), len(payload)]
+            ts_min, ts_max = min(ts), max(ts)
+            first = ts_min if first is None else min(first, ts_min)
+            last = ts_max if last is None else max(last, ts_max)
+            index = {'session': session, 'rows': len(batch), 'ts': [ts_min, ts_max],
+                     'tags': sorted(set(columns['tag'])), 'levels': sorted(set(columns['level'])),
+                     'device': device_code, 'chunks': chunks}
+            self._block(b'G', json.dumps(index).encode('utf-8'))
+            groups += 1
+
+        def level_code(value: str) -> int:
+            return self._code('level', value, added)
+
+        def tag_code(value: str) -> int:
+            return self._code('tag', value, added)
+
+        for event in events:
+            batch.append(event)
+            rows += 1
+            if len(batch) >= self.group_rows:
+                flush()
+                batch = []
+        if batch:
+            flush()
+        if rows == 0:
+            self._f.truncate(start)
+            self._f.seek(start)
+            # Forget codes that were only added for this session.
+            for name, values in self.dictionaries.items():
+                del values[len(values) - len(added.get(name, [])):]
+                self._codes[name] = {v: i for i, v in enumerate(values)}
+            return None
+        record = Session(session, os.path.basename(source), digest or '', device, rows,
+                         first / 1000, last / 1000, groups)
+        self._block(b'S', json.dumps(record.__dict__).encode('utf-8'))
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self.next_session += 1
+        if digest:
+            self.digests.add(digest)
+        return record
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> ArchiveWriter:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def capture_year(path: str) -> int:
+    """logcat omits the year; take it from the file's modification time."""
+    return datetime.fromtimestamp(os.path.getmtime(path)).year
+
+
+def ingest(archive_path: str, captures: Sequence[str], device: str | None = None,
+           year: int | None = None, group_rows: int = GROUP_ROWS) -> list[tuple[str, Session | None]]:
+    """Archives each capture once; already-archived or empty captures map to None."""
+    results = []
+    with ArchiveWriter(archive_path, group_rows) as writer:
+        for path in captures:
+            digest = file_digest(path)
+            if digest in writer.digests:
+                results.append((path, None))
+                continue
+            events = iter_events(path, year=year or capture_year(path))
+            results.append((path, writer.add_session(events, path, device or device_label(path), digest)))
+    return results
+
+
+def text_scan(captures: Sequence[str], tag: str | None, contains: str | None,
+              extract: str | None, year: int | None = None) -> Counter:
+    """The same count as ``query --count-by device`` by re-parsing the text captures."""
+    pattern = re.compile(extract) if extract else None
+    counts: Counter = Counter()
+    for path in captures:
+        label = device_label(path)
+        for event in iter_events(path, tags=[tag] if tag else None, year=year or capture_year(path)):
+            if contains is not None and contains not in event.message:
+                continue
+            if pattern is None:
+                counts[(label,)] += 1
+            elif m := pattern.search(event.message):
+                counts[(label, m.group(1) if m.groups() else m.group(0))] += 1
+    return counts
+
+
+def benchmark(captures: Sequence[str], copies: int, tag: str, contains: str, extract: str) -> dict:
+    """Query time on an archive of [copies] day-shifted copies of [captures] vs. re-parsing text.
+
+    Parsing is measured once over [captures] and scaled by [copies].
+    """
+    t0 = time.perf_counter()
+    parsed = [(path, list(iter_events(path, year=capture_year(path)))) for path in captures]
+    parse_s = time.perf_counter() - t0
+    text_bytes = sum(os.path.getsize(p) for p in captures)
+    events = sum(len(e) for _, e in parsed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.rna')
+        t0 = time.perf_counter()
+        with ArchiveWriter(path) as writer:
+            for copy in range(copies):
+                shift = copy * 86400.0
+                for source, evs in parsed:
+                    writer.add_session((LogEvent(e.ts + shift, e.level, e.tag, e.pid, e.message) for e in evs),
+                                       f'{copy}/{source}', device_label(source))
+        write_s = time.perf_counter() - t0
+        size = os.path.getsize(path)
+        t0 = time.perf_counter()
+        with Archive(path) as archive:
+            open_s = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            counts = archive.count(['device'], extract, tags=[tag], contains=contains)
+            query_s = time.perf_counter() - t0
+            last_day = archive.sessions[-1].last_ts - 86400
+            t0 = time.perf_counter()
+            recent = sum(len(g['ts']) for g in archive.scan(['ts'], since=last_day))
+            window_s = time.perf_counter() - t0
+            stats = {'groups': len(archive.groups), 'chunks_read': archive.chunks_read}
+    t0 = time.perf_counter()
+    expected = text_scan(captures, tag, contains, extract)
+    text_query_s = time.perf_counter() - t0
+    if counts != Counter({k: v * copies for k, v in expected.items()}):
+        raise AssertionError('archive and text scan disagree')
+    return {
+        'captures': len(captures),
+        'copies': copies,
+        'events': events * copies,
+        'text_bytes': text_bytes * copies,
+        'archive_bytes': size,
+        'ingest_events_per_s': events * copies / (parse_s * copies + write_s),
+        'open_s': open_s,
+        'query_s': query_s,
+        'window_query_s': window_s,
+        'window_rows': recent,
+        'text_query_s': text_query_s * copies,  # extrapolated from one pass
+        'matches': sum(counts.values()),
+        **stats,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.archive',
+        description='Columnar archive of logcat captures and queries across sessions.',
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('ingest', help='archive captures (each file once)')
+    p.add_argument('archive')
+    p.add_argument('captures', nargs='+')
+    p.add_argument('--device', help='device label for these captures (default: from the file name)')
+    p.add_argument('--year', type=int, help='year of the captures (default: file modification time)')
+    p.add_argument('--group-rows', type=int, default=GROUP_ROWS)
+
+    p = sub.add_parser('sessions', help='list archived sessions')
+    p.add_argument('archive')
+
+    p = sub.add_parser('query', help='print or count matching rows')
+    p.add_argument('archive')
+    p.add_argument('--tag', action='append', help='repeatable')
+    p.add_argument('--level', action='append', help='repeatable')
+    p.add_argument('--device', action='append', help='repeatable')
+    p.add_argument('--session', type=int, action='append', help='repeatable')
+    p.add_argument('--since', help='"MM-DD HH:MM[:SS]"')
+    p.add_argument('--until', help='"MM-DD HH:MM[:SS]"')
+    p.add_argument('--year', type=int)
+    p.add_argument('--contains', help='substring the message must contain')
+    p.add_argument('--count-by', help='comma-separated columns, e.g. device,tag')
+    p.add_argument('--extract', help='regex; counts per first group (with --count-by)')
+    p.add_argument('--limit', type=int, default=0, help='max rows to print')
+
+    p = sub.add_parser('bench', help='archive query vs. re-parsing text')
+    p.add_argument('captures', nargs='+')
+    p.add_argument('--copies', type=int, default=100, help='day-shifted copies of the captures to archive')
+    p.add_argument('--tag', default='ConnectionManager')
+    p.add_argument('--contains', default='connect() returned')
+    p.add_argument('--extract', default=r'returned (\w+)')
+    p.add_argument('--json', action='store_true')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'ingest':
+        try:
+            results = ingest(args.archive, args.captures, args.device, args.year, args.group_rows)
+        except ValueError as e:
+            parser.error(str(e))
+        for path, session in results:
+            if session is None:
+                print(f'{path}: skipped (already archived or no logcat lines)')
+            else:
+                print(f'{path}: session {session.id}, {session.device}, {session.rows} rows, '
+                      f'{format_clock(session.first_ts)} .. {format_clock(session.last_ts)}')
+        return 0
+
+    if args.command == 'bench':
+        report = benchmark(args.captures, args.copies, args.tag, args.contains, args.extract)
+        if args.json:
+            print(json.dumps(report, indent=2))
+            return 0
+        print(f'{report["events"]} events from {report["captures"]} captures x {report["copies"]}: '
+              f'{report["text_bytes"] / 2**20:.1f} MiB text -> {report["archive_bytes"] / 2**20:.1f} MiB archive '
+              f'({report["groups"]} row groups), ingest {report["ingest_events_per_s"]:.0f} events/s')
+        print(f'count by device of {args.tag!r} containing {args.contains!r}: {report["matches"]} matches')
+        print(f'  archive {report["query_s"] * 1000:.1f} ms (+ open {report["open_s"] * 1000:.1f} ms, '
+              f'{report["chunks_read"]} chunks decompressed in total)')
+        print(f'  text re-parse {report["text_query_s"]:.1f} s (one pass measured, x {report["copies"]})')
+        print(f'  last-day window: {report["window_rows"]} rows in {report["window_query_s"] * 1000:.1f} ms')
+        return 0
+
+    try:
+        archive = Archive(args.archive)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    with archive:
+        if args.command == 'sessions':
+            for s in archive.sessions:
+                print(f'{s.id:>4} {s.device:<12} {s.rows:>8} rows  {format_clock(s.first_ts)} .. '
+                      f'{format_clock(s.last_ts)}  {s.source}')
+            return 0
+        try:
+            filters = {
+                'tags': args.tag, 'levels': args.level, 'devices': args.device, 'sessions': args.session,
+                'since': parse_clock(args.since, args.year) if args.since else None,
+                'until': parse_clock(args.until, args.year) if args.until else None,
+                'contains': args.contains,
+            }
+            if args.count_by or args.extract:
+                by = [c.strip() for c in args.count_by.split(',')] if args.count_by else []
+                counts = archive.count(by, args.extract, **filters)
+                for key, n in counts.most_common():
+                    print(f'{n:>8}  {"  ".join(str(k) for k in key)}')
+                return 0
+            printed = 0
+            for event in archive.events(**filters):
+                print(f'{format_clock(event.ts)} {event.level}/{event.tag}({event.pid}): {event.message}')
+                printed += 1
+                if args.limit and printed >= args.limit:
+                    break
+        except (ValueError, re.error) as e:
+            parser.error(str(e))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,560 @@
+"""Group-owner-side discovery of the P2P client's IP address.
+
+``ConnectionManager.resolveClientIpFromGroup`` waits 4 s for DHCP, reads
+``/proc/net/arp``, then retries the ARP read 3 times 2 s apart. Only after
+that does it run ``discoverP2pClientIp``: ``isReachable(500)`` over
+192.168.49.2-254 in serial batches of 25, up to about 5 s. This module
+races four sources instead and returns the first hit:
+
+``arp``
+    polls ``/proc/net/arp`` for a *complete* entry (flags 0x2) in the
+    subnet. The Kotlin reader also accepts incomplete (0x0) entries, which
+    are left over from failed lookups.
+``leases``
+    polls the dnsmasq lease file, newest lease first.
+``ping``
+    sends one ICMP echo to the subnet broadcast address every
+    [BROADCAST_INTERVAL_S]. Linux and Android ignore broadcast echoes by
+    default (``icmp_echo_ignore_broadcasts``), so this strategy usually
+    depends on the peer's settings.
+``connect``
+    opens a TCP connection to every candidate's mesh port at once. The
+    first connect or RST wins and the other attempts are cancelled. The
+    SYNs also make the kernel ARP for every address, which is what fills
+    the table the ``arp`` strategy reads.
+
+``legacy`` reimplements the current batched scan as the baseline. When
+``isReachable`` is not root, it falls back to TCP port 7, and a refused
+connection counts as reachable.
+
+The ``harness`` and ``bench`` commands (root, Linux) build a veth pair
+between two network namespaces and time each strategy from the moment
+the client gets its address:
+
+Usage::
+
+    python -m rescuenet_tools.clientip discover --timeout 5
+    sudo python -m rescuenet_tools.clientip bench --trials 20
+    sudo python -m rescuenet_tools.clientip bench --join-delay-ms 300 --arp-inject --answer-broadcast
+    sudo python -m rescuenet_tools.clientip harness down
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import ipaddress
+import json
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable, Sequence
+
+from .stats import summarize
+
+GO_ADDRESS = '192.168.49.1'
+P2P_NETWORK = ipaddress.ip_network('192.168.49.0/24')
+MESH_PORT = 8888
+
+ARP_PATH = '/proc/net/arp'
+LEASES_PATH = '/data/misc/dhcp/dnsmasq.leases'
+ARP_COMPLETE = 0x2
+
+POLL_S = 0.02
+BROADCAST_INTERVAL_S = 0.5
+CONNECT_TIMEOUT_S = 1.0
+
+# discoverP2pClientIp
+LEGACY_BATCH = 25
+LEGACY_TIMEOUT_S = 0.5
+LEGACY_PORT = 7  # java.net.InetAddress.isReachable without ICMP privileges
+
+STRATEGIES = ('arp', 'leases', 'ping', 'connect')
+
+
+@dataclass(frozen=True)
+class ArpEntry:
+    ip: str
+    flags: int
+    mac: str
+    device: str
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.flags & ARP_COMPLETE) and self.mac != '00:00:00:00:00:00'
+
+
+@dataclass(frozen=True)
+class Lease:
+    expiry: int  # epoch seconds, 0 = infinite
+    mac: str
+    ip: str
+    hostname: str
+
+
+@dataclass(frozen=True)
+class Discovery:
+    ip: str
+    strategy: str
+    elapsed_s: float
+
+
+def parse_arp(text: str) -> list[ArpEntry]:
+    """Rows of ``/proc/net/arp``; the header and malformed lines are skipped."""
+    entries = []
+    for line in text.splitlines()[1:]:
+        parts = line.split()
+        if len(parts) < 6:
+            continue
+        try:
+            flags = int(parts[2], 16)
+        except ValueError:
+            continue
+        entries.append(ArpEntry(parts[0], flags, parts[3].lower(), parts[5]))
+    return entries
+
+
+def parse_leases(text: str) -> list[Lease]:
+    """dnsmasq lease lines (``expiry mac ip hostname client-id``), newest first.
+
+    dnsmasq writes the expiry time rather than the grant time. With one lease
+    length, the latest expiry is the most recent client.
+    """
+    leases = []
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) < 4 or not parts[0].isdigit():
+            continue
+        leases.append(Lease(int(parts[0]), parts[1].lower(), parts[2], parts[3]))
+    return sorted(leases, key=lambda lease: lease.expiry or float('inf'), reverse=True)
+
+
+def candidates(network=P2P_NETWORK, exclude: Iterable[str] = (GO_ADDRESS,)) -> list[str]:
+    excluded = set(exclude)
+    return [str(ip) for ip in ipaddress.ip_network(network).hosts() if str(ip) not in excluded]
+
+
+def _read(path: str) -> str:
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def _wanted(ip: str, network, exclude: Iterable[str]) -> bool:
+    try:
+        return ipaddress.ip_address(ip) in network and ip not in exclude
+    except ValueError:
+        return False
+
+
+def arp_hit(text: str, network=P2P_NETWORK, exclude: Sequence[str] = (GO_ADDRESS,),
+            mac: str | None = None) -> str | None:
+    """First complete ARP entry in [network]; the entry for [mac] if there is one."""
+    network = ipaddress.ip_network(network)
+    hits = [e for e in parse_arp(text) if e.complete and _wanted(e.ip, network, exclude)]
+    if mac:
+        for entry in hits:
+            if entry.mac == mac.lower():
+                return entry.ip
+    return hits[0].ip if hits else None
+
+
+def lease_hit(text: str, network=P2P_NETWORK, exclude: Sequence[str] = (GO_ADDRESS,),
+              now: float | None = None) -> str | None:
+    network = ipaddress.ip_network(network)
+    now = time.time() if now is None else now
+    for lease in parse_leases(text):
+        if (lease.expiry == 0 or lease.expiry > now) and _wanted(lease.ip, network, exclude):
+            return lease.ip
+    return None
+
+
+async def from_arp(network=P2P_NETWORK, exclude: Sequence[str] = (GO_ADDRESS,), *,
+                   path: str = ARP_PATH, mac: str | None = None, poll_s: float = POLL_S) -> str:
+    while True:
+        ip = arp_hit(_read(path), network, exclude, mac)
+        if ip:
+            return ip
+        await asyncio.sleep(poll_s)
+
+
+async def from_leases(network=P2P_NETWORK, exclude: Sequence[str] = (GO_ADDRESS,), *,
+                      path: str = LEASES_PATH, poll_s: float = POLL_S) -> str:
+    while True:
+        ip = lease_hit(_read(path), network, exclude)
+        if ip:
+            return ip
+        await asyncio.sleep(poll_s)
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _echo_request(ident: int, seq: int) -> bytes:
+    body = b'rescuenet'
+    header = struct.pack('!BBHHH', 8, 0, 0, ident, seq)
+    return struct.pack('!BBHHH', 8, 0, _checksum(header + body), ident, seq) + body
+
+
+def _icmp_socket() -> tuple[socket.socket, bool]:
+    """Unprivileged ICMP datagram socket where allowed, raw socket otherwise."""
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        raw = False
+    except PermissionError:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        raw = True
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sock.setblocking(False)
+    return sock, raw
+
+
+async def from_broadcast_ping(network=P2P_NETWORK, exclude: Sequence[str] = (GO_ADDRESS,), *,
+                              interval_s: float = BROADCAST_INTERVAL_S) -> str:
+    """First echo reply from [network]; raises PermissionError without ICMP access."""
+    network = ipaddress.ip_network(network)
+    loop = asyncio.get_running_loop()
+    sock, raw = _icmp_socket()
+    ident = os.getpid() & 0xFFFF
+
+    async def send() -> None:
+        seq = 0
+        while True:
+            await loop.sock_sendto(sock, _echo_request(ident, seq), (str(network.broadcast_address), 0))
+            seq += 1
+            await asyncio.sleep(interval_s)
+
+    sender = asyncio.ensure_future(send())
+    try:
+        while True:
+            data, (source, _) = await loop.sock_recvfrom(sock, 2048)
+            if raw:
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 8 or data[0] != 0:
+                continue
+            # The kernel rewrites the id of datagram ICMP sockets.
+            if raw and struct.unpack_from('!H', data, 4)[0] != ident:
+                continue
+            if _wanted(source, network, exclude):
+                return source
+    finally:
+        sender.cancel()
+        sock.close()
+
+
+async def _probe(host: str, port: int, timeout_s: float, refused_is_alive: bool) -> str | None:
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout_s)
+    except ConnectionRefusedError:
+        return host if refused_is_alive else None
+    except (OSError, asyncio.TimeoutError):
+        return None
+    writer.close()
+    return host
+
+
+async def probe_round(hosts: Sequence[str], port: int = MESH_PORT, timeout_s: float = CONNECT_TIMEOUT_S,
+                      refused_is_alive: bool = True) -> str | None:
+    """Connects to all [hosts] at once; the first to answer wins and the rest are cancelled."""
+    tasks = [asyncio.ensure_future(_probe(h, port, timeout_s, refused_is_alive)) for h in hosts]
+    try:
+        for future in asyncio.as_completed(tasks):
+            host = await future
+            if host:
+                return host
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def from_connect_probe(hosts: Sequence[str], port: int = MESH_PORT, *,
+                             timeout_s: float = CONNECT_TIMEOUT_S, refused_is_alive: bool = True,
+                             pause_s: float = POLL_S) -> str:
+    """Repeats [probe_round] until a host answers (the client may not have its address yet)."""
+    while True:
+        host = await probe_round(hosts, port, timeout_s, refused_is_alive)
+        if host:
+            return host
+        await asyncio.sleep(pause_s)
+
+
+async def legacy_scan(hosts: Sequence[str], *, batch: int = LEGACY_BATCH,
+                      timeout_s: float = LEGACY_TIMEOUT_S, port: int = LEGACY_PORT) -> str | None:
+    """``discoverP2pClientIp``: every batch waits for all of its probes."""
+    for start in range(0, len(hosts), batch):
+        results = await asyncio.gather(*(_probe(h, port, timeout_s, True)
+                                         for h in hosts[start:start + batch]))
+        found = [r for r in results if r]
+        if found:
+            return found[0]
+    return None
+
+
+def strategy(name: str, network=P2P_NETWORK, exclude: Sequence[str] = (GO_ADDRESS,), *,
+             port: int = MESH_PORT, arp_path: str = ARP_PATH,
+             leases_path: str = LEASES_PATH) -> Callable[[], Awaitable[str | None]]:
+    """A zero-argument coroutine factory for one named source (or ``legacy``)."""
+    network = ipaddress.ip_network(network)
+    exclude = tuple(exclude)
+    hosts = candidates(network, exclude)
+    factories = {
+        'arp': lambda: from_arp(network, exclude, path=arp_path),
+        'leases': lambda: from_leases(network, exclude, path=leases_path),
+        'ping': lambda: from_broadcast_ping(network, exclude),
+        'connect': lambda: from_connect_probe(hosts, port),
+        'legacy': lambda: legacy_scan(hosts),
+    }
+    if name not in factories:
+        raise ValueError(f'unknown strategy {name!r}')
+    return factories[name]
+
+
+async def race(factories: dict[str, Callable[[], Awaitable[str | None]]],
+               timeout_s: float) -> Discovery | None:
+    """Runs every source at once and returns the first answer.
+
+    A source that fails (for example, ping without ICMP permission) drops
+    out of the race. None means no source answered within [timeout_s].
+    """
+    started = time.perf_counter()
+    tasks = {asyncio.ensure_future(make()): name for name, make in factories.items()}
+    pending = set(tasks)
+    try:
+        deadline = started + timeout_s
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=max(deadline - time.perf_counter(), 0),
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                return None
+            for task in done:
+                if not task.cancelled() and task.exception() is None and task.result():
+                    return Discovery(task.result(), tasks[task], time.perf_counter() - started)
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def discover(network=P2P_NETWORK, exclude: Sequence[str] = (GO_ADDRESS,), *,
+                   strategies: Sequence[str] = STRATEGIES, port: int = MESH_PORT,
+                   timeout_s: float = 10.0, arp_path: str = ARP_PATH,
+                   leases_path: str = LEASES_PATH) -> Discovery | None:
+    return await race({name: strategy(name, network, exclude, port=port, arp_path=arp_path,
+                                      leases_path=leases_path)
+                       for name in strategies}, timeout_s)
+
+
+class Harness:
+    """A GO and a client namespace joined by a veth pair on 192.168.49.0/24.
+
+    The client namespace runs ``wire serve`` on the mesh port. [join]
+    gives the client its address, as DHCP would, and can optionally add
+    the lease line and inject the ARP entry as dnsmasq does.
+    """
+
+    GO_NS = 'rn-go'
+    CLIENT_NS = 'rn-client'
+    GO_IF = 'rn-go0'
+    CLIENT_IF = 'rn-cli0'
+    CLIENT_MAC = '02:52:4e:00:00:02'
+
+    def __init__(self, leases_path: str | None = None) -> None:
+        self.leases_path = leases_path or os.path.join(tempfile.gettempdir(), 'rn-dnsmasq.leases')
+
+    @staticmethod
+    def _ip(*args: str, check: bool = True) -> None:
+        subprocess.run(['ip', *args], check=check, capture_output=True)
+
+    def up(self, answer_broadcast: bool = False) -> None:
+        self.down()
+        self._ip('netns', 'add', self.GO_NS)
+        self._ip('netns', 'add', self.CLIENT_NS)
+        self._ip('link', 'add', self.GO_IF, 'type', 'veth', 'peer', 'name', self.CLIENT_IF)
+        self._ip('link', 'set', self.GO_IF, 'netns', self.GO_NS)
+        self._ip('link', 'set', self.CLIENT_IF, 'netns', self.CLIENT_NS)
+        self._ip('-n', self.CLIENT_NS, 'link', 'set', self.CLIENT_IF, 'address', self.CLIENT_MAC)
+        self._ip('-n', self.GO_NS, 'addr', 'add', f'{GO_ADDRESS}/24', 'brd', '+', 'dev', self.GO_IF)
+        for ns, dev in ((self.GO_NS, self.GO_IF), (self.CLIENT_NS, self.CLIENT_IF)):
+            self._ip('-n', ns, 'link', 'set', 'lo', 'up')
+            self._ip('-n', ns, 'link', 'set', dev, 'up')
+        subprocess.run(['ip', 'netns', 'exec', self.CLIENT_NS, 'sh', '-c',
+                        f'echo {0 if answer_broadcast else 1} > /proc/sys/net/ipv4/icmp_echo_ignore_broadcasts'],
+                       check=True)
+        tools_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        subprocess.Popen(['ip', 'netns', 'exec', self.CLIENT_NS, sys.executable, '-m', 'rescuenet_tools.wire',
+                          'serve', '--host', '0.0.0.0', '--port', str(MESH_PORT)],
+                         cwd=tools_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def down(self) -> None:
+        pids = subprocess.run(['ip', 'netns', 'pids', self.CLIENT_NS], capture_output=True, text=True).stdout
+        for pid in pids.split():
+            try:
+                os.kill(int(pid), 15)
+            except OSError:
+                pass
+        self._ip('netns', 'del', self.GO_NS, check=False)
+        self._ip('netns', 'del', self.CLIENT_NS, check=False)
+
+    def reset(self) -> None:
+        """Client without an address, empty GO neighbour table and lease file."""
+        self._ip('-n', self.CLIENT_NS, 'addr', 'flush', 'dev', self.CLIENT_IF)
+        self._ip('-n', self.GO_NS, 'neigh', 'flush', 'dev', self.GO_IF)
+        with open(self.leases_path, 'w', encoding='utf-8'):
+            pass
+
+    def join(self, ip: str, lease: bool = True, arp_inject: bool = False) -> None:
+        self._ip('-n', self.CLIENT_NS, 'addr', 'add', f'{ip}/24', 'brd', '+', 'dev', self.CLIENT_IF)
+        if lease:
+            with open(self.leases_path, 'a', encoding='utf-8') as f:
+                f.write(f'{int(time.time()) + 3600} {self.CLIENT_MAC} {ip} android-client *\n')
+        if arp_inject:
+            self._ip('-n', self.GO_NS, 'neigh', 'replace', ip, 'lladdr', self.CLIENT_MAC,
+                     'dev', self.GO_IF, 'nud', 'reachable')
+
+
+async def _trial(harness: Harness, name: str, ip: str, join_delay_s: float, timeout_s: float,
+                 arp_inject: bool) -> float | None:
+    """Seconds from the client's join to the first answer; None for a miss or a wrong IP."""
+    harness.reset()
+    names = STRATEGIES if name == 'race' else (name,)
+    factories = {n: strategy(n, leases_path=harness.leases_path) for n in names}
+
+    async def join_later() -> float:
+        await asyncio.sleep(join_delay_s)
+        harness.join(ip, arp_inject=arp_inject)
+        return time.perf_counter()
+
+    started = time.perf_counter()
+    joiner = asyncio.ensure_future(join_later())
+    found = await race(factories, timeout_s + join_delay_s)
+    joined_at = await joiner
+    if found is None or found.ip != ip:
+        return None
+    return max(started + found.elapsed_s - joined_at, 0.0)
+
+
+def bench(trials: int = 20, seed: int = 0, join_delay_s: float = 0.0, timeout_s: float = 8.0,
+          arp_inject: bool = False, strategies: Sequence[str] = (*STRATEGIES, 'race', 'legacy'),
+          leases_path: str | None = None) -> list[dict]:
+    """Runs inside the GO namespace; see ``main``."""
+    harness = Harness(leases_path)
+    rng = random.Random(seed)
+    octets = [rng.randint(2, 254) for _ in range(trials)]
+    rows = []
+    for name in strategies:
+        times = [asyncio.run(_trial(harness, name, f'192.168.49.{o}', join_delay_s, timeout_s, arp_inject))
+                 for o in octets]
+        hits = [t * 1000 for t in times if t is not None]
+        rows.append({'strategy': name, 'trials': trials, 'answered': len(hits),
+                     'ms': summarize(hits)})
+    return rows
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.clientip',
+        description='Find the Wi-Fi Direct client IP on the group owner, and benchmark the sources.',
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    find = sub.add_parser('discover', help='race the sources on this host')
+    find.add_argument('--network', default=str(P2P_NETWORK))
+    find.add_argument('--exclude', action='append', default=[GO_ADDRESS])
+    find.add_argument('--port', type=int, default=MESH_PORT)
+    find.add_argument('--strategies', default=','.join(STRATEGIES))
+    find.add_argument('--arp', default=ARP_PATH)
+    find.add_argument('--leases', default=LEASES_PATH)
+    find.add_argument('--timeout', type=float, default=10.0)
+
+    harness = sub.add_parser('harness', help='create or remove the veth/namespace pair (root)')
+    harness.add_argument('action', choices=('up', 'down'))
+    harness.add_argument('--answer-broadcast', action='store_true')
+
+    bench_cmd = sub.add_parser('bench', help='time each source in the namespace harness (root)')
+    bench_cmd.add_argument('--trials', type=int, default=20)
+    bench_cmd.add_argument('--seed', type=int, default=0)
+    bench_cmd.add_argument('--join-delay-ms', type=float, default=0.0,
+                           help='start discovery this long before the client gets its address')
+    bench_cmd.add_argument('--timeout', type=float, default=8.0)
+    bench_cmd.add_argument('--arp-inject', action='store_true',
+                           help='add the ARP entry at join, as dnsmasq does for unicast DHCP replies')
+    bench_cmd.add_argument('--answer-broadcast', action='store_true',
+                           help='let the client answer broadcast pings (off on Android)')
+    bench_cmd.add_argument('--strategies', default=','.join((*STRATEGIES, 'race', 'legacy')))
+    bench_cmd.add_argument('--keep', action='store_true', help='leave the harness up afterwards')
+    bench_cmd.add_argument('--json', action='store_true')
+    bench_cmd.add_argument('--in-namespace', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.command == 'discover':
+        found = asyncio.run(discover(args.network, args.exclude, strategies=args.strategies.split(','),
+                                     port=args.port, timeout_s=args.timeout, arp_path=args.arp,
+                                     leases_path=args.leases))
+        if found is None:
+            print('no client found', file=sys.stderr)
+            return 1
+        print(f'{found.ip} via {found.strategy} in {found.elapsed_s * 1000:.1f} ms')
+        return 0
+
+    if args.command == 'harness':
+        if args.action == 'up':
+            Harness().up(args.answer_broadcast)
+        else:
+            Harness().down()
+        return 0
+
+    if args.in_namespace:
+        rows = bench(args.trials, args.seed, args.join_delay_ms / 1000, args.timeout, args.arp_inject,
+                     args.strategies.split(','))
+        print(json.dumps(rows))
+        return 0
+
+    # Set up the harness, then re-run this command inside the GO namespace.
+    try:
+        Harness().up(args.answer_broadcast)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f'cannot build the namespace harness (needs root and iproute2): {e}', file=sys.stderr)
+        return 2
+    try:
+        time.sleep(0.5)  # let the client's wire server bind
+        child = subprocess.run(
+            ['ip', 'netns', 'exec', Harness.GO_NS, sys.executable, '-m', 'rescuenet_tools.clientip',
+             *(argv if argv is not None else sys.argv[1:]), '--in-namespace'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            check=True, capture_output=True, text=True)
+    finally:
+        if not args.keep:
+            Harness().down()
+    rows = json.loads(child.stdout)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print(f'{args.trials} trials, join delay {args.join_delay_ms:g} ms, '
+          f'arp inject {"on" if args.arp_inject else "off"}, broadcast echo {"on" if args.answer_broadcast else "off"}')
+    print(f'{"strategy":<10} {"answered":>9} {"p50 ms":>9} {"p95 ms":>9} {"max ms":>9}')
+    for row in rows:
+        ms = row['ms']
+        print(f'{row["strategy"]:<10} {row["answered"]:>4}/{row["trials"]:<4} '
+              f'{ms["p50"]:>9.1f} {ms["p95"]:>9.1f} {ms["max"]:>9.1f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
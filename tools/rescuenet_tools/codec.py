@@ -0,0 +1,391 @@
+"""Compact binary MeshPacket codec, a reference for a second wire format.
+
+Today every hop sends ``MeshPacketModel.entityToJsonString`` as the frame
+body. A JSON body always starts with ``{`` (0x7B). A binary body starts
+with a version byte below 0x7B instead, so one receiver can tell the two
+apart after the unchanged ``[size][CRC32]`` header has been checked (see
+[decode_body]).
+
+Version 1 layout (varint = unsigned LEB128)::
+
+    u8      version (1)
+    u8      flags: bits 0-1 payload compression (0 none, 1 zlib, 2 raw deflate,
+            3 reserved), bit 2 preset dictionary [PAYLOAD_DICTIONARY]
+    str     packet id
+    varint  node table size, then one str per distinct node id
+    varint  originator index into the node table
+    varint  trace length, then one varint index per hop
+    varint  ttl
+    varint  timestamp (ms)
+    u8      priority
+    u8      packet type index into [PACKET_TYPES]; 255 is followed by a str
+    varint  payload length, then the (possibly compressed) payload bytes;
+            it may inflate to at most [MAX_PAYLOAD] bytes
+
+A ``str`` is a tag byte followed by its value:
+
+* tag 0: varint length and UTF-8 bytes;
+* tag 1: the 16 raw bytes of a canonical lowercase UUID;
+* tag 2: two varints for ``<millis>-<hash>`` ids (``MeshPacket.createSos``).
+
+Only strings that format back to exactly the same text take tags 1 and 2,
+and tag 2 only for numbers below 2**63, so every packet round-trips
+unchanged. The trace indexes into the node table, and the originator is
+normally ``trace[0]``, so each hop adds 18 bytes (tag, UUID, index) rather
+than the 39 bytes of a quoted 36-character UUID.
+
+Usage::
+
+    python -m rescuenet_tools.codec --count 2000 --max-hops 6
+    python -m rescuenet_tools.codec --input packets.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import time
+import zlib
+from typing import Callable, Sequence
+
+from .packets import TYPE_ACK, TYPE_DATA, TYPE_SOS, TYPE_STATUS, MeshPacket, PacketFactory
+from .stats import summarize
+from .wire import MAX_PACKET_SIZE
+
+VERSION = 1
+
+NONE = 0
+ZLIB = 1
+DEFLATE = 2
+_COMPRESSION_MASK = 0x03
+_COMPRESSIONS = (NONE, ZLIB, DEFLATE)  # 3 is reserved
+_FLAG_DICTIONARY = 0x04
+
+# An inflated payload may not exceed what a JSON frame of the same packet
+# could carry, so a small frame cannot expand into hundreds of MB.
+MAX_PAYLOAD = MAX_PACKET_SIZE
+
+PACKET_TYPES = (TYPE_SOS, TYPE_ACK, TYPE_STATUS, TYPE_DATA)
+_TYPE_OTHER = 255
+
+_TAG_UTF8 = 0
+_TAG_UUID = 1
+_TAG_PACKET_ID = 2
+_VARINT_LIMIT = 1 << 63
+
+# Part of the version 1 format: changing it breaks decoding of existing frames.
+# zlib matches the end of the dictionary most cheaply, so the SosPayload
+# keys (the common case) come last.
+PAYLOAD_DICTIONARY = (
+    b'{"nodeId":"","battery":,"hasInternet":false}true,"contactPhone":"+91'
+    b'{"sosId":"","senderId":"","senderName":"Anonymous","latitude":,"longitude":,'
+    b'"locationAccuracy":,"emergencyType":,"triageLevel":,"numberOfPeople":1,'
+    b'"medicalConditions":[],"requiredSupplies":[],"additionalNotes":"","timestamp":17'
+    b',"isActive":true,"contactPhone":null}'
+)
+
+_UUID = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\Z')
+_PACKET_ID = re.compile(r'(0|[1-9][0-9]*)-(0|[1-9][0-9]*)\Z')
+
+
+def _varint(out: bytearray, value: int) -> None:
+    if value < 0:
+        raise ValueError(f'cannot encode negative value {value} as a varint')
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _string(out: bytearray, text: str) -> None:
+    if len(text) == 36 and _UUID.match(text):
+        out.append(_TAG_UUID)
+        out += bytes.fromhex(text.replace('-', ''))
+        return
+    match = _PACKET_ID.match(text)
+    if match:
+        millis, hash_ = int(match.group(1)), int(match.group(2))
+        # Larger numbers are valid ids but longer than the decoder reads.
+        if millis < _VARINT_LIMIT and hash_ < _VARINT_LIMIT:
+            out.append(_TAG_PACKET_ID)
+            _varint(out, millis)
+            _varint(out, hash_)
+            return
+    raw = text.encode('utf-8')
+    out.append(_TAG_UTF8)
+    _varint(out, len(raw))
+    out += raw
+
+
+def compress_payload(raw: bytes, compression: int, dictionary: bool) -> bytes:
+    if compression == NONE:
+        return raw
+    wbits = 15 if compression == ZLIB else -15
+    if dictionary:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, wbits, zdict=PAYLOAD_DICTIONARY)
+    else:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, wbits)
+    return compressor.compress(raw) + compressor.flush()
+
+
+def encode(packet: MeshPacket, compression: int = NONE, dictionary: bool = False,
+           auto: bool = False) -> bytes:
+    """Version 1 frame body for [packet].
+
+    With [auto], the payload is sent uncompressed whenever compression would
+    not make it smaller, e.g. for short status payloads.
+    """
+    raw = packet.payload.encode('utf-8')
+    payload = compress_payload(raw, compression, dictionary)
+    if auto and len(payload) >= len(raw):
+        payload, compression, dictionary = raw, NONE, False
+
+    out = bytearray((VERSION, compression | (_FLAG_DICTIONARY if dictionary and compression else 0)))
+    _string(out, packet.id)
+    table = list(dict.fromkeys((packet.originator_id, *packet.trace)))
+    index = {node_id: i for i, node_id in enumerate(table)}
+    _varint(out, len(table))
+    for node_id in table:
+        _string(out, node_id)
+    _varint(out, index[packet.originator_id])
+    _varint(out, len(packet.trace))
+    for node_id in packet.trace:
+        _varint(out, index[node_id])
+    _varint(out, packet.ttl)
+    _varint(out, packet.timestamp)
+    out.append(packet.priority)
+    if packet.packet_type in PACKET_TYPES:
+        out.append(PACKET_TYPES.index(packet.packet_type))
+    else:
+        out.append(_TYPE_OTHER)
+        _string(out, packet.packet_type)
+    _varint(out, len(payload))
+    out += payload
+    return bytes(out)
+
+
+class _Reader:
+    __slots__ = ('data', 'pos')
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.pos = 0
+
+    def byte(self) -> int:
+        if self.pos >= len(self.data):
+            raise ValueError('truncated binary packet')
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def take(self, n: int) -> bytes:
+        end = self.pos + n
+        if end > len(self.data):
+            raise ValueError('truncated binary packet')
+        chunk = self.data[self.pos:end]
+        self.pos = end
+        return chunk
+
+    def varint(self) -> int:
+        value = shift = 0
+        while True:
+            b = self.byte()
+            value |= (b & 0x7F) << shift
+            if b < 0x80:
+                return value
+            shift += 7
+            if shift > 63:
+                raise ValueError('varint too long')
+
+    def string(self) -> str:
+        tag = self.byte()
+        if tag == _TAG_UUID:
+            h = self.take(16).hex()
+            return f'{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}'
+        if tag == _TAG_PACKET_ID:
+            millis = self.varint()
+            return f'{millis}-{self.varint()}'
+        if tag == _TAG_UTF8:
+            return self.take(self.varint()).decode('utf-8')
+        raise ValueError(f'unknown string tag {tag}')
+
+
+def decode(data: bytes) -> MeshPacket:
+    """Inverse of [encode]; raises ValueError on malformed input."""
+    r = _Reader(data)
+    version = r.byte()
+    if version != VERSION:
+        raise ValueError(f'unsupported binary packet version {version}')
+    flags = r.byte()
+    packet_id = r.string()
+    table = [r.string() for _ in range(r.varint())]
+    try:
+        originator = table[r.varint()]
+        trace = tuple(table[r.varint()] for _ in range(r.varint()))
+    except IndexError:
+        raise ValueError('node index outside the node table') from None
+    ttl = r.varint()
+    timestamp = r.varint()
+    priority = r.byte()
+    type_code = r.byte()
+    if type_code == _TYPE_OTHER:
+        packet_type = r.string()
+    elif type_code < len(PACKET_TYPES):
+        packet_type = PACKET_TYPES[type_code]
+    else:
+        raise ValueError(f'unknown packet type code {type_code}')
+    payload = r.take(r.varint())
+    if r.pos != len(data):
+        raise ValueError(f'{len(data) - r.pos} trailing bytes after binary packet')
+
+    compression = flags & _COMPRESSION_MASK
+    if compression not in _COMPRESSIONS:
+        raise ValueError(f'unknown payload compression {compression}')
+    if compression != NONE:
+        wbits = 15 if compression == ZLIB else -15
+        try:
+            if flags & _FLAG_DICTIONARY:
+                decompressor = zlib.decompressobj(wbits, zdict=PAYLOAD_DICTIONARY)
+            else:
+                decompressor = zlib.decompressobj(wbits)
+            payload = decompressor.decompress(payload, MAX_PAYLOAD + 1)
+        except zlib.error as e:
+            raise ValueError(f'corrupt payload: {e}') from None
+        if len(payload) > MAX_PAYLOAD or decompressor.unconsumed_tail:
+            raise ValueError(f'payload inflates past {MAX_PAYLOAD} bytes')
+        if not decompressor.eof or decompressor.unused_data:
+            raise ValueError('corrupt payload: compressed stream does not end with the payload')
+    return MeshPacket(packet_id, originator, payload.decode('utf-8'), trace, ttl, timestamp,
+                      priority, packet_type)
+
+
+def decode_body(data: bytes) -> MeshPacket:
+    """Decodes a frame body in either format, keyed on its first byte."""
+    if data[:1] == b'{' or data[:4] == b'\xef\xbb\xbf{':
+        return MeshPacket.from_json_string(data.decode('utf-8-sig'))
+    return decode(data)
+
+
+_JSON_ID = re.compile(rb'\{"id":"([^"\\]*)"')
+
+
+def peek_id(data: bytes) -> str | None:
+    """Packet id of a frame body without decoding the rest of it.
+
+    ``MeshPacketModel.toJson`` writes ``id`` first, so a JSON body is only
+    matched at its start. Returns None when the id cannot be read cheaply
+    (other key order, escapes in the id, malformed binary); callers then
+    fall back to [decode_body].
+    """
+    if data[:1] == b'{' or data[:4] == b'\xef\xbb\xbf{':
+        match = _JSON_ID.match(data, 3 if data[:1] == b'\xef' else 0)
+        return match.group(1).decode('utf-8', 'replace') if match else None
+    r = _Reader(data)
+    try:
+        if r.byte() != VERSION:
+            return None
+        r.byte()
+        return r.string()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _best_of(repeat: int, fn: Callable[[], object]) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def benchmark(packets: Sequence[MeshPacket], repeat: int = 5) -> list[dict]:
+    """Size and best-of-[repeat] encode/decode times of JSON and each binary variant.
+
+    Every variant is checked to round-trip every packet exactly.
+    """
+    variants: list[tuple[str, Callable[[MeshPacket], bytes], Callable[[bytes], MeshPacket]]] = [
+        ('json', lambda p: p.to_json_string().encode('utf-8'),
+         lambda b: MeshPacket.from_json_string(b)),
+    ]
+    for name, compression, dictionary in (('binary', NONE, False), ('binary+zlib', ZLIB, False),
+                                          ('binary+deflate', DEFLATE, False),
+                                          ('binary+deflate+dict', DEFLATE, True)):
+        variants.append((name, lambda p, c=compression, d=dictionary: encode(p, c, d, auto=True), decode))
+
+    rows = []
+    json_bytes = None
+    for name, enc, dec in variants:
+        bodies = [enc(p) for p in packets]
+        if [dec(b) for b in bodies] != list(packets):
+            raise AssertionError(f'{name} does not round-trip')
+        encode_s = _best_of(repeat, lambda: [enc(p) for p in packets])
+        decode_s = _best_of(repeat, lambda: [dec(b) for b in bodies])
+        total = sum(len(b) for b in bodies)
+        json_bytes = json_bytes or total
+        rows.append({
+            'format': name,
+            'bytes': summarize(len(b) for b in bodies),
+            'total_bytes': total,
+            'ratio': total / json_bytes,
+            'encode_us': encode_s / len(packets) * 1e6,
+            'decode_us': decode_s / len(packets) * 1e6,
+        })
+    return rows
+
+
+def per_hop_growth(packet: MeshPacket, factory: PacketFactory, hops: int = 10) -> list[tuple[int, int, int]]:
+    """``(hops, json_bytes, binary_bytes)`` as [packet] is relayed [hops] times."""
+    out = []
+    for hop in range(hops + 1):
+        out.append((packet.hop_count, len(packet.to_json_string().encode('utf-8')),
+                    len(encode(packet, DEFLATE, True, auto=True))))
+        if hop < hops:
+            packet = packet.add_hop(factory.node_id())
+    return out
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.codec',
+        description='Compare the binary packet codec with the JSON wire format.',
+    )
+    parser.add_argument('--input', help='MeshPacket JSON lines (default: generated packets)')
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--max-hops', type=int, default=6)
+    parser.add_argument('--sos-fraction', type=float, default=0.8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    factory = PacketFactory(seed=args.seed, sos_fraction=args.sos_fraction)
+    if args.input:
+        with open(args.input, encoding='utf-8-sig') as f:
+            packets = [MeshPacket.from_json_string(line) for line in f if line.strip()]
+    else:
+        packets = list(factory.packets(args.count, args.max_hops))
+    if not packets:
+        parser.error('no packets')
+
+    rows = benchmark(packets, args.repeat)
+    sos = PacketFactory(seed=args.seed)
+    growth = per_hop_growth(sos.packet(), sos)
+    if args.json:
+        print(json.dumps({'packets': len(packets), 'formats': rows, 'per_hop': growth}, indent=2))
+        return 0
+
+    print(f'{len(packets)} packets')
+    print(f'{"format":<20} {"mean B":>8} {"p95 B":>7} {"vs JSON":>8} {"enc us":>8} {"dec us":>8}')
+    for row in rows:
+        print(f'{row["format"]:<20} {row["bytes"]["mean"]:>8.1f} {row["bytes"]["p95"]:>7.0f} '
+              f'{row["ratio"]:>7.1%} {row["encode_us"]:>8.2f} {row["decode_us"]:>8.2f}')
+    print('SOS packet size by hop count (json / binary+deflate+dict):')
+    print('  ' + '  '.join(f'{h}:{j}/{b}' for h, j, b in growth))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
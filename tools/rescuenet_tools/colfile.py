@@ -0,0 +1,170 @@
+"""Append-only columnar file of compressed row groups.
+
+Layout::
+
+    b'RNCOL1\\n'
+    block*    [kind:1][payload length:u32][CRC32 of payload:u32][payload]
+
+``M`` blocks hold UTF-8 JSON metadata. ``G`` blocks hold one zlib-compressed
+row group: ``[rows:u32][columns:u16]``, then per column
+``[name length:u8][name][type:1][data length:u32][data]``. Type ``q`` is
+little-endian int64, ``d`` little-endian float64 and ``s`` a JSON list of
+strings.
+
+Every block is written with a single ``write`` and then flushed. A crash can
+therefore only leave a torn block at the end of the file. Readers stop at
+the first block whose length or CRC does not check out, and
+[ColumnWriter] truncates that tail before appending. Rows already flushed
+survive any interruption.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+from typing import BinaryIO, Iterator, Sequence
+
+MAGIC = b'RNCOL1\n'
+BLOCK = struct.Struct('<cII')
+GROUP = struct.Struct('<IH')
+
+_TYPECODES = {'q': 'q', 'd': 'd'}
+
+
+def _encode_column(values: Sequence) -> tuple[bytes, bytes]:
+    if all(isinstance(v, bool) or isinstance(v, int) for v in values):
+        kind, data = b'q', array('q', (int(v) for v in values))
+    elif all(isinstance(v, (int, float)) for v in values):
+        kind, data = b'd', array('d', (float(v) for v in values))
+    else:
+        return b's', json.dumps([None if v is None else str(v) for v in values]).encode('utf-8')
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return kind, data.tobytes()
+
+
+def _decode_column(kind: bytes, data: bytes) -> list:
+    if kind == b's':
+        return json.loads(data)
+    values = array(_TYPECODES[kind.decode()])
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tolist()
+
+
+def encode_group(columns: dict[str, Sequence]) -> bytes:
+    """Compressed payload of a ``G`` block; all columns must have equal length."""
+    lengths = {len(v) for v in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f'ragged row group: column lengths {sorted(lengths)}')
+    parts = [GROUP.pack(lengths.pop() if lengths else 0, len(columns))]
+    for name, values in columns.items():
+        raw_name = name.encode('utf-8')
+        kind, data = _encode_column(values)
+        parts += [bytes((len(raw_name),)), raw_name, kind, struct.pack('<I', len(data)), data]
+    return zlib.compress(b''.join(parts), 6)
+
+
+def decode_group(payload: bytes) -> dict[str, list]:
+    raw = zlib.decompress(payload)
+    rows, ncols = GROUP.unpack_from(raw)
+    pos = GROUP.size
+    columns = {}
+    for _ in range(ncols):
+        name_len = raw[pos]
+        name = raw[pos + 1:pos + 1 + name_len].decode('utf-8')
+        pos += 1 + name_len
+        kind = raw[pos:pos + 1]
+        (size,) = struct.unpack_from('<I', raw, pos + 1)
+        pos += 5
+        columns[name] = _decode_column(kind, raw[pos:pos + size])
+        pos += size
+        if len(columns[name]) != rows:
+            raise ValueError(f'column {name!r} has {len(columns[name])} rows, expected {rows}')
+    return columns
+
+
+def iter_blocks(f: BinaryIO) -> Iterator[tuple[bytes, bytes, int]]:
+    """Yields ``(kind, payload, end_offset)`` for each intact block."""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError('not a rescuenet columnar file')
+    while True:
+        header = f.read(BLOCK.size)
+        if len(header) < BLOCK.size:
+            return
+        kind, size, crc = BLOCK.unpack(header)
+        payload = f.read(size)
+        if len(payload) < size or zlib.crc32(payload) != crc:
+            return
+        yield kind, payload, f.tell()
+
+
+def read_file(path: str) -> tuple[list[dict], dict[str, list]]:
+    """All metadata blocks and the concatenated columns of every row group.
+
+    A column missing from some row groups is padded with None.
+    """
+    metadata: list[dict] = []
+    columns: dict[str, list] = {}
+    rows = 0
+    with open(path, 'rb') as f:
+        for kind, payload, _ in iter_blocks(f):
+            if kind == b'M':
+                metadata.append(json.loads(payload))
+            elif kind == b'G':
+                group = decode_group(payload)
+                n = len(next(iter(group.values()), []))
+                for name in columns.keys() - group.keys():
+                    columns[name].extend([None] * n)
+                for name, values in group.items():
+                    columns.setdefault(name, [None] * rows).extend(values)
+                rows += n
+    return metadata, columns
+
+
+class ColumnWriter:
+    """Appends metadata and row groups; reopening resumes after the last intact block."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.recovered_bytes = 0
+        end = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as f:
+                end = len(MAGIC)
+                for _, _, end in iter_blocks(f):
+                    pass
+            size = os.path.getsize(path)
+            self.recovered_bytes = size - end
+            if self.recovered_bytes:
+                with open(path, 'r+b') as f:
+                    f.truncate(end)
+        self._f = open(path, 'ab')
+        if end == 0:
+            self._f.write(MAGIC)
+            self._f.flush()
+
+    def write_metadata(self, metadata: dict) -> None:
+        self._write(b'M', json.dumps(metadata, sort_keys=True).encode('utf-8'))
+
+    def write_group(self, columns: dict[str, Sequence]) -> None:
+        self._write(b'G', encode_group(columns))
+
+    def _write(self, kind: bytes, payload: bytes) -> None:
+        self._f.write(BLOCK.pack(kind, len(payload), zlib.crc32(payload)) + payload)
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> ColumnWriter:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
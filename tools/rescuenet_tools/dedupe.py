@@ -0,0 +1,403 @@
+"""Time-windowed duplicate filter for the packet receive path.
+
+``MeshRepositoryImpl._processIncomingPacket`` parses every frame, then asks
+``SeenPacketCache.checkAndMark`` (an ``LruCache`` of 1000 ids that evicts
+in insertion order) whether the id is new. When more than 1000 distinct
+ids arrive between two copies of the same packet, the first id has been
+evicted, so the copy is processed and forwarded again. [Deduplicator]
+keeps the ``SeenPacketCache`` API with memory fixed for a whole time
+window:
+
+* an exact tier, the [recent] most recent ids in insertion order, which
+  answers the copies of a re-broadcast flood without hashing;
+* a rotating Bloom filter of [generations] filters, each covering
+  ``window_s / generations`` seconds or ``capacity / generations`` ids,
+  whichever fills first. Checks look at every generation and inserts go
+  to the newest. A rotation clears the oldest, so an id is remembered for
+  at least ``(generations - 1) / generations`` of [window_s].
+
+Every generation is sized for ``fp_rate / generations``, so a new id is
+wrongly reported as seen with probability at most [fp_rate]. All
+generations share the same bit count and hash count, so one blake2b
+digest yields the bit positions for all of them (double hashing). A check
+is O(k * generations), independent of how many ids have been seen.
+
+[ReceiveFilter] runs the check before ``MeshPacket`` parsing: it reads
+only the id with [codec.peek_id], and parses the body only when the id is
+new. An id is marked seen only after its body parses, so a malformed
+frame cannot hide a later valid copy.
+
+Usage::
+
+    python -m rescuenet_tools.dedupe --distinct 200000 --rate 500
+    python -m rescuenet_tools.dedupe --distinct 50000 --fp-rate 1e-3 --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from typing import Callable
+
+from . import codec
+from .packets import MeshPacket, PacketFactory
+
+# AppConstants.maxSeenCacheSize / SeenPacketCache default capacity.
+LRU_CAPACITY = 1000
+
+
+def _digest(packet_id: str) -> tuple[int, int]:
+    d = hashlib.blake2b(packet_id.encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(d[:8], 'little'), int.from_bytes(d[8:], 'little') | 1
+
+
+class BloomFilter:
+    """Bloom filter sized for [capacity] ids at [fp_rate]."""
+
+    def __init__(self, capacity: int, fp_rate: float) -> None:
+        if capacity <= 0 or not 0 < fp_rate < 1:
+            raise ValueError(f'need capacity > 0 and 0 < fp_rate < 1, got {capacity}, {fp_rate}')
+        self.capacity = capacity
+        self.m = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.k = max(1, round(self.m / capacity * math.log(2)))
+        self.bits = bytearray((self.m + 7) // 8)
+        self.count = 0
+
+    def positions(self, h1: int, h2: int) -> list[int]:
+        m = self.m
+        return [(h1 + i * h2) % m for i in range(self.k)]
+
+    def has(self, positions: list[int]) -> bool:
+        bits = self.bits
+        for p in positions:
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def add(self, positions: list[int]) -> None:
+        bits = self.bits
+        for p in positions:
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def clear(self) -> None:
+        self.bits = bytearray(len(self.bits))
+        self.count = 0
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class RotatingBloom:
+    """[generations] Bloom filters that together cover [window_s] seconds."""
+
+    def __init__(self, capacity: int, fp_rate: float, window_s: float, generations: int = 4,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        if generations < 2:
+            raise ValueError(f'need at least 2 generations, got {generations}')
+        if not 0 < fp_rate < 1:
+            raise ValueError(f'need 0 < fp_rate < 1, got {fp_rate}')
+        per_generation = math.ceil(capacity / generations)
+        self.filters = deque(BloomFilter(per_generation, fp_rate / generations)
+                             for _ in range(generations))
+        self.generation_s = window_s / generations
+        self.clock = clock
+        self.started = clock()
+        self.rotations = 0
+        self.early_rotations = 0  # the newest generation filled before its time was up
+
+    def _rotate(self) -> None:
+        oldest = self.filters.popleft()
+        oldest.clear()
+        self.filters.append(oldest)
+        self.rotations += 1
+
+    def _advance(self) -> None:
+        now = self.clock()
+        periods = int((now - self.started) // self.generation_s)
+        if periods > 0:
+            for _ in range(min(periods, len(self.filters))):
+                self._rotate()
+            self.started += periods * self.generation_s
+
+    def probe(self, packet_id: str) -> list[int] | None:
+        """Bit positions of [packet_id], or None when some generation has all of them."""
+        self._advance()
+        positions = self.filters[0].positions(*_digest(packet_id))
+        return None if any(f.has(positions) for f in self.filters) else positions
+
+    def has(self, packet_id: str) -> bool:
+        return self.probe(packet_id) is None
+
+    def add(self, packet_id: str, positions: list[int] | None = None) -> None:
+        """Inserts [packet_id]; [positions] from [probe] skip hashing it again."""
+        self._advance()
+        active = self.filters[-1]
+        if active.count >= active.capacity:
+            self._rotate()
+            self.early_rotations += 1
+            self.started = self.clock()
+            active = self.filters[-1]
+        active.add(positions if positions is not None else active.positions(*_digest(packet_id)))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(f.nbytes for f in self.filters)
+
+
+class LruDedupe:
+    """``SeenPacketCache`` as it is today: the first [capacity] ids in insertion order."""
+
+    def __init__(self, capacity: int = LRU_CAPACITY) -> None:
+        self.capacity = capacity
+        self._ids: OrderedDict[str, None] = OrderedDict()
+
+    def has_seen(self, packet_id: str) -> bool:
+        return packet_id in self._ids
+
+    def mark_as_seen(self, packet_id: str) -> bool:
+        """``LruCache.addIfAbsent``: True when [packet_id] was new."""
+        if packet_id in self._ids:
+            return False
+        if len(self._ids) >= self.capacity:
+            self._ids.popitem(last=False)
+        self._ids[packet_id] = None
+        return True
+
+    check_and_mark = mark_as_seen
+
+    @property
+    def size(self) -> int:
+        return len(self._ids)
+
+
+class Deduplicator:
+    """``SeenPacketCache`` API over an exact recent tier and a rotating Bloom filter.
+
+    [capacity] is the number of distinct ids expected per [window_s]; past
+    that, generations rotate early and the remembered span gets shorter,
+    but memory and [fp_rate] do not change.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, fp_rate: float = 1e-4, window_s: float = 3600.0,
+                 generations: int = 4, recent: int = LRU_CAPACITY,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.recent = LruDedupe(recent)
+        self.bloom = RotatingBloom(capacity, fp_rate, window_s, generations, clock)
+        self.exact_hits = 0
+        self.probable_hits = 0
+        # The last id has_seen answered False for, with its bit positions.
+        # Nothing has been inserted since, so mark_as_seen can trust it.
+        self._miss: tuple[str, list[int]] | None = None
+
+    def has_seen(self, packet_id: str) -> bool:
+        if self.recent.has_seen(packet_id):
+            self.exact_hits += 1
+            return True
+        positions = self.bloom.probe(packet_id)
+        if positions is None:
+            self.probable_hits += 1
+            return True
+        self._miss = (packet_id, positions)
+        return False
+
+    def mark_as_seen(self, packet_id: str) -> bool:
+        """Adds [packet_id]; False when it was (probably) seen already.
+
+        Hashes and probes [packet_id] once, or not at all right after
+        [has_seen] reported it new.
+        """
+        if (self._miss is None or self._miss[0] != packet_id) and self.has_seen(packet_id):
+            return False
+        positions = self._miss[1]
+        self._miss = None
+        self.recent.mark_as_seen(packet_id)
+        self.bloom.add(packet_id, positions)
+        return True
+
+    check_and_mark = mark_as_seen
+
+    @property
+    def nbytes(self) -> int:
+        """Filter bits only; the exact tier holds at most [recent] id strings."""
+        return self.bloom.nbytes
+
+
+class ReceiveFilter:
+    """Drops duplicate frame bodies before they are parsed into a MeshPacket."""
+
+    def __init__(self, dedupe: Deduplicator | LruDedupe) -> None:
+        self.dedupe = dedupe
+        self.dropped = 0
+        self.parsed = 0
+
+    def receive(self, body: bytes) -> MeshPacket | None:
+        """The parsed packet, or None for a duplicate; ValueError if malformed."""
+        packet_id = codec.peek_id(body)
+        if packet_id is not None and self.dedupe.has_seen(packet_id):
+            self.dropped += 1
+            return None
+        packet = codec.decode_body(body)
+        self.parsed += 1
+        if not self.dedupe.mark_as_seen(packet.id):
+            self.dropped += 1
+            return None
+        return packet
+
+
+def flood(distinct: int, rate_per_s: float, copies: float = 4.0, spread_s: float = 30.0,
+          seed: int = 0) -> list[tuple[float, str]]:
+    """Arrival times of [distinct] packet ids and their re-broadcast copies.
+
+    New ids arrive at [rate_per_s]. Each id is then heard again a
+    geometric number of times with mean [copies], each copy an exponential
+    delay (mean [spread_s]) after the original.
+    """
+    rng = random.Random(seed)
+    events: list[tuple[float, str]] = []
+    start_ms = 1771668982192
+    p_more = copies / (copies + 1)
+    for i in range(distinct):
+        t = i / rate_per_s
+        packet_id = f'{start_ms + int(t * 1000)}-{rng.getrandbits(31)}'
+        events.append((t, packet_id))
+        while rng.random() < p_more:
+            events.append((t + rng.expovariate(1 / spread_s), packet_id))
+    events.sort()
+    return events
+
+
+def replay(events: list[tuple[float, str]], make: Callable[[Callable[[], float]], object]) -> dict:
+    """Feeds [events] through ``make(clock).check_and_mark`` and scores the answers.
+
+    A leak is a duplicate reported as new; a false drop is a first arrival
+    reported as seen.
+    """
+    now = [0.0]
+    dedupe = make(lambda: now[0])
+    seen: set[str] = set()
+    leaks = false_drops = duplicates = 0
+    check = dedupe.check_and_mark
+    t0 = time.perf_counter()
+    for t, packet_id in events:
+        now[0] = t
+        new = check(packet_id)
+        if packet_id in seen:
+            duplicates += 1
+            leaks += new
+        else:
+            seen.add(packet_id)
+            false_drops += not new
+    elapsed = time.perf_counter() - t0
+    return {
+        'events': len(events),
+        'distinct': len(seen),
+        'duplicates': duplicates,
+        'leaked': leaks,
+        'leak_rate': leaks / duplicates if duplicates else 0.0,
+        'false_drops': false_drops,
+        'false_drop_rate': false_drops / len(seen) if seen else 0.0,
+        'checks_per_s': len(events) / elapsed if elapsed else 0.0,
+        'dedupe': dedupe,
+    }
+
+
+def exact_bytes_per_million(sample: int = 100_000) -> int:
+    """Measured heap for an insertion-ordered set of ``<millis>-<hash>`` ids, scaled to 1M."""
+    rng = random.Random(0)
+    ids = [f'{1771668982192 + i}-{rng.getrandbits(31)}' for i in range(sample)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held: OrderedDict[str, None] = OrderedDict()
+    for packet_id in ids:
+        held[packet_id] = None
+    # The strings arrive already allocated in the parsed packet but must be retained.
+    size = tracemalloc.get_traced_memory()[0] - before + sum(sys.getsizeof(i) for i in ids)
+    tracemalloc.stop()
+    return size * 1_000_000 // sample
+
+
+def receive_cost(count: int = 2000, seed: int = 0) -> dict:
+    """Microseconds per duplicate body: [ReceiveFilter] vs. parse-then-check."""
+    factory = PacketFactory(seed=seed)
+    bodies = [factory.packet(hops=3).to_json_string().encode('utf-8') for _ in range(count)]
+    front = ReceiveFilter(LruDedupe(count))
+    seen = LruDedupe(count)
+    for body in bodies:
+        front.receive(body)
+        seen.mark_as_seen(MeshPacket.from_json_string(body).id)
+    t0 = time.perf_counter()
+    for body in bodies:
+        front.receive(body)
+    t1 = time.perf_counter()
+    for body in bodies:
+        seen.check_and_mark(MeshPacket.from_json_string(body).id)
+    t2 = time.perf_counter()
+    return {'peek_us': (t1 - t0) / count * 1e6, 'parse_us': (t2 - t1) / count * 1e6}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.dedupe',
+        description='Duplicate leak rate and memory: 1000-entry LRU vs. time-windowed Bloom filter.',
+    )
+    parser.add_argument('--distinct', type=int, default=200_000, help='distinct packet ids')
+    parser.add_argument('--rate', type=float, default=500.0, help='new ids per second at this relay')
+    parser.add_argument('--copies', type=float, default=4.0, help='mean re-broadcast copies per id')
+    parser.add_argument('--spread-s', type=float, default=30.0, help='mean delay of a copy')
+    parser.add_argument('--capacity', type=int, default=1_000_000, help='ids per window the filter is sized for')
+    parser.add_argument('--fp-rate', type=float, default=1e-4)
+    parser.add_argument('--window-s', type=float, default=3600.0)
+    parser.add_argument('--generations', type=int, default=4)
+    parser.add_argument('--lru', type=int, default=LRU_CAPACITY)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    events = flood(args.distinct, args.rate, args.copies, args.spread_s, args.seed)
+    policies = {
+        f'lru{args.lru}': lambda clock: LruDedupe(args.lru),
+        'bloom': lambda clock: Deduplicator(args.capacity, args.fp_rate, args.window_s,
+                                            args.generations, args.lru, clock),
+    }
+    rows = []
+    for name, make in policies.items():
+        row = replay(events, make)
+        dedupe = row.pop('dedupe')
+        row['policy'] = name
+        if isinstance(dedupe, Deduplicator):
+            row['bytes'] = dedupe.nbytes
+            row['exact_hits'] = dedupe.exact_hits
+            row['early_rotations'] = dedupe.bloom.early_rotations
+        rows.append(row)
+    per_million = {
+        'exact_ids': exact_bytes_per_million(),
+        'bloom': Deduplicator(1_000_000, args.fp_rate, args.window_s, args.generations).nbytes,
+    }
+    cost = receive_cost(seed=args.seed)
+    if args.json:
+        print(json.dumps({'rows': rows, 'bytes_per_million_ids': per_million, 'duplicate_body': cost},
+                         indent=2))
+        return 0
+    print(f'{len(events)} arrivals, {args.distinct} distinct ids at {args.rate:g}/s, '
+          f'copies mean {args.copies:g}, spread {args.spread_s:g} s')
+    print(f'{"policy":<10} {"dups":>9} {"leaked":>9} {"leak %":>8} {"false drops":>12} {"checks/s":>10}')
+    for row in rows:
+        print(f'{row["policy"]:<10} {row["duplicates"]:>9} {row["leaked"]:>9} {100 * row["leak_rate"]:>8.3f} '
+              f'{row["false_drops"]:>12} {row["checks_per_s"]:>10.0f}')
+    print(f'memory per million ids: exact set {per_million["exact_ids"] / 2**20:.1f} MiB, '
+          f'bloom (fp {args.fp_rate:g}, {args.generations} generations) {per_million["bloom"] / 2**20:.2f} MiB')
+    print(f'duplicate JSON body: peek id {cost["peek_us"]:.1f} us vs. parse then check {cost["parse_us"]:.1f} us')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,747 @@
+"""Batched, pooled SOS uplink for goal nodes.
+
+A goal node delivers each SOS on its own: ``CloudDeliveryService.uploadSos``
+first runs a connectivity check (a fresh ``HttpClient`` with a 3 s timeout),
+then uploads one payload. A goal node that receives a burst from the mesh
+therefore makes two HTTP exchanges per SOS. Meanwhile ``InternetProbe``
+sends its three checks every 30 s. [Gateway] sits behind the mesh receive
+path instead:
+
+* SOS packets are deduplicated by packet id with a [dedupe.Deduplicator],
+  so copies that arrive over several mesh paths are uploaded once;
+* uploads are batched. A batch is sent when it holds [GatewayConfig.max_batch]
+  SOS or [GatewayConfig.max_bytes] bytes, or when its oldest SOS has waited
+  [GatewayConfig.window_s];
+* [GatewayConfig.connections] workers each keep one keep-alive HTTP/1.1
+  connection to the backend (the pool). A failed upload *is* the
+  connectivity check, so no separate probe is sent before each upload;
+* a connection error, 429 or 5xx marks the uplink down. One worker then
+  retries after an exponential backoff with jitter, and the others wait
+  until it succeeds;
+* while the uplink is down, queued and newly ingested SOS go to a spool, an
+  [outbox.OutboxBox] log on disk. The spool is drained first once the
+  uplink is back, and again at the next start after a crash.
+
+The backend must treat ``packetId`` as an idempotency key: a batch whose
+response was lost is sent again. Without a spool, SOS that are queued in
+memory when the process dies are lost.
+
+[StandInUplink] is a local HTTP server for tests and benchmarks. It can
+add latency and simulate outages. ``bench`` replays a mesh burst with
+duplicate copies and an outage, once per-packet (no batching, a new
+connection per POST, like ``CloudDeliveryService``) and once batched. It
+reports ingest-to-upload latency and the requests saved.
+
+Usage::
+
+    python -m rescuenet_tools.gateway bench --count 5000 --rate 500 --outage 3:2
+    python -m rescuenet_tools.gateway stand-in --port 8080
+    python -m rescuenet_tools.gateway serve --uplink http://127.0.0.1:8080/v1/sos --spool sos.spool
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable
+from urllib.parse import urlsplit
+
+from .dedupe import Deduplicator
+from .outbox import OutboxBox
+from .packets import MeshPacket, PacketFactory
+from .stats import Reservoir
+from .wire import DEFAULT_PORT, MeshServer
+
+UPLOAD_PATH = '/v1/sos'  # CloudDeliveryService._backendUrl
+REQUEST_TIMEOUT_S = 10.0
+SPOOL_TTL_MS = 24 * 60 * 60 * 1000
+SPOOL_RETRIES = 1 << 30  # the spool keeps an SOS until it is uploaded or expires
+MAX_HEADER_BYTES = 16 * 1024
+
+
+@dataclass
+class GatewayConfig:
+    max_batch: int = 100
+    max_bytes: int = 256 * 1024
+    window_s: float = 0.1
+    connections: int = 2
+    keep_alive: bool = True
+    request_timeout_s: float = REQUEST_TIMEOUT_S
+    backoff_base_s: float = 0.5
+    backoff_max_s: float = 30.0
+
+
+PER_PACKET = GatewayConfig(max_batch=1, window_s=0.0, connections=2, keep_alive=False)
+
+
+@dataclass
+class GatewayStats:
+    ingested: int = 0
+    duplicates: int = 0
+    rejected: int = 0  # not an SOS, or not a MeshPacket
+    uploaded: int = 0
+    dropped: int = 0  # refused by the backend with a 4xx other than 429
+    requests: int = 0
+    failed_requests: int = 0
+    connections: int = 0
+    spooled: int = 0
+    latency_s: Reservoir = field(default_factory=Reservoir)
+
+    @property
+    def requests_saved(self) -> int:
+        """Requests not sent compared with one POST per uploaded SOS."""
+        return self.uploaded - self.requests
+
+    def as_dict(self) -> dict:
+        return {
+            'ingested': self.ingested,
+            'duplicates': self.duplicates,
+            'rejected': self.rejected,
+            'uploaded': self.uploaded,
+            'dropped': self.dropped,
+            'requests': self.requests,
+            'failed_requests': self.failed_requests,
+            'requests_saved': self.requests_saved,
+            'connections': self.connections,
+            'spooled': self.spooled,
+            'latency_ms': self.latency_s.summary(1000),
+        }
+
+
+def upload_item(packet: MeshPacket, received_at: float) -> bytes:
+    """One batch element; the SosPayload JSON is embedded without re-parsing."""
+    head = json.dumps({'packetId': packet.id, 'originatorId': packet.originator_id,
+                       'hops': packet.hop_count, 'receivedAt': int(received_at * 1000)},
+                      separators=(',', ':'))
+    return f'{head[:-1]},"sos":{packet.payload}}}'.encode('utf-8')
+
+
+def batch_body(items: list[bytes]) -> bytes:
+    return b'{"sos":[' + b','.join(items) + b']}'
+
+
+class HttpConnection:
+    """One HTTP/1.1 connection, reused while the server keeps it open."""
+
+    def __init__(self, host: str, port: int, timeout: float = REQUEST_TIMEOUT_S) -> None:
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.opened = 0
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._answered = False  # the status line of the current POST has arrived
+
+    async def post(self, path: str, body: bytes, keep_alive: bool = True) -> tuple[int, bytes]:
+        """Status and body of one POST; OSError or TimeoutError on failure.
+
+        The server may close an idle keep-alive connection at any time, so a
+        reused connection that fails before any of the response arrived is
+        replaced and the POST sent once more. A timeout is never retried:
+        the server may still be processing the batch.
+        """
+        reused = self._writer is not None
+        self._answered = False
+        try:
+            return await asyncio.wait_for(self._exchange(path, body, keep_alive), self.timeout)
+        except asyncio.TimeoutError:
+            # Before OSError: since Python 3.11 it is a subclass.
+            self.close()
+            raise
+        except (OSError, asyncio.IncompleteReadError) as e:
+            self.close()
+            if not reused or self._answered or getattr(e, 'partial', b''):
+                raise OSError(f'POST {path}: {e}') from e
+        except BaseException:
+            self.close()
+            raise
+        return await asyncio.wait_for(self._exchange(path, body, keep_alive), self.timeout)
+
+    async def _exchange(self, path: str, body: bytes, keep_alive: bool) -> tuple[int, bytes]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self.opened += 1
+        head = (f'POST {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n'
+                f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+                f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+        self._writer.write(head.encode('latin-1') + body)
+        await self._writer.drain()
+        status, headers = await _read_head(self._reader)
+        self._answered = True
+        status = int(status.split(' ', 2)[1])
+        reply = await self._reader.readexactly(int(headers.get('content-length', 0)))
+        if not keep_alive or headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, reply
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+async def _read_head(reader: asyncio.StreamReader) -> tuple[str, dict[str, str]]:
+    """First line and lower-cased headers of an HTTP/1.1 message."""
+    raw = await reader.readuntil(b'\r\n\r\n')
+    if len(raw) > MAX_HEADER_BYTES:
+        raise OSError('HTTP header too large')
+    first, *lines = raw[:-4].decode('latin-1').split('\r\n')
+    headers = {}
+    for line in lines:
+        key, _, value = line.partition(':')
+        headers[key.strip().lower()] = value.strip()
+    return first, headers
+
+
+@dataclass(slots=True)
+class _Item:
+    packet: MeshPacket
+    body: bytes
+    received_at: float
+    spooled: bool
+
+
+class Gateway:
+    """Takes delivered SOS packets and uploads them in batches (async context manager).
+
+    [url] is the backend endpoint. [spool] is the path of the on-disk queue;
+    without it, SOS wait in memory while the uplink is down. [clock]
+    returns epoch seconds, as the spool stores wall-clock times.
+    """
+
+    def __init__(self, url: str, config: GatewayConfig | None = None, *, spool: str | None = None,
+                 durable: bool = False, dedupe: Deduplicator | None = None,
+                 clock: Callable[[], float] = time.time, seed: int = 0) -> None:
+        parts = urlsplit(url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise ValueError(f'need an http:// URL, got {url!r}')
+        self.host, self.port, self.path = parts.hostname, parts.port or 80, parts.path or UPLOAD_PATH
+        self.config = config or GatewayConfig()
+        if self.config.max_batch < 1 or self.config.connections < 1:
+            raise ValueError('need max_batch >= 1 and connections >= 1')
+        self.dedupe = dedupe or Deduplicator(100_000, 1e-6, 3600.0)
+        self.clock = clock
+        self.stats = GatewayStats()
+        self.up = True
+        self._queue: deque[_Item] = deque()
+        self._queued_bytes = 0
+        self._failures = 0
+        self._retry_at = 0.0
+        self._rng = random.Random(seed)
+        self._closing = False
+        self._wake: asyncio.Event | None = None
+        self._probe: asyncio.Lock | None = None
+        self._workers: list[asyncio.Task] = []
+        self._connections: list[HttpConnection] = []
+        self._spool = None
+        self._spool_times: dict[str, float] = {}
+        if spool is not None:
+            self._spool = OutboxBox(spool, durable=durable, clock=lambda: int(clock() * 1000),
+                                    max_retries=SPOOL_RETRIES, packet_ttl_ms=SPOOL_TTL_MS)
+            # A previous run's spool is uploaded first; its SOS count as seen.
+            for entry in self._spool.get_all_entries():
+                self._spool_times[entry.packet.id] = entry.added_at / 1000
+                self.dedupe.mark_as_seen(entry.packet.id)
+
+    # -- receive path -----------------------------------------------------
+
+    def ingest(self, packet: MeshPacket) -> bool:
+        """Queues a delivered SOS; False for a duplicate or a non-SOS packet."""
+        if not packet.is_sos:
+            self.stats.rejected += 1
+            return False
+        if not self.dedupe.check_and_mark(packet.id):
+            self.stats.duplicates += 1
+            return False
+        now = self.clock()
+        self.stats.ingested += 1
+        if not self.up and self._spool is not None:
+            self._to_spool(packet, now)
+        else:
+            body = upload_item(packet, now)
+            self._queue.append(_Item(packet, body, now, False))
+            self._queued_bytes += len(body)
+        if self._wake is not None:
+            self._wake.set()
+        return True
+
+    def ingest_json(self, text: str, peer: tuple[str, int] | None = None) -> bool:
+        """[ingest] for ``MeshServer``'s ``on_packet`` hook."""
+        try:
+            packet = MeshPacket.from_json_string(text)
+        except (ValueError, KeyError, TypeError):
+            self.stats.rejected += 1
+            return False
+        return self.ingest(packet)
+
+    @property
+    def backlog(self) -> int:
+        """SOS not yet uploaded, in memory and in the spool."""
+        spooled = self._spool.get_stats() if self._spool is not None else None
+        on_disk = spooled.pending + spooled.in_progress if spooled else 0
+        return len(self._queue) + on_disk
+
+    # -- lifecycle --------------------------------------------------------
+
+    async def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._probe = asyncio.Lock()
+        for _ in range(self.config.connections):
+            conn = HttpConnection(self.host, self.port, self.config.request_timeout_s)
+            self._connections.append(conn)
+            self._workers.append(asyncio.create_task(self._worker(conn)))
+        if self.backlog:
+            self._wake.set()
+
+    async def close(self, timeout: float | None = None) -> int:
+        """Uploads what is queued, for at most [timeout] s; returns the SOS left over.
+
+        With a spool, SOS still in memory when the uplink is down or the
+        time is up are written to it for the next start.
+        """
+        self._closing = True
+        if self._wake is not None:
+            self._wake.set()
+        if self._workers:
+            done, pending = await asyncio.wait(self._workers, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in done:
+                task.result()
+        for conn in self._connections:
+            conn.close()
+            self.stats.connections += conn.opened
+        self._workers.clear()
+        self._connections.clear()
+        if self._spool is not None:
+            while self._queue:
+                item = self._queue.popleft()
+                self._to_spool(item.packet, item.received_at)
+        left = self.backlog
+        if self._spool is not None:
+            self._spool.close()
+        return left
+
+    async def __aenter__(self) -> Gateway:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        await self.close()
+
+    # -- batching ---------------------------------------------------------
+
+    def _to_spool(self, packet: MeshPacket, received_at: float) -> None:
+        # Stamped with the ingest time, so latency survives a restart.
+        self._spool.add_packet(packet, added_at=int(received_at * 1000))
+        self._spool_times[packet.id] = received_at
+        self.stats.spooled += 1
+
+    def _ready(self) -> bool:
+        queue, config = self._queue, self.config
+        return bool(queue) and (
+            self._closing
+            or len(queue) >= config.max_batch
+            or self._queued_bytes >= config.max_bytes
+            or self.clock() - queue[0].received_at >= config.window_s
+        )
+
+    def _take(self, force: bool = False) -> list[_Item] | None:
+        """The next batch, spooled SOS first, or None if nothing is due."""
+        if not (self.up or force):
+            return None
+        config, batch, size = self.config, [], 0
+        spool = self._spool
+        if spool is not None and spool.pending_count:
+            while len(batch) < config.max_batch and size < config.max_bytes:
+                packet = spool.get_next_packet()
+                if packet is None:
+                    break
+                spool.mark_in_progress(packet.id)
+                received_at = self._spool_times.get(packet.id, self.clock())
+                body = upload_item(packet, received_at)
+                batch.append(_Item(packet, body, received_at, True))
+                size += len(body)
+            return batch
+        if not (self._ready() or force and self._queue):
+            return None
+        queue = self._queue
+        while queue and len(batch) < config.max_batch and (not batch or size + len(queue[0].body) <= config.max_bytes):
+            item = queue.popleft()
+            batch.append(item)
+            size += len(item.body)
+        self._queued_bytes -= size
+        return batch
+
+    async def _next_batch(self) -> list[_Item] | None:
+        while True:
+            batch = self._take()
+            if batch is not None:
+                return batch
+            if self._closing and (not self.up and self._spool is not None or not self.backlog):
+                return None
+            timeout = None
+            if self.up and self._queue:
+                timeout = max(0.0, self._queue[0].received_at + self.config.window_s - self.clock())
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self, conn: HttpConnection) -> None:
+        while True:
+            if not self.up:
+                async with self._probe:
+                    if not self.up:
+                        if self._closing and self._spool is not None:
+                            return
+                        # Only this worker retries until the uplink is back.
+                        await asyncio.sleep(max(0.0, self._retry_at - self.clock()))
+                        batch = self._take(force=True)
+                        if batch is None:
+                            if self._closing:
+                                return
+                            self._wake.clear()
+                            await self._wake.wait()
+                            continue
+                        await self._send(conn, batch)
+                        continue
+            batch = await self._next_batch()
+            if batch is None:
+                return
+            await self._send(conn, batch)
+
+    async def _send(self, conn: HttpConnection, batch: list[_Item]) -> None:
+        stats = self.stats
+        stats.requests += 1
+        try:
+            status, _ = await conn.post(self.path, batch_body([i.body for i in batch]), self.config.keep_alive)
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+            status = 0
+        except asyncio.CancelledError:
+            # close() ran out of time with this batch in flight. Spooled SOS
+            # stay in progress in the spool; the rest go back to the queue,
+            # which close() spools or counts as left over.
+            fresh = [item for item in batch if not item.spooled]
+            self._queue.extendleft(reversed(fresh))
+            self._queued_bytes += sum(len(item.body) for item in fresh)
+            raise
+        now = self.clock()
+        # Waiting workers re-check: the uplink may be back, or a close may be done.
+        self._wake.set()
+        if 200 <= status < 300:
+            self._failures = 0
+            self.up = True
+            for item in batch:
+                stats.latency_s.add(now - item.received_at)
+                self._done(item)
+            stats.uploaded += len(batch)
+        elif status == 0 or status == 429 or status >= 500:
+            stats.failed_requests += 1
+            self._failures += 1
+            self.up = False
+            ceiling = min(self.config.backoff_max_s, self.config.backoff_base_s * 2 ** (self._failures - 1))
+            self._retry_at = now + ceiling / 2 + self._rng.uniform(0, ceiling / 2)
+            self._requeue(batch)
+        else:
+            stats.dropped += len(batch)
+            for item in batch:
+                self._done(item)
+
+    def _done(self, item: _Item) -> None:
+        if item.spooled:
+            self._spool.remove_packet(item.packet.id)
+            self._spool_times.pop(item.packet.id, None)
+
+    def _requeue(self, batch: list[_Item]) -> None:
+        spool = self._spool
+        if spool is None:
+            self._queue.extendleft(reversed(batch))
+            self._queued_bytes += sum(len(i.body) for i in batch)
+            return
+        for item in batch:
+            if item.spooled:
+                spool.mark_failed(item.packet.id)
+            else:
+                self._to_spool(item.packet, item.received_at)
+        while self._queue:
+            item = self._queue.popleft()
+            self._to_spool(item.packet, item.received_at)
+        self._queued_bytes = 0
+
+
+class StandInUplink:
+    """Local HTTP backend that accepts batched SOS uploads (async context manager).
+
+    It answers 200 with the number of new SOS and counts the ``packetId``s
+    it had already seen. While [down] is set, it answers 503 and closes the
+    connection. [latency_s] delays every response.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency_s: float = 0.0) -> None:
+        self.host = host
+        self.port = port
+        self.latency_s = latency_s
+        self.down = False
+        self.requests = 0
+        self.refused = 0
+        self.connections = 0
+        self.received: dict[str, int] = {}  # packetId -> arrival count
+        self._server: asyncio.AbstractServer | None = None
+        self._handlers: dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}{UPLOAD_PATH}'
+
+    @property
+    def duplicates(self) -> int:
+        return sum(n - 1 for n in self.received.values())
+
+    async def __aenter__(self) -> StandInUplink:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        self._server.close()
+        # Idle keep-alive connections would otherwise outlive the server.
+        for writer in self._handlers.values():
+            writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        task = asyncio.current_task()
+        self._handlers[task] = writer
+        try:
+            while True:
+                try:
+                    first, headers = await _read_head(reader)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, OSError):
+                    return
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                self.requests += 1
+                if self.latency_s:
+                    await asyncio.sleep(self.latency_s)
+                if self.down:
+                    self.refused += 1
+                    writer.write(_response(503, b'', close=True))
+                    await writer.drain()
+                    return
+                if not first.startswith('POST '):
+                    writer.write(_response(405, b'', close=True))
+                    await writer.drain()
+                    return
+                try:
+                    batch = json.loads(body)['sos']
+                except (ValueError, KeyError, TypeError):
+                    writer.write(_response(400, b'', close=True))
+                    await writer.drain()
+                    return
+                accepted = 0
+                for item in batch:
+                    seen = self.received.get(item['packetId'], 0)
+                    self.received[item['packetId']] = seen + 1
+                    accepted += not seen
+                close = headers.get('connection', '').lower() == 'close'
+                writer.write(_response(200, b'{"accepted":%d}' % accepted, close=close))
+                await writer.drain()
+                if close:
+                    return
+        finally:
+            self._handlers.pop(task, None)
+            writer.close()
+
+
+def _response(status: int, body: bytes, close: bool = False) -> bytes:
+    reason = {200: 'OK', 400: 'Bad Request', 405: 'Method Not Allowed', 503: 'Service Unavailable'}[status]
+    return (f'HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: {"close" if close else "keep-alive"}\r\n\r\n'
+            ).encode('latin-1') + body
+
+
+def mesh_burst(count: int, copies: float = 2.0, seed: int = 0) -> list[MeshPacket]:
+    """[count] distinct SOS, each followed later by a geometric number of copies (mean [copies])."""
+    rng = random.Random(seed)
+    factory = PacketFactory(seed=seed)
+    arrivals: list[tuple[float, MeshPacket]] = []
+    p_more = copies / (copies + 1)
+    for i in range(count):
+        packet = factory.packet(hops=rng.randrange(4))
+        arrivals.append((i, packet))
+        while rng.random() < p_more:
+            arrivals.append((i + rng.expovariate(1 / 20), packet))
+    arrivals.sort(key=lambda a: a[0])
+    return [packet for _, packet in arrivals]
+
+
+async def run_burst(packets: list[MeshPacket], rate: float, config: GatewayConfig,
+                    outage: tuple[float, float] | None = None, spool: str | None = None,
+                    latency_s: float = 0.005) -> dict:
+    """Feeds [packets] at [rate] per second into a [Gateway] in front of a [StandInUplink].
+
+    [outage] is ``(start_s, duration_s)`` during which the backend answers 503.
+    """
+    async with StandInUplink(latency_s=latency_s) as server:
+        gateway = Gateway(server.url, config, spool=spool)
+        await gateway.start()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        async def toggle() -> None:
+            await asyncio.sleep(outage[0])
+            server.down = True
+            await asyncio.sleep(outage[1])
+            server.down = False
+
+        outage_task = asyncio.create_task(toggle()) if outage else None
+        for i, packet in enumerate(packets):
+            due = start + i / rate
+            if due > loop.time():
+                await asyncio.sleep(due - loop.time())
+            gateway.ingest(packet)
+        if outage_task is not None:
+            await outage_task
+        left = await gateway.close(timeout=60.0)
+        elapsed = loop.time() - start
+    report = gateway.stats.as_dict()
+    report.update({
+        'arrivals': len(packets),
+        'left': left,
+        'elapsed_s': elapsed,
+        'server_requests': server.requests,
+        'server_connections': server.connections,
+        'server_duplicates': server.duplicates,
+        'delivered': len(server.received),
+    })
+    return report
+
+
+def benchmark(count: int, rate: float, copies: float, outage: tuple[float, float] | None,
+              config: GatewayConfig, latency_s: float, seed: int = 0) -> dict[str, dict]:
+    """Per-packet POSTs vs. [config], both spooling to a temporary directory."""
+    packets = mesh_burst(count, copies, seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, variant in (('per-packet', PER_PACKET), ('batched', config)):
+            spool = os.path.join(tmp, f'{label}.spool')
+            results[label] = asyncio.run(run_burst(packets, rate, variant, outage, spool, latency_s))
+    return results
+
+
+def _parse_outage(text: str) -> tuple[float, float] | None:
+    if not text:
+        return None
+    start, _, duration = text.partition(':')
+    try:
+        return float(start), float(duration)
+    except ValueError:
+        raise ValueError(f'outage must be START:DURATION in seconds, got {text!r}') from None
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.gateway',
+        description='Batched, pooled SOS uplink for goal nodes, with a local stand-in backend.',
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def batching(p: argparse.ArgumentParser) -> None:
+        p.add_argument('--batch', type=int, default=GatewayConfig.max_batch, help='max SOS per request')
+        p.add_argument('--batch-bytes', type=int, default=GatewayConfig.max_bytes)
+        p.add_argument('--window-ms', type=float, default=GatewayConfig.window_s * 1000,
+                       help='max wait of the oldest queued SOS')
+        p.add_argument('--connections', type=int, default=GatewayConfig.connections)
+
+    bench = sub.add_parser('bench', help='per-packet vs. batched uploads of a mesh burst')
+    bench.add_argument('--count', type=int, default=5000, help='distinct SOS')
+    bench.add_argument('--rate', type=float, default=500.0, help='arrivals per second, copies included')
+    bench.add_argument('--copies', type=float, default=2.0, help='mean duplicate copies per SOS')
+    bench.add_argument('--outage', default='3:2', help='START:DURATION of a backend outage (s), empty for none')
+    bench.add_argument('--latency-ms', type=float, default=5.0, help='backend response time')
+    bench.add_argument('--seed', type=int, default=0)
+    bench.add_argument('--json', action='store_true')
+    batching(bench)
+
+    stand_in = sub.add_parser('stand-in', help='run the stand-in backend')
+    stand_in.add_argument('--host', default='127.0.0.1')
+    stand_in.add_argument('--port', type=int, default=8080)
+    stand_in.add_argument('--latency-ms', type=float, default=0.0)
+
+    serve = sub.add_parser('serve', help='accept mesh packets like a phone and upload the SOS')
+    serve.add_argument('--uplink', required=True, help='backend URL, e.g. http://127.0.0.1:8080/v1/sos')
+    serve.add_argument('--host', default='0.0.0.0')
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve.add_argument('--spool', help='on-disk queue for SOS while the uplink is down')
+    serve.add_argument('--durable', action='store_true', help='msync the spool on every write')
+    batching(serve)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'stand-in':
+        async def run_stand_in() -> None:
+            async with StandInUplink(args.host, args.port, args.latency_ms / 1000) as server:
+                print(f'stand-in backend on {server.url}', file=sys.stderr)
+                await asyncio.Event().wait()
+
+        try:
+            asyncio.run(run_stand_in())
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    try:
+        config = GatewayConfig(max_batch=args.batch, max_bytes=args.batch_bytes,
+                               window_s=args.window_ms / 1000, connections=args.connections)
+        if args.command == 'bench':
+            outage = _parse_outage(args.outage)
+            results = benchmark(args.count, args.rate, args.copies, outage, config,
+                                args.latency_ms / 1000, args.seed)
+        else:
+            gateway = Gateway(args.uplink, config, spool=args.spool, durable=args.durable)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.command == 'serve':
+        async def run_gateway() -> None:
+            async with gateway, MeshServer(gateway.ingest_json, host=args.host, port=args.port) as server:
+                print(f'gateway on :{server.port} -> {args.uplink}', file=sys.stderr)
+                await asyncio.Event().wait()
+
+        try:
+            asyncio.run(run_gateway())
+        except KeyboardInterrupt:
+            pass
+        print(json.dumps(gateway.stats.as_dict()), file=sys.stderr)
+        return 0
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    first = next(iter(results.values()))
+    print(f'{first["arrivals"]} arrivals ({args.count} distinct SOS) at {args.rate:g}/s, '
+          f'outage {args.outage or "none"}, backend {args.latency_ms:g} ms')
+    print(f'{"mode":<11} {"uploaded":>8} {"requests":>8} {"saved":>7} {"conns":>6} {"spooled":>8} '
+          f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}')
+    for label, r in results.items():
+        lat = r['latency_ms']
+        print(f'{label:<11} {r["uploaded"]:>8} {r["requests"]:>8} {r["requests_saved"]:>7} '
+              f'{r["connections"]:>6} {r["spooled"]:>8} {lat["p50"]:>8.1f} {lat["p95"]:>8.1f} '
+              f'{lat["p99"]:>8.1f} {lat["max"]:>8.1f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,459 @@
+"""Per-hop latency timeline from paired two-device captures.
+
+One SOS hop, as the sending phone logs it, runs through these phases:
+
+=============  ============================================================
+discovery      packet queued/received on this device -> ``CONNECT AND SEND``
+connect        ``CONNECT AND SEND`` -> ConnectionManager ``Group Formed: true``
+               (removeGroup BUSY wait and every ``connect()`` retry)
+dhcp_settle    ``Waiting Nms for client DHCP to settle`` -> next CM event (GO)
+arp_lookup     ARP / requestGroupInfo resolution until connected or scan start
+subnet_scan    ``Starting parallel subnet scan`` -> resolved or given up
+send           ``Connected, sending to IP`` -> ``Sent N bytes``
+ack            ``Sent N bytes`` -> ``ACK received`` / ``NAK received``
+=============  ============================================================
+
+The receiving phone's clock is aligned to the sender's from the packet
+exchanges both sides log: the sender's ``Sent N bytes`` (t1) and ``ACK
+received`` (t4) bracket the receiver's ``PACKET RECEIVED`` (t2 == t3, the
+ACK is written right after the log line), so ``offset = t2 - (t1 + t4) / 2``
+exactly as in NTP. The median over all matched exchanges is used.
+
+Usage::
+
+    python -m rescuenet_tools.latency d1_test.txt d2_test.txt
+    python -m rescuenet_tools.latency --pair d1_r6_logs.txt d2_r6_logs.txt \\
+        --pair d1_test.txt d2_test.txt --json after.json --compare before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import re
+import statistics
+import sys
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Sequence
+
+from .logcat import LogEvent, format_clock, iter_events
+from .stats import ascii_histogram, summarize
+
+PHASES = (
+    'discovery',
+    'connect',
+    'dhcp_settle',
+    'arp_lookup',
+    'subnet_scan',
+    'send',
+    'ack',
+)
+
+# Tags the timeline needs; everything else is skipped while streaming.
+TIMELINE_TAGS = ('WifiP2pHandler', 'ConnectionManager', 'SocketServer', 'flutter')
+
+# Receptions further than this from the matching send (in raw clock terms)
+# are not considered the same packet.
+DEFAULT_MAX_SKEW_S = 30.0
+
+_MAC = r'([0-9a-f]{2}(?::[0-9a-f]{2}){5})'
+_CONNECT_AND_SEND = re.compile(r'\W*CONNECT AND SEND$')
+_TARGET = re.compile(r'\s*Target: ' + _MAC)
+_PACKET_CHARS = re.compile(r'\s*Packet size: (\d+) chars')
+_CONNECT_ATTEMPT = re.compile(r'\W*connect\(\) attempt (\d+)/(\d+)')
+_CONNECT_ERROR = re.compile(r'\W*connect\(\) returned (\w+)')
+_GROUP_FORMED = re.compile(r'\s*Group Formed: true')
+_GROUP_OWNER = re.compile(r'\W*We are Group Owner')
+_DHCP_WAIT = re.compile(r'\W*Waiting (\d+)ms for client DHCP')
+_SUBNET_SCAN = re.compile(r'\W*Starting parallel subnet scan')
+_CONNECTED = re.compile(r'\W*CONNECTED \((client|GO) mode\)')
+_CM_FAILED = re.compile(r'\W*(Connection failed|Could not resolve client IP)')
+_SENDING = re.compile(r'\W*Connected, sending to IP: ([\d.]+)')
+_SENT = re.compile(r'\W*Sent (\d+) bytes, waiting for ACK')
+_ACK = re.compile(r'\W*ACK received')
+_NAK = re.compile(r'\W*NAK received')
+_SOCKET_ERROR = re.compile(r'\W*Socket error')
+_HANDLER_FAILED = re.compile(r'\W*Connection failed:')
+_BUSY_SKIP = re.compile(r'\W*connectAndSend skipped')
+_ENQUEUED = re.compile(r'\W*(Repository: Adding packet to outbox|PACKET RECEIVED \(\d+ bytes\))')
+_SERVER_EXPECTING = re.compile(r'\W*Expecting packet size: (\d+) bytes')
+_SERVER_RECEIVED = re.compile(r'\W*PACKET RECEIVED$')
+_FLUTTER_RECEIVED = re.compile(r'\W*PACKET RECEIVED \((\d+) bytes\)')
+
+
+@dataclass
+class Hop:
+    """One connect-and-send attempt as logged by the sending device."""
+
+    device: str
+    start: float
+    target: str | None = None
+    packet_chars: int | None = None
+    queued_at: float | None = None
+    role: str | None = None
+    connect_attempts: int = 0
+    connect_errors: int = 0
+    marks: dict[str, float] = field(default_factory=dict)
+    sent_bytes: int | None = None
+    outcome: str = 'incomplete'
+    # Receiver-side reception time, already on this device's clock.
+    delivered_at: float | None = None
+
+    @property
+    def end(self) -> float | None:
+        return self.marks.get('done')
+
+    @property
+    def total(self) -> float | None:
+        """Start-to-ACK time for successful hops."""
+        return self.end - self.start if self.outcome == 'ack' and self.end else None
+
+    def phases(self) -> dict[str, float]:
+        """Phase durations in seconds; phases the hop never reached are absent."""
+        m = self.marks
+        out: dict[str, float] = {}
+        if self.queued_at is not None:
+            out['discovery'] = self.start - self.queued_at
+        if 'group_formed' in m:
+            out['connect'] = m['group_formed'] - self.start
+        resolve_from = m.get('group_formed')
+        if 'dhcp_start' in m and 'dhcp_end' in m:
+            out['dhcp_settle'] = m['dhcp_end'] - m['dhcp_start']
+            resolve_from = m['dhcp_end']
+        resolved = m.get('resolved', m.get('resolve_failed'))
+        if resolve_from is not None:
+            arp_end = m.get('scan_start', resolved)
+            if arp_end is not None:
+                out['arp_lookup'] = max(0.0, arp_end - resolve_from)
+        if 'scan_start' in m and resolved is not None:
+            out['subnet_scan'] = resolved - m['scan_start']
+        if 'sending' in m and 'sent' in m:
+            out['send'] = m['sent'] - m['sending']
+        if 'sent' in m and 'done' in m and self.outcome in ('ack', 'nak'):
+            out['ack'] = m['done'] - m['sent']
+        return out
+
+
+@dataclass
+class Reception:
+    """A packet arrival as logged by the receiving device's socket server."""
+
+    device: str
+    ts: float
+    size: int
+    precise: bool  # SocketServer line (before ACK) vs. the later flutter line
+
+
+def extract_hops(events: Iterable[LogEvent], device: str) -> tuple[list[Hop], list[Reception], int]:
+    """Walks one device's events and returns ``(hops, receptions, busy_skips)``."""
+    hops: list[Hop] = []
+    receptions: list[Reception] = []
+    busy_skips = 0
+    current: Hop | None = None
+    last_queued: float | None = None
+    pending_size: int | None = None
+    # Flutter reception lines are only kept when no SocketServer line covers
+    # the same packet (the -s filters in older captures drop SocketServer).
+    last_precise: float = -math.inf
+
+    def close(hop: Hop, outcome: str, ts: float) -> None:
+        hop.outcome = outcome
+        hop.marks['done'] = ts
+
+    for e in events:
+        msg = e.message
+        if e.tag == 'WifiP2pHandler':
+            if _CONNECT_AND_SEND.match(msg):
+                current = Hop(device=device, start=e.ts, queued_at=last_queued)
+                hops.append(current)
+                continue
+            if _BUSY_SKIP.match(msg):
+                busy_skips += 1
+                continue
+            if current is None or current.end is not None:
+                continue
+            if (m := _TARGET.match(msg)) and current.target is None:
+                current.target = m.group(1)
+            elif (m := _PACKET_CHARS.match(msg)) and current.packet_chars is None:
+                current.packet_chars = int(m.group(1))
+            elif _SENDING.match(msg):
+                current.marks.setdefault('sending', e.ts)
+            elif m := _SENT.match(msg):
+                current.marks['sent'] = e.ts
+                current.sent_bytes = int(m.group(1))
+            elif _ACK.match(msg):
+                close(current, 'ack', e.ts)
+            elif _NAK.match(msg):
+                close(current, 'nak', e.ts)
+            elif _SOCKET_ERROR.match(msg):
+                close(current, 'socket_error', e.ts)
+            elif _HANDLER_FAILED.match(msg):
+                close(current, 'connect_failed', e.ts)
+
+        elif e.tag == 'ConnectionManager':
+            if current is None or current.end is not None:
+                continue
+            marks = current.marks
+            if 'dhcp_start' in marks and 'dhcp_end' not in marks:
+                marks['dhcp_end'] = e.ts
+            if _CONNECT_ATTEMPT.match(msg):
+                current.connect_attempts += 1
+            elif _CONNECT_ERROR.match(msg):
+                current.connect_errors += 1
+            elif _GROUP_FORMED.match(msg):
+                marks.setdefault('group_formed', e.ts)
+            elif _GROUP_OWNER.match(msg):
+                current.role = 'go'
+            elif _DHCP_WAIT.match(msg):
+                marks['dhcp_start'] = e.ts
+                marks.pop('dhcp_end', None)
+            elif _SUBNET_SCAN.match(msg):
+                marks.setdefault('scan_start', e.ts)
+            elif m := _CONNECTED.match(msg):
+                marks.setdefault('resolved', e.ts)
+                current.role = 'client' if m.group(1) == 'client' else 'go'
+            elif _CM_FAILED.match(msg):
+                marks.setdefault('resolve_failed', e.ts)
+
+        elif e.tag == 'SocketServer':
+            if m := _SERVER_EXPECTING.match(msg):
+                pending_size = int(m.group(1))
+            elif _SERVER_RECEIVED.match(msg) and pending_size is not None:
+                receptions.append(Reception(device, e.ts, pending_size, precise=True))
+                last_precise = e.ts
+                pending_size = None
+
+        elif e.tag == 'flutter':
+            if _ENQUEUED.match(msg):
+                last_queued = e.ts
+            if (m := _FLUTTER_RECEIVED.match(msg)) and e.ts - last_precise > 1.0:
+                receptions.append(Reception(device, e.ts, int(m.group(1)), precise=False))
+
+    return hops, receptions, busy_skips
+
+
+def _exchanges(
+    hops: Sequence[Hop],
+    receptions: Sequence[Reception],
+    max_skew: float,
+) -> Iterator[tuple[Hop, Reception]]:
+    """Pairs each acknowledged send with the closest same-size reception."""
+    used: set[int] = set()
+    for hop in hops:
+        if hop.outcome != 'ack' or hop.sent_bytes is None:
+            continue
+        t1 = hop.marks['sent']
+        best = None
+        for i, r in enumerate(receptions):
+            if i in used or r.size != hop.sent_bytes or abs(r.ts - t1) > max_skew:
+                continue
+            if best is None or abs(r.ts - t1) < abs(receptions[best].ts - t1):
+                best = i
+        if best is not None:
+            used.add(best)
+            yield hop, receptions[best]
+
+
+@dataclass
+class PairResult:
+    """Hops from a two-device capture, with B's clock aligned to A's."""
+
+    device_a: str
+    device_b: str
+    hops: list[Hop]
+    offset_b_minus_a: float | None
+    offset_spread: float | None
+    exchanges: int
+    busy_skips: int
+
+
+def correlate(
+    events_a: Iterable[LogEvent],
+    events_b: Iterable[LogEvent],
+    *,
+    name_a: str = 'A',
+    name_b: str = 'B',
+    max_skew: float = DEFAULT_MAX_SKEW_S,
+) -> PairResult:
+    """Extracts hops on both devices and aligns B's clock to A's."""
+    hops_a, recv_a, busy_a = extract_hops(events_a, name_a)
+    hops_b, recv_b, busy_b = extract_hops(events_b, name_b)
+
+    # Each estimate is offset(B - A): positive when B's clock runs ahead.
+    estimates: list[float] = []
+    a_to_b = list(_exchanges(hops_a, recv_b, max_skew))
+    b_to_a = list(_exchanges(hops_b, recv_a, max_skew))
+    for hop, r in a_to_b:
+        estimates.append(r.ts - (hop.marks['sent'] + hop.marks['done']) / 2)
+    for hop, r in b_to_a:
+        estimates.append(-(r.ts - (hop.marks['sent'] + hop.marks['done']) / 2))
+
+    offset = statistics.median(estimates) if estimates else None
+    spread = (max(estimates) - min(estimates)) if len(estimates) > 1 else None
+
+    if offset is not None:
+        for hop, r in a_to_b:
+            hop.delivered_at = r.ts - offset
+        for hop, r in b_to_a:
+            hop.delivered_at = r.ts + offset
+        # Report every hop on A's clock so the timeline reads in one time base.
+        for hop in hops_b:
+            _shift(hop, -offset)
+
+    hops = sorted(hops_a + hops_b, key=lambda h: h.start)
+    return PairResult(
+        name_a, name_b, hops, offset, spread,
+        len(a_to_b) + len(b_to_a), busy_a + busy_b,
+    )
+
+
+def _shift(hop: Hop, delta: float) -> None:
+    hop.start += delta
+    if hop.queued_at is not None:
+        hop.queued_at += delta
+    if hop.delivered_at is not None:
+        hop.delivered_at += delta
+    hop.marks = {k: v + delta for k, v in hop.marks.items()}
+
+
+def correlate_files(
+    path_a: str,
+    path_b: str,
+    *,
+    year: int | None = None,
+    max_skew: float = DEFAULT_MAX_SKEW_S,
+) -> PairResult:
+    """[correlate] over two capture files, streaming each once."""
+    return correlate(
+        iter_events(path_a, tags=TIMELINE_TAGS, year=year),
+        iter_events(path_b, tags=TIMELINE_TAGS, year=year),
+        name_a=path_a,
+        name_b=path_b,
+        max_skew=max_skew,
+    )
+
+
+def phase_report(hops: Iterable[Hop]) -> dict[str, dict[str, float]]:
+    """Per-phase summaries (seconds) plus ``total`` and outcome counts."""
+    hops = list(hops)
+    samples: dict[str, list[float]] = {p: [] for p in PHASES}
+    for hop in hops:
+        for phase, value in hop.phases().items():
+            samples[phase].append(value)
+    report = {p: summarize(v) for p, v in samples.items()}
+    report['total'] = summarize(h.total for h in hops if h.total is not None)
+    outcomes: dict[str, float] = {}
+    for hop in hops:
+        outcomes[hop.outcome] = outcomes.get(hop.outcome, 0) + 1
+    outcomes['connect_attempts'] = sum(h.connect_attempts for h in hops)
+    outcomes['connect_errors'] = sum(h.connect_errors for h in hops)
+    report['outcomes'] = outcomes
+    return report
+
+
+def _fmt(value: float) -> str:
+    return '      -' if value is None or math.isnan(value) else f'{value:7.3f}'
+
+
+def format_report(
+    report: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]] | None = None,
+) -> str:
+    lines = [f'{"phase":<12} {"n":>4} {"p50":>7} {"p95":>7} {"p99":>7} {"mean":>7}'
+             + ('   d.p50   d.p95' if baseline else '')]
+    for phase in (*PHASES, 'total'):
+        s = report[phase]
+        row = (f'{phase:<12} {s["count"]:>4} {_fmt(s["p50"])} {_fmt(s["p95"])} '
+               f'{_fmt(s["p99"])} {_fmt(s["mean"])}')
+        if baseline and phase in baseline:
+            b = baseline[phase]
+            row += f' {_fmt(s["p50"] - b["p50"])} {_fmt(s["p95"] - b["p95"])}'
+        lines.append(row)
+    outcomes = ', '.join(f'{k}={int(v)}' for k, v in report['outcomes'].items())
+    lines.append(f'outcomes: {outcomes}')
+    return '\n'.join(lines)
+
+
+def format_timeline(result: PairResult) -> str:
+    lines = []
+    for hop in result.hops:
+        phases = hop.phases()
+        sender = result.device_a if hop.device == result.device_a else result.device_b
+        detail = ' '.join(f'{p}={phases[p]:.3f}' for p in PHASES if p in phases)
+        delivered = (f' delivered@{format_clock(hop.delivered_at)}'
+                     if hop.delivered_at is not None else '')
+        lines.append(
+            f'{format_clock(hop.start)} {sender} -> {hop.target or "?"} '
+            f'[{hop.outcome}, role={hop.role or "?"}, attempts={hop.connect_attempts}] '
+            f'{detail}{delivered}'
+        )
+    return '\n'.join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.latency',
+        description='Per-hop connect-to-ACK latency from paired device captures.',
+    )
+    parser.add_argument('files', nargs='*', help='one capture pair: A.txt B.txt')
+    parser.add_argument('--pair', nargs=2, action='append', default=[],
+                        metavar=('A', 'B'), help='additional capture pair (repeatable)')
+    parser.add_argument('--year', type=int)
+    parser.add_argument('--max-skew', type=float, default=DEFAULT_MAX_SKEW_S,
+                        help='max raw clock difference when matching packets (s)')
+    parser.add_argument('--timeline', action='store_true', help='print every hop')
+    parser.add_argument('--histogram', action='store_true',
+                        help='print a text histogram per phase')
+    parser.add_argument('--json', dest='json_out', help='write the report as JSON')
+    parser.add_argument('--compare', help='earlier --json report to diff against')
+    args = parser.parse_args(argv)
+
+    pairs = [tuple(p) for p in args.pair]
+    if args.files:
+        if len(args.files) != 2:
+            parser.error('positional arguments must be exactly one A/B pair')
+        pairs.insert(0, tuple(args.files))
+    if not pairs:
+        parser.error('no capture pair given')
+
+    all_hops: list[Hop] = []
+    for a, b in pairs:
+        result = correlate_files(a, b, year=args.year, max_skew=args.max_skew)
+        all_hops.extend(result.hops)
+        if result.offset_b_minus_a is None:
+            print(f'{a} / {b}: no matched exchanges, clocks left unaligned')
+        else:
+            spread = (f' (spread {result.offset_spread * 1000:.0f} ms)'
+                      if result.offset_spread is not None else '')
+            print(f'{a} / {b}: offset B-A = {result.offset_b_minus_a * 1000:+.0f} ms '
+                  f'from {result.exchanges} exchanges{spread}, '
+                  f'{result.busy_skips} busy skips')
+        if args.timeline:
+            print(format_timeline(result))
+
+    report = phase_report(all_hops)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+
+    if args.histogram:
+        samples: dict[str, list[float]] = {p: [] for p in PHASES}
+        for hop in all_hops:
+            for phase, value in hop.phases().items():
+                samples[phase].append(value)
+        for phase in PHASES:
+            if samples[phase]:
+                print(f'\n{phase} (s)')
+                print('\n'.join(ascii_histogram(samples[phase])))
+
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, allow_nan=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
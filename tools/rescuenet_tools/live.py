@@ -0,0 +1,540 @@
+"""Live metrics dashboard over growing logcat streams.
+
+``capture_logs.ps1`` sleeps 150 s before it writes anything, so nothing
+is known while an exercise is running. This module follows one or more
+streams as they grow: a capture file being appended to, or ``-`` for
+logcat piped into stdin. It refreshes a terminal dashboard per device at
+least once a second. Each stream can have a label: ``oppo=d1_log.txt``.
+
+Per device it counts, over a rolling window and since start:
+
+``discovery``
+    ``SERVICE FOUND`` callbacks (WifiP2pHandler);
+``attempts`` / ``failures``
+    ``connect() attempt n/m`` and ``connect() returned <code>``
+    (ConnectionManager), with failures broken down by code;
+``ack`` / ``nak``
+    the sender's ``ACK received`` / ``NAK received`` (WifiP2pHandler);
+``received``
+    ``Packet received from socket`` (WifiP2pHandler, once per packet);
+``pauses``
+    RelayOrchestrator's ``Pausing after 3 consecutive failures``.
+
+All of these come from tags in ``capture_logs.ps1``'s filter except the
+pause line. That line is the orchestrator's activity message, which
+reaches logcat only when something prints the activity stream.
+
+Windows are rings of [bucket_s]-wide buckets keyed by the log's own
+clock, so memory stays the same however long the stream runs. A file is
+polled with ``stat`` and only its new bytes are read. A partial last
+line waits for the rest, and a file that shrinks (``logcat -c``, a new
+capture) is read again from the start.
+
+Usage::
+
+    adb -s 6XOZ9X599HB6RKCA logcat -v time | python -m rescuenet_tools.live oppo=-
+    python -m rescuenet_tools.live d1=%TEMP%/d1_log.txt d2=%TEMP%/d2_log.txt --window 120
+    python -m rescuenet_tools.live ../device1_oppo_logs.txt ../device2_redmi_logs.txt --once
+    python -m rescuenet_tools.live --bench 4 --duration 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Iterable, TextIO
+
+from .archive import device_label
+from .logcat import LogEvent, detect_encoding, format_clock, parse_line
+
+METRICS = ('discovery', 'attempts', 'failures', 'ack', 'nak', 'received', 'pauses')
+
+_SERVICE_FOUND = re.compile(r'\W*SERVICE FOUND')
+_CONNECT_ATTEMPT = re.compile(r'\W*connect\(\) attempt \d+/\d+')
+_CONNECT_ERROR = re.compile(r'\W*connect\(\) returned (\w+)')
+_ACK = re.compile(r'\W*ACK received')
+_NAK = re.compile(r'\W*NAK received')
+_RECEIVED = re.compile(r'\W*Packet received from socket')
+# RelayOrchestrator._emitActivity(RelayActivityType.paused, ...), also as RelayActivity.toString().
+_PAUSED = re.compile(r'(\[paused\] )?Pausing after \d+ consecutive failures')
+
+_NEWLINES = {'utf-16-le': b'\n\x00', 'utf-16-be': b'\x00\n'}
+
+
+def classify(event: LogEvent) -> tuple[str, str | None] | None:
+    """``(metric, failure code)`` for a line that feeds the dashboard, else None."""
+    tag, message = event.tag, event.message
+    if tag == 'WifiP2pHandler':
+        if _SERVICE_FOUND.match(message):
+            return 'discovery', None
+        if _RECEIVED.match(message):
+            return 'received', None
+        if _ACK.match(message):
+            return 'ack', None
+        if _NAK.match(message):
+            return 'nak', None
+    elif tag == 'ConnectionManager':
+        if _CONNECT_ATTEMPT.match(message):
+            return 'attempts', None
+        m = _CONNECT_ERROR.match(message)
+        if m:
+            return 'failures', m.group(1)
+    if _PAUSED.search(message):
+        return 'pauses', None
+    return None
+
+
+class RollingWindow:
+    """Counts per metric over the last [window_s] of log time, in a ring of buckets."""
+
+    def __init__(self, window_s: float = 60.0, bucket_s: float = 1.0) -> None:
+        if bucket_s <= 0 or window_s < bucket_s:
+            raise ValueError(f'need 0 < bucket_s <= window_s, got {bucket_s}, {window_s}')
+        self.window_s = window_s
+        self.bucket_s = bucket_s
+        self.size = round(window_s / bucket_s)
+        self._stamps = [-1] * self.size
+        self._counts = [[0] * len(METRICS) for _ in range(self.size)]
+        self._codes: list[Counter | None] = [None] * self.size
+
+    def add(self, ts: float, metric: int, code: str | None = None) -> bool:
+        """Counts one [metric] (an index into [METRICS]) at [ts]; False if [ts] left the ring."""
+        stamp = int(ts // self.bucket_s)
+        slot = stamp % self.size
+        current = self._stamps[slot]
+        if current != stamp:
+            if current > stamp:
+                return False
+            self._stamps[slot] = stamp
+            self._counts[slot] = [0] * len(METRICS)
+            self._codes[slot] = None
+        self._counts[slot][metric] += 1
+        if code is not None:
+            codes = self._codes[slot]
+            if codes is None:
+                codes = self._codes[slot] = Counter()
+            codes[code] += 1
+        return True
+
+    def totals(self, now: float) -> tuple[list[int], Counter]:
+        """Counts and failure codes over the window ending at [now]."""
+        last = int(now // self.bucket_s)
+        counts, codes = [0] * len(METRICS), Counter()
+        for slot, stamp in enumerate(self._stamps):
+            if last - self.size < stamp <= last:
+                for i, n in enumerate(self._counts[slot]):
+                    counts[i] += n
+                if self._codes[slot]:
+                    codes.update(self._codes[slot])
+        return counts, codes
+
+
+class DeviceMetrics:
+    """Rolling and since-start counts for one stream."""
+
+    def __init__(self, label: str, window_s: float = 60.0, bucket_s: float = 1.0) -> None:
+        self.label = label
+        self.window = RollingWindow(window_s, bucket_s)
+        self.total = [0] * len(METRICS)
+        self.codes: Counter = Counter()
+        self.lines = 0
+        self.first_ts: float | None = None
+        self.last_ts: float | None = None
+        self.last_wall: float | None = None  # when the stream last produced a line
+
+    def feed(self, event: LogEvent, wall: float) -> None:
+        self.lines += 1
+        self.last_wall = wall
+        if self.first_ts is None:
+            self.first_ts = event.ts
+        if self.last_ts is None or event.ts > self.last_ts:
+            self.last_ts = event.ts
+        hit = classify(event)
+        if hit is None:
+            return
+        metric, code = hit
+        index = METRICS.index(metric)
+        self.total[index] += 1
+        if code is not None:
+            self.codes[code] += 1
+        self.window.add(event.ts, index, code)
+
+    def snapshot(self) -> dict:
+        now = self.last_ts if self.last_ts is not None else 0.0
+        counts, codes = self.window.totals(now)
+        span = self.window.window_s
+        if self.first_ts is not None:
+            span = max(self.window.bucket_s, min(span, now - self.first_ts))
+        window = dict(zip(METRICS, counts))
+        answered = window['ack'] + window['nak']
+        return {
+            'device': self.label,
+            'lines': self.lines,
+            'log_time': format_clock(now) if self.last_ts is not None else None,
+            'window': window,
+            'window_codes': dict(codes.most_common()),
+            'discovery_per_min': window['discovery'] * 60.0 / span,
+            'ack_ratio': window['ack'] / answered if answered else None,
+            'total': dict(zip(METRICS, self.total)),
+            'codes': dict(self.codes.most_common()),
+        }
+
+
+class LineSplitter:
+    """Turns chunks of a capture's bytes into complete decoded lines."""
+
+    def __init__(self) -> None:
+        self.encoding: str | None = None
+        self._buf = b''
+
+    def feed(self, data: bytes) -> list[str]:
+        buf = self._buf + data
+        if self.encoding is None:
+            if len(buf) < 4 and b'\n' not in buf:
+                self._buf = buf
+                return []
+            self.encoding, bom = detect_encoding(buf[:512])
+            buf = buf[bom:]
+        newline = _NEWLINES.get(self.encoding, b'\n')
+        aligned = len(newline) == 2
+        lines, pos = [], 0
+        while True:
+            idx = buf.find(newline, pos)
+            while aligned and idx >= 0 and (idx - pos) & 1:
+                idx = buf.find(newline, idx + 1)
+            if idx < 0:
+                break
+            lines.append(buf[pos:idx].decode(self.encoding, errors='replace').rstrip('\r'))
+            pos = idx + len(newline)
+        self._buf = buf[pos:]
+        return lines
+
+    def reset(self) -> None:
+        self.encoding = None
+        self._buf = b''
+
+
+class FileTail:
+    """New lines of a file that is being appended to."""
+
+    def __init__(self, path: str, from_end: bool = False, max_read: int = 1 << 20) -> None:
+        self.path = path
+        self.max_read = max_read
+        self.splitter = LineSplitter()
+        self._f = None
+        self._inode = None
+        self.pos = 0
+        self.restarts = 0
+        if from_end and os.path.exists(path):
+            self._open()
+            head = self._f.read(512)  # the encoding, from the existing head
+            if head:
+                self.splitter.encoding = detect_encoding(head)[0]
+            self.pos = os.fstat(self._f.fileno()).st_size
+
+    def _open(self) -> None:
+        self._f = open(self.path, 'rb')
+        self._inode = os.fstat(self._f.fileno()).st_ino
+
+    def poll(self) -> list[str]:
+        """Reads at most [max_read] new bytes; complete lines only."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+        if self._f is None or st.st_ino != self._inode or st.st_size < self.pos:
+            if self._f is not None:
+                self._f.close()
+                self.restarts += 1
+            self._open()
+            self.pos = 0
+            self.splitter.reset()
+        if st.st_size == self.pos:
+            return []
+        self._f.seek(self.pos)
+        data = self._f.read(min(self.max_read, st.st_size - self.pos))
+        self.pos += len(data)
+        return self.splitter.feed(data)
+
+    @property
+    def at_end(self) -> bool:
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return True
+        return size == (self.pos if self._f is not None else 0)
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+
+
+class StreamTail:
+    """Lines of a pipe such as stdin, read by a background thread."""
+
+    def __init__(self, stream) -> None:
+        self.splitter = LineSplitter()
+        self._chunks: queue.SimpleQueue = queue.SimpleQueue()
+        self.closed = False
+        self._thread = threading.Thread(target=self._read, args=(stream,), daemon=True)
+        self._thread.start()
+
+    def _read(self, stream) -> None:
+        read = getattr(stream, 'read1', stream.read)
+        while True:
+            chunk = read(65536)
+            if not chunk:
+                break
+            self._chunks.put(chunk)
+        self._chunks.put(None)
+
+    def poll(self) -> list[str]:
+        data = []
+        while True:
+            try:
+                chunk = self._chunks.get_nowait()
+            except queue.Empty:
+                break
+            if chunk is None:
+                self.closed = True
+                data.append(b'\n')  # flush a last line without a terminator
+                break
+            data.append(chunk)
+        return self.splitter.feed(b''.join(data)) if data else []
+
+    @property
+    def at_end(self) -> bool:
+        return self.closed
+
+    def close(self) -> None:
+        pass
+
+
+def parse_sources(specs: Iterable[str]) -> list[tuple[str, str]]:
+    """``(label, path)`` for each ``label=path``, ``path`` or ``-`` argument."""
+    sources = []
+    for spec in specs:
+        label, sep, path = spec.partition('=')
+        if not sep or os.path.exists(spec):
+            label, path = ('stdin' if spec == '-' else device_label(spec)), spec
+        if not path:
+            raise ValueError(f'no path in {spec!r}')
+        sources.append((label, path))
+    labels = Counter(label for label, _ in sources)
+    seen: Counter = Counter()
+    unique = []
+    for label, path in sources:
+        if labels[label] > 1:
+            seen[label] += 1
+            label = f'{label}#{seen[label]}'
+        unique.append((label, path))
+    if sum(path == '-' for _, path in unique) > 1:
+        raise ValueError('stdin can only be one of the sources')
+    return unique
+
+
+class LiveView:
+    """Reads every source once per [poll] and keeps one [DeviceMetrics] per source."""
+
+    def __init__(self, sources: list[tuple[str, str]], window_s: float = 60.0, bucket_s: float = 1.0,
+                 year: int | None = None, from_end: bool = False, stdin=None) -> None:
+        self.year = year
+        self.tails = []
+        self.devices = []
+        for label, path in sources:
+            tail = StreamTail(stdin or sys.stdin.buffer) if path == '-' else FileTail(path, from_end)
+            self.tails.append(tail)
+            self.devices.append(DeviceMetrics(label, window_s, bucket_s))
+        self.started = time.monotonic()
+
+    def poll(self) -> int:
+        """Feeds all new lines; returns how many were read."""
+        wall = time.monotonic()
+        read = 0
+        for tail, device in zip(self.tails, self.devices):
+            for line in tail.poll():
+                read += 1
+                event = parse_line(line, self.year)
+                if event is not None:
+                    device.feed(event, wall)
+        return read
+
+    @property
+    def at_end(self) -> bool:
+        return all(t.at_end for t in self.tails)
+
+    def snapshot(self) -> list[dict]:
+        return [d.snapshot() for d in self.devices]
+
+    def render(self) -> str:
+        now = time.monotonic()
+        window_s = self.devices[0].window.window_s if self.devices else 0
+        out = [f'RescueNet live  {time.strftime("%H:%M:%S")}  window {window_s:g} s  '
+               f'(window / since start)', '']
+        out.append(f'{"device":<12} {"log time":<18} {"idle":>5} {"disc/min":>8} {"attempts":>9} '
+                   f'{"failures":>9} {"ack":>7} {"nak":>7} {"ack%":>5} {"rx":>7} {"pauses":>7}')
+        for device in self.devices:
+            s = device.snapshot()
+            w, t = s['window'], s['total']
+            idle = '-' if device.last_wall is None else f'{now - device.last_wall:.0f}s'
+            ratio = '-' if s['ack_ratio'] is None else f'{s["ack_ratio"] * 100:.0f}'
+
+            def both(name: str) -> str:
+                return f'{w[name]}/{t[name]}'
+
+            out.append(f'{device.label[:12]:<12} {s["log_time"] or "-":<18} {idle:>5} '
+                       f'{s["discovery_per_min"]:>8.1f} {both("attempts"):>9} {both("failures"):>9} '
+                       f'{both("ack"):>7} {both("nak"):>7} {ratio:>5} {both("received"):>7} {both("pauses"):>7}')
+            if s['codes']:
+                codes = ', '.join(f'{code} {s["window_codes"].get(code, 0)}/{n}' for code, n in s['codes'].items())
+                out.append(f'{"":<12} connect() failures: {codes}')
+        return '\n'.join(out)
+
+    def close(self) -> None:
+        for tail in self.tails:
+            tail.close()
+
+
+CLEAR = '\x1b[H\x1b[2J'
+
+
+def run(view: LiveView, out: TextIO, interval_s: float = 1.0, duration_s: float | None = None,
+        once: bool = False, clear: bool = True, poll_s: float = 0.25) -> dict:
+    """Polls every [poll_s] and redraws every [interval_s] until stopped.
+
+    With [once], returns after the sources are read to their end (stdin
+    closed); with [duration_s], after that long. Returns the CPU use of
+    this thread.
+    """
+    start, cpu0 = time.monotonic(), time.thread_time()
+    next_draw = start
+    try:
+        while True:
+            view.poll()
+            now = time.monotonic()
+            done = once and view.at_end or duration_s is not None and now - start >= duration_s
+            if now >= next_draw or done:
+                out.write((CLEAR if clear else '') + view.render() + '\n')
+                out.flush()
+                next_draw = now + interval_s
+            if done:
+                break
+            time.sleep(poll_s)
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.monotonic() - start
+    cpu = time.thread_time() - cpu0
+    return {'wall_s': elapsed, 'cpu_s': cpu, 'cpu_pct': cpu / elapsed * 100 if elapsed else 0.0}
+
+
+def _append_lines(paths: list[str], lines: list[str], lines_per_s: float, stop: threading.Event) -> None:
+    """Appends [lines] round-robin to each of [paths] at [lines_per_s] per file."""
+    files = [open(p, 'a', encoding='utf-8', newline='\r\n') for p in paths]
+    try:
+        i, step = 0, 0.1
+        per_step = max(1, round(lines_per_s * step))
+        while not stop.is_set():
+            for f in files:
+                f.write(''.join(lines[(i + k) % len(lines)] + '\n' for k in range(per_step)))
+                f.flush()
+            i += per_step
+            stop.wait(step)
+    finally:
+        for f in files:
+            f.close()
+
+
+def benchmark(devices: int, duration_s: float, lines_per_s: float, capture: str,
+              interval_s: float = 1.0) -> dict:
+    """CPU of the dashboard loop while [devices] files each grow by [lines_per_s]."""
+    from .logcat import iter_events
+    lines = [f'{format_clock(e.ts)} {e.level}/{e.tag}({e.pid:5d}): {e.message}' for e in iter_events(capture)]
+    if not lines:
+        raise ValueError(f'no logcat lines in {capture}')
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f'd{i + 1}.txt') for i in range(devices)]
+        for p in paths:
+            open(p, 'w').close()
+        stop = threading.Event()
+        writer = threading.Thread(target=_append_lines, args=(paths, lines, lines_per_s, stop), daemon=True)
+        writer.start()
+        view = LiveView([(f'd{i + 1}', p) for i, p in enumerate(paths)])
+        try:
+            with open(os.devnull, 'w') as sink:
+                usage = run(view, sink, interval_s, duration_s)
+        finally:
+            stop.set()
+            writer.join()
+            view.poll()
+            view.close()
+        read = sum(d.lines for d in view.devices)
+    return {'devices': devices, 'lines_per_s_per_device': lines_per_s, 'lines_read': read, **usage}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.live',
+        description='Live per-device mesh metrics from growing logcat streams.',
+    )
+    parser.add_argument('sources', nargs='*', help='[label=]path, or - for stdin')
+    parser.add_argument('--window', type=float, default=60.0, help='rolling window in seconds of log time')
+    parser.add_argument('--bucket', type=float, default=1.0, help='window resolution in seconds')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between redraws')
+    parser.add_argument('--year', type=int)
+    parser.add_argument('--from-end', action='store_true', help='skip what the files already hold')
+    parser.add_argument('--once', action='store_true', help='stop at the end of the sources')
+    parser.add_argument('--duration', type=float, help='stop after this many seconds')
+    parser.add_argument('--no-clear', action='store_true', help='append redraws instead of clearing the screen')
+    parser.add_argument('--json', action='store_true', help='with --once: print the final metrics as JSON')
+    parser.add_argument('--bench', type=int, metavar='DEVICES',
+                        help='measure CPU while DEVICES files grow (uses the first source as line pool)')
+    parser.add_argument('--bench-rate', type=float, default=50.0, help='lines per second per device')
+    args = parser.parse_args(argv)
+
+    if args.interval > 1.0:
+        parser.error('--interval must be at most 1 second')
+    if args.bench:
+        here = os.path.dirname(os.path.abspath(__file__))
+        capture = args.sources[0] if args.sources else os.path.join(here, '..', '..', 'device1_oppo_logs.txt')
+        try:
+            report = benchmark(args.bench, args.duration or 10.0, args.bench_rate, capture, args.interval)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print(f'{report["devices"]} devices x {report["lines_per_s_per_device"]:g} lines/s: '
+                  f'{report["lines_read"]} lines in {report["wall_s"]:.1f} s, '
+                  f'dashboard CPU {report["cpu_s"]:.2f} s ({report["cpu_pct"]:.1f}%)')
+        return 0
+    if not args.sources:
+        parser.error('give at least one source')
+    try:
+        view = LiveView(parse_sources(args.sources), args.window, args.bucket, args.year, args.from_end)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        if args.json and args.once:
+            while not view.at_end:
+                view.poll()
+                time.sleep(0.05)
+            view.poll()
+            print(json.dumps(view.snapshot(), indent=2))
+            return 0
+        clear = not args.no_clear and sys.stdout.isatty()
+        run(view, sys.stdout, args.interval, args.duration, args.once, clear)
+    finally:
+        view.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,319 @@
+"""Load generator and throughput benchmark for the packet receive path.
+
+Replays MeshPacket JSON against anything that speaks the size+CRC32+ACK
+protocol (a phone's ``SocketServerManager`` on port 8888, or
+``rescuenet_tools.wire serve`` on a command-post laptop). Each packet uses
+its own connection, exactly like ``WifiP2pHandler.connectAndSendPacket``.
+
+Sends are open-loop when ``--rate`` is set: packet *i* is due at
+``start + i / rate`` whether or not earlier ones have finished, bounded by
+``--concurrency`` in-flight connections. Latency is measured from connect
+to the reply byte; ``queue`` is how far a send started after its due time,
+which is where an overloaded receiver shows up first.
+
+Without ``--target`` a stand-in ``MeshServer`` is started in a child
+process so the receiver does not share the generator's event loop.
+
+Usage::
+
+    python -m rescuenet_tools.loadgen --count 5000 --concurrency 64
+    python -m rescuenet_tools.loadgen --target 192.168.49.1:8888 --rate 50 --duration 30
+    python -m rescuenet_tools.loadgen --input packets.jsonl --bad-crc 0.01 --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+from .packets import PacketFactory
+from .stats import summarize
+from .wire import (
+    ACK,
+    ACK_TIMEOUT_S,
+    CONNECT_TIMEOUT_S,
+    DEFAULT_PORT,
+    HEADER,
+    MeshServer,
+    crc32,
+    encode_frame,
+)
+
+OUTCOMES = ('ack', 'nak', 'timeout', 'closed', 'refused', 'error')
+
+
+@dataclass
+class LoadConfig:
+    host: str = '127.0.0.1'
+    port: int = DEFAULT_PORT
+    concurrency: int = 16
+    rate: float = 0.0  # packets/s; 0 sends as fast as [concurrency] allows
+    count: int | None = 1000
+    duration: float | None = None  # seconds; stops issuing new sends after this
+    connect_timeout: float = CONNECT_TIMEOUT_S
+    ack_timeout: float = ACK_TIMEOUT_S
+    bad_crc: float = 0.0  # fraction of frames sent with a flipped CRC bit
+    seed: int = 0
+
+
+@dataclass
+class LoadResult:
+    """Outcome counts and timing samples (seconds) from one run."""
+
+    outcomes: Counter = field(default_factory=Counter)
+    latencies: list[float] = field(default_factory=list)
+    connect_times: list[float] = field(default_factory=list)
+    queue_delays: list[float] = field(default_factory=list)
+    bytes_acked: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def sent(self) -> int:
+        return sum(self.outcomes.values())
+
+    @property
+    def throughput(self) -> float:
+        """ACKed packets per second over the whole run."""
+        return self.outcomes['ack'] / self.elapsed if self.elapsed else 0.0
+
+    def report(self) -> dict:
+        return {
+            'sent': self.sent,
+            'outcomes': {k: self.outcomes[k] for k in OUTCOMES},
+            'elapsed_s': self.elapsed,
+            'acked_per_s': self.throughput,
+            'acked_kib_per_s': self.bytes_acked / 1024 / self.elapsed if self.elapsed else 0.0,
+            'ack_latency_ms': _ms(summarize(self.latencies)),
+            'connect_ms': _ms(summarize(self.connect_times)),
+            'queue_ms': _ms(summarize(self.queue_delays)),
+        }
+
+
+def _ms(summary: dict[str, float]) -> dict[str, float]:
+    return {k: (v if k == 'count' else v * 1000) for k, v in summary.items()}
+
+
+def _frame(data: bytes, corrupt: bool) -> bytes:
+    if not corrupt:
+        return encode_frame(data)
+    return HEADER.pack(len(data), crc32(data) ^ 1) + data
+
+
+async def _send_one(config: LoadConfig, frame: bytes, result: LoadResult) -> None:
+    t0 = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(config.host, config.port), config.connect_timeout,
+        )
+    except asyncio.TimeoutError:
+        result.outcomes['timeout'] += 1
+        return
+    except ConnectionRefusedError:
+        result.outcomes['refused'] += 1
+        return
+    except OSError:
+        result.outcomes['error'] += 1
+        return
+
+    t_connected = time.perf_counter()
+    try:
+        writer.write(frame)
+        await writer.drain()
+        reply = await asyncio.wait_for(reader.readexactly(1), config.ack_timeout)
+    except asyncio.TimeoutError:
+        result.outcomes['timeout'] += 1
+        return
+    except asyncio.IncompleteReadError:
+        result.outcomes['closed'] += 1
+        return
+    except OSError:
+        result.outcomes['error'] += 1
+        return
+    finally:
+        writer.close()
+
+    done = time.perf_counter()
+    if reply[0] == ACK:
+        result.outcomes['ack'] += 1
+        result.bytes_acked += len(frame) - HEADER.size
+    else:
+        result.outcomes['nak'] += 1
+    result.latencies.append(done - t0)
+    result.connect_times.append(t_connected - t0)
+
+
+async def run_load(config: LoadConfig, payloads: Iterable[bytes]) -> LoadResult:
+    """Sends [payloads] (cycled if shorter than the run) per [config]."""
+    result = LoadResult()
+    rng = random.Random(config.seed)
+    slots = asyncio.Semaphore(config.concurrency)
+    tasks: set[asyncio.Task] = set()
+
+    source: Iterator[bytes] = itertools.cycle(payloads)
+    if config.count is not None:
+        source = itertools.islice(source, config.count)
+
+    start = time.perf_counter()
+    deadline = start + config.duration if config.duration else None
+
+    async def one(frame: bytes, due: float) -> None:
+        try:
+            result.queue_delays.append(max(0.0, time.perf_counter() - due))
+            await _send_one(config, frame, result)
+        finally:
+            slots.release()
+
+    for i, data in enumerate(source):
+        due = start + i / config.rate if config.rate > 0 else time.perf_counter()
+        if deadline is not None and due >= deadline:
+            break
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await slots.acquire()
+        if deadline is not None and time.perf_counter() >= deadline:
+            slots.release()
+            break
+        task = asyncio.create_task(one(_frame(data, rng.random() < config.bad_crc), due))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def load_payloads(path: str) -> list[bytes]:
+    """One packet per line (JSON lines as written by ``wire serve --out``)."""
+    with open(path, 'rb') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def generate_payloads(count: int, seed: int = 0) -> list[bytes]:
+    factory = PacketFactory(seed=seed)
+    return [p.to_json_string().encode('utf-8') for p in factory.packets(count)]
+
+
+def _serve_in_child(port_queue: multiprocessing.Queue, stop: multiprocessing.Event,
+                    sessions: bool = False) -> None:
+    async def serve() -> None:
+        async with MeshServer(host='127.0.0.1', port=0, sessions=sessions) as server:
+            port_queue.put(server.port)
+            while not stop.is_set():
+                await asyncio.sleep(0.05)
+            port_queue.put(server.stats.as_dict())
+
+    asyncio.run(serve())
+
+
+class LocalServer:
+    """Stand-in receiver on 127.0.0.1 in a child process (context manager).
+
+    After exit, [stats] holds the server's ``ServerStats`` as a dict.
+    [sessions] enables multi-packet connections (see ``MeshServer``).
+    """
+
+    def __init__(self, sessions: bool = False) -> None:
+        ctx = multiprocessing.get_context('spawn')
+        self._queue = ctx.Queue()
+        self._stop = ctx.Event()
+        self._process = ctx.Process(target=_serve_in_child,
+                                    args=(self._queue, self._stop, sessions), daemon=True)
+        self.port = 0
+        self.stats: dict[str, int] = {}
+
+    def __enter__(self) -> LocalServer:
+        self._process.start()
+        self.port = self._queue.get(timeout=30)
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._stop.set()
+        try:
+            self.stats = self._queue.get(timeout=10)
+        finally:
+            self._process.join(timeout=10)
+            if self._process.is_alive():
+                self._process.terminate()
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        f'sent {report["sent"]} in {report["elapsed_s"]:.2f} s  '
+        f'-> {report["acked_per_s"]:.1f} ACKed/s ({report["acked_kib_per_s"]:.1f} KiB/s)',
+        '  ' + '  '.join(f'{k}={v}' for k, v in report['outcomes'].items()),
+        f'  {"":<12} {"p50":>8} {"p95":>8} {"p99":>8} {"max":>8}  (ms)',
+    ]
+    for key in ('ack_latency_ms', 'connect_ms', 'queue_ms'):
+        s = report[key]
+        lines.append(f'  {key[:-3]:<12} {s["p50"]:8.2f} {s["p95"]:8.2f} {s["p99"]:8.2f} {s["max"]:8.2f}')
+    return '\n'.join(lines)
+
+
+def _parse_target(text: str) -> tuple[str, int]:
+    host, _, port = text.rpartition(':')
+    if not host:
+        return text, DEFAULT_PORT
+    return host, int(port)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.loadgen',
+        description='Replay MeshPackets at a receiver and report ACK latency and throughput.',
+    )
+    parser.add_argument('--target', help='host[:port]; default starts a local stand-in server')
+    parser.add_argument('--input', help='JSON-lines packets to replay (default: generated SOS packets)')
+    parser.add_argument('--count', type=int, help='total packets to send (default 1000 unless --duration)')
+    parser.add_argument('--duration', type=float, help='stop issuing sends after this many seconds')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rate', type=float, default=0.0, help='packets/s, 0 = unthrottled')
+    parser.add_argument('--bad-crc', type=float, default=0.0, help='fraction of frames to corrupt')
+    parser.add_argument('--ack-timeout', type=float, default=ACK_TIMEOUT_S)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    count = args.count if args.count is not None else (None if args.duration else 1000)
+    payloads = load_payloads(args.input) if args.input else generate_payloads(min(count or 1000, 1000), args.seed)
+    if not payloads:
+        parser.error('no packets to send')
+
+    config = LoadConfig(concurrency=args.concurrency, rate=args.rate, count=count,
+                        duration=args.duration, ack_timeout=args.ack_timeout,
+                        bad_crc=args.bad_crc, seed=args.seed)
+
+    server_stats = None
+    if args.target:
+        config.host, config.port = _parse_target(args.target)
+        result = asyncio.run(run_load(config, payloads))
+    else:
+        with LocalServer() as server:
+            config.port = server.port
+            result = asyncio.run(run_load(config, payloads))
+        server_stats = server.stats
+
+    report = result.report()
+    if server_stats is not None:
+        report['server'] = server_stats
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+        if server_stats is not None:
+            print('  server: ' + '  '.join(f'{k}={v}' for k, v in server_stats.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,589 @@
+"""Streaming reader for the logcat captures kept in the repo root.
+
+The captures come in two line formats:
+
+* ``adb logcat -v time`` (``scripts/logcat_filter.bat``)::
+
+      02-21 15:46:16.800 D/WifiP2pHandler(31881): TXT RECORD RECEIVED
+
+* ``adb logcat`` threadtime, the default (``capture_logs.ps1`` -s jobs)::
+
+      02-20 12:52:03.278 25720 25720 D WifiP2pHandler: Discovery nudge succeeded
+
+and two encodings: PowerShell ``Out-File``/``>`` writes UTF-16 with a BOM,
+everything else writes UTF-8. Files are never loaded whole. Lines are split
+at the byte level so each one keeps its file offset, which is what
+:class:`LogIndex` records to seek straight to the blocks a query needs.
+
+Usage::
+
+    python -m rescuenet_tools.logcat d2_full.txt --stats
+    python -m rescuenet_tools.logcat d2_full.txt --tag ConnectionManager \\
+        --since "02-21 15:46:00" --until "02-21 15:48:00" --index
+"""
+
+from __future__ import annotations
+
+import argparse
+import calendar
+import json
+import os
+import re
+import sys
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import BinaryIO, Iterable, Iterator
+
+# Tags the Android side logs under (see the companion objects in
+# android/app/src/main/kotlin/...) plus the Dart `print` tag.
+KNOWN_TAGS = (
+    'WifiP2pHandler',
+    'ConnectionManager',
+    'SocketServer',
+    'MeshService',
+    'RelayOrchestrator',
+    'GeneralHandler',
+    'RescueNet',
+    'flutter',
+)
+
+_CHUNK_SIZE = 1 << 20
+
+# Target size of one index block. Smaller blocks make narrow queries cheaper
+# at the cost of a larger index; 256 KiB keeps a 100 MB capture under ~400
+# blocks.
+DEFAULT_BLOCK_SIZE = 256 * 1024
+
+_NEWLINES = {'utf-16-le': b'\n\x00', 'utf-16-be': b'\x00\n'}
+
+_TIME = r'(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)\.(\d{3})'
+_TIME_FORMAT = re.compile(_TIME + r' ([VDIWEFA])/([^(]*?)\s*\(\s*(\d+)\): ?(.*)')
+_THREADTIME_FORMAT = re.compile(_TIME + r'\s+(\d+)\s+\d+ ([VDIWEFA]) (.*?)\s*: ?(.*)')
+_CLOCK = re.compile(r'(\d\d)-(\d\d) (\d\d):(\d\d)(?::(\d\d)(?:\.(\d{1,3}))?)?$')
+
+
+@dataclass(frozen=True, slots=True)
+class LogEvent:
+    """One parsed logcat line.
+
+    [ts] is seconds since the epoch, treating the capture clock as UTC
+    (logcat has no year or zone, so only differences are meaningful).
+    [offset] is the byte offset of the line in its file, or -1.
+    """
+
+    ts: float
+    level: str
+    tag: str
+    pid: int
+    message: str
+    offset: int = -1
+
+    @property
+    def clock(self) -> str:
+        """The timestamp back in logcat's ``MM-DD HH:MM:SS.mmm`` form."""
+        return format_clock(self.ts)
+
+
+def format_clock(ts: float) -> str:
+    """Formats a capture timestamp the way logcat prints it."""
+    dt = datetime.fromtimestamp(ts, tz=timezone.utc)
+    return dt.strftime('%m-%d %H:%M:%S.') + f'{dt.microsecond // 1000:03d}'
+
+
+def parse_clock(text: str, year: int | None = None) -> float:
+    """Parses ``MM-DD HH:MM[:SS[.mmm]]`` into the [LogEvent.ts] scale.
+
+    Raises [ValueError] for anything else.
+    """
+    m = _CLOCK.match(text.strip())
+    if m is None:
+        raise ValueError(f'Expected "MM-DD HH:MM:SS.mmm", got {text!r}')
+    month, day, hour, minute, sec, frac = m.groups()
+    base = _day_base(year or _default_year(), int(month), int(day))
+    seconds = int(sec or 0) + (int(frac.ljust(3, '0')) / 1000.0 if frac else 0.0)
+    return base + int(hour) * 3600 + int(minute) * 60 + seconds
+
+
+def _default_year() -> int:
+    return datetime.now().year
+
+
+@lru_cache(maxsize=1024)
+def _day_base(year: int, month: int, day: int) -> float:
+    return float(calendar.timegm((year, month, day, 0, 0, 0)))
+
+
+def detect_encoding(head: bytes) -> tuple[str, int]:
+    """Returns ``(codec, bom_length)`` for the first bytes of a capture."""
+    if head.startswith(b'\xff\xfe'):
+        return 'utf-16-le', 2
+    if head.startswith(b'\xfe\xff'):
+        return 'utf-16-be', 2
+    if head.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8', 3
+    # BOM-less UTF-16: ASCII-heavy log text leaves every other byte NUL.
+    sample = head[:512]
+    if len(sample) >= 4:
+        if sample[1::2].count(0) > len(sample) // 4:
+            return 'utf-16-le', 0
+        if sample[0::2].count(0) > len(sample) // 4:
+            return 'utf-16-be', 0
+    return 'utf-8', 0
+
+
+def iter_raw_lines(
+    stream: BinaryIO,
+    encoding: str,
+    start: int = 0,
+    end: int | None = None,
+) -> Iterator[tuple[int, bytes]]:
+    """Yields ``(offset, raw_line)`` pairs between [start] and [end].
+
+    The line terminator is stripped; a trailing ``\\r`` is left for the
+    decoder. For UTF-16 the terminator is only accepted on a code-unit
+    boundary, so a ``0x0A`` byte inside another character never splits a
+    line. [start] must itself be a line boundary.
+    """
+    newline = _NEWLINES.get(encoding, b'\n')
+    aligned = len(newline) == 2
+    stream.seek(start)
+    base = start
+    buf = b''
+    while True:
+        want = _CHUNK_SIZE if end is None else min(_CHUNK_SIZE, end - base - len(buf))
+        chunk = stream.read(want) if want > 0 else b''
+        if not chunk:
+            break
+        buf += chunk
+        pos = 0
+        while True:
+            idx = buf.find(newline, pos)
+            while aligned and idx >= 0 and idx & 1:
+                idx = buf.find(newline, idx + 1)
+            if idx < 0:
+                break
+            yield base + pos, buf[pos:idx]
+            pos = idx + len(newline)
+        base += pos
+        buf = buf[pos:]
+    if buf:
+        yield base, buf
+
+
+def _encode_cp437(text: str) -> bytes:
+    return text.encode('cp437')
+
+
+# Windows decodes the five bytes cp1252 leaves undefined (0x81, 0x8D, 0x8F,
+# 0x90, 0x9D) to the matching C1 control characters, so map those back too.
+_CP1252_BYTES: dict[str, int] = {}
+for _b in range(256):
+    try:
+        _CP1252_BYTES[bytes([_b]).decode('cp1252')] = _b
+    except UnicodeDecodeError:
+        _CP1252_BYTES[chr(_b)] = _b
+del _b
+
+
+def _encode_cp1252(text: str) -> bytes:
+    return bytes(_CP1252_BYTES[ch] for ch in text)
+
+
+def repair_text(text: str) -> str:
+    """Undoes the double-decoding PowerShell applies to the app's emoji.
+
+    ``Receive-Job`` reads adb's UTF-8 output as cp437, so ``✅`` arrives as
+    ``Γ£à``. Some ConnectionManager.kt string literals were themselves
+    saved through cp1252 by the fix_*.ps1 scripts and carry a second layer.
+    Each round re-encodes with the codec that produced the mojibake and
+    decodes as UTF-8; text that does not round-trip is returned as far as
+    it could be repaired.
+    """
+    if text.isascii():
+        return text
+    for _ in range(2):
+        for encode in (_encode_cp437, _encode_cp1252):
+            try:
+                fixed = encode(text).decode('utf-8')
+            except (UnicodeError, KeyError):
+                continue
+            if fixed != text:
+                text = fixed
+                break
+        else:
+            break
+    return text
+
+
+def parse_line(
+    line: str,
+    year: int | None = None,
+    offset: int = -1,
+    repair: bool = True,
+) -> LogEvent | None:
+    """Parses one decoded line, or returns None for banners/continuations."""
+    m = _TIME_FORMAT.match(line)
+    if m is not None:
+        level, tag, pid, message = m.group(7, 8, 9, 10)
+    else:
+        m = _THREADTIME_FORMAT.match(line)
+        if m is None:
+            return None
+        pid, level, tag, message = m.group(7, 8, 9, 10)
+    month, day, hour, minute, sec, ms = m.group(1, 2, 3, 4, 5, 6)
+    ts = (
+        _day_base(year or _default_year(), int(month), int(day))
+        + int(hour) * 3600
+        + int(minute) * 60
+        + int(sec)
+        + int(ms) / 1000.0
+    )
+    return LogEvent(
+        ts=ts,
+        level=level,
+        tag=tag,
+        pid=int(pid),
+        message=repair_text(message) if repair else message,
+        offset=offset,
+    )
+
+
+def _scan(
+    stream: BinaryIO,
+    encoding: str,
+    start: int,
+    end: int | None,
+    year: int,
+    tags: frozenset[str] | None,
+    since: float | None,
+    until: float | None,
+    repair: bool,
+) -> Iterator[LogEvent]:
+    for offset, raw in iter_raw_lines(stream, encoding, start, end):
+        event = parse_line(
+            raw.decode(encoding, errors='replace').rstrip('\r'),
+            year,
+            offset,
+            repair=False,
+        )
+        if event is None:
+            continue
+        if tags is not None and event.tag not in tags:
+            continue
+        if since is not None and event.ts < since:
+            continue
+        if until is not None and event.ts > until:
+            continue
+        if repair and not event.message.isascii():
+            event = LogEvent(
+                event.ts, event.level, event.tag, event.pid,
+                repair_text(event.message), event.offset,
+            )
+        yield event
+
+
+def iter_events(
+    path: str | os.PathLike[str],
+    *,
+    tags: Iterable[str] | None = None,
+    since: float | None = None,
+    until: float | None = None,
+    year: int | None = None,
+    repair: bool = True,
+) -> Iterator[LogEvent]:
+    """Streams the events of one capture, optionally filtered.
+
+    [since]/[until] are inclusive bounds on the [LogEvent.ts] scale (see
+    [parse_clock]). Memory use is one read chunk regardless of file size.
+    """
+    tag_set = frozenset(tags) if tags is not None else None
+    with open(path, 'rb') as stream:
+        encoding, bom = detect_encoding(stream.read(512))
+        yield from _scan(
+            stream, encoding, bom, None, year or _default_year(),
+            tag_set, since, until, repair,
+        )
+
+
+class LogIndex:
+    """Sparse tag/time index over one capture file.
+
+    The file is cut into blocks of roughly [DEFAULT_BLOCK_SIZE] bytes on line
+    boundaries. For every block the index keeps its byte offset and time
+    range, and for every tag the sorted list of blocks it occurs in. A query
+    decodes only the blocks that contain one of the requested tags and
+    overlap the requested window, so its cost follows the size of the answer
+    rather than the size of the file, and the index itself stays a few
+    kilobytes per 100 MB of log.
+
+    Indexes are cached next to the capture as ``<file>.idx.json`` and
+    rebuilt automatically when the file's size or mtime changes.
+    """
+
+    VERSION = 1
+    SUFFIX = '.idx.json'
+
+    def __init__(
+        self,
+        path: str,
+        encoding: str,
+        data_start: int,
+        size: int,
+        mtime_ns: int,
+        year: int,
+        block_offsets: array,
+        block_min_ts: array,
+        block_max_ts: array,
+        tag_blocks: dict[str, array],
+        tag_counts: dict[str, int],
+    ) -> None:
+        self.path = path
+        self.encoding = encoding
+        self.data_start = data_start
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.year = year
+        self._block_offsets = block_offsets
+        self._block_min_ts = block_min_ts
+        self._block_max_ts = block_max_ts
+        self._tag_blocks = tag_blocks
+        self.tag_counts = tag_counts
+
+    @classmethod
+    def build(
+        cls,
+        path: str | os.PathLike[str],
+        *,
+        year: int | None = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+    ) -> LogIndex:
+        """Builds an index with one streaming pass over [path]."""
+        path = os.fspath(path)
+        year = year or _default_year()
+        stat = os.stat(path)
+        offsets = array('Q')
+        min_ts = array('d')
+        max_ts = array('d')
+        tag_blocks: dict[str, array] = {}
+        tag_counts: dict[str, int] = {}
+
+        with open(path, 'rb') as stream:
+            encoding, bom = detect_encoding(stream.read(512))
+            block = -1
+            block_end = -1
+            for offset, raw in iter_raw_lines(stream, encoding, bom):
+                if offset >= block_end:
+                    block += 1
+                    block_end = offset + block_size
+                    offsets.append(offset)
+                    min_ts.append(float('inf'))
+                    max_ts.append(float('-inf'))
+                event = parse_line(
+                    raw.decode(encoding, errors='replace'), year, repair=False,
+                )
+                if event is None:
+                    continue
+                if event.ts < min_ts[block]:
+                    min_ts[block] = event.ts
+                if event.ts > max_ts[block]:
+                    max_ts[block] = event.ts
+                blocks = tag_blocks.get(event.tag)
+                if blocks is None:
+                    blocks = tag_blocks[event.tag] = array('I')
+                    tag_counts[event.tag] = 0
+                if not blocks or blocks[-1] != block:
+                    blocks.append(block)
+                tag_counts[event.tag] += 1
+
+        return cls(
+            path, encoding, bom, stat.st_size, stat.st_mtime_ns, year,
+            offsets, min_ts, max_ts, tag_blocks, tag_counts,
+        )
+
+    @classmethod
+    def open(
+        cls,
+        path: str | os.PathLike[str],
+        *,
+        year: int | None = None,
+        rebuild: bool = False,
+    ) -> LogIndex:
+        """Loads the cached index for [path], building it if missing or stale."""
+        path = os.fspath(path)
+        if not rebuild:
+            try:
+                index = cls.load(path)
+            except (OSError, ValueError, KeyError):
+                index = None
+            if index is not None and index.is_current() and (
+                year is None or year == index.year
+            ):
+                return index
+        index = cls.build(path, year=year)
+        try:
+            index.save()
+        except OSError:
+            pass  # Read-only capture directory; the in-memory index still works.
+        return index
+
+    @classmethod
+    def load(cls, path: str) -> LogIndex:
+        with open(path + cls.SUFFIX, encoding='utf-8') as f:
+            data = json.load(f)
+        if data['version'] != cls.VERSION:
+            raise ValueError(f'Unsupported index version {data["version"]}')
+        return cls(
+            path,
+            data['encoding'],
+            data['data_start'],
+            data['size'],
+            data['mtime_ns'],
+            data['year'],
+            array('Q', data['block_offsets']),
+            array('d', data['block_min_ts']),
+            array('d', data['block_max_ts']),
+            {tag: array('I', b) for tag, b in data['tag_blocks'].items()},
+            data['tag_counts'],
+        )
+
+    def save(self) -> None:
+        # Empty blocks carry +/-inf bounds, which JSON cannot encode.
+        def finite(values: array, fallback: float) -> list[float]:
+            return [v if v not in (float('inf'), float('-inf')) else fallback for v in values]
+
+        data = {
+            'version': self.VERSION,
+            'encoding': self.encoding,
+            'data_start': self.data_start,
+            'size': self.size,
+            'mtime_ns': self.mtime_ns,
+            'year': self.year,
+            'block_offsets': list(self._block_offsets),
+            'block_min_ts': finite(self._block_min_ts, 1e18),
+            'block_max_ts': finite(self._block_max_ts, -1e18),
+            'tag_blocks': {tag: list(b) for tag, b in self._tag_blocks.items()},
+            'tag_counts': self.tag_counts,
+        }
+        tmp = self.path + self.SUFFIX + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp, self.path + self.SUFFIX)
+
+    def is_current(self) -> bool:
+        """Whether the capture is unchanged since the index was built."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+    @property
+    def block_count(self) -> int:
+        return len(self._block_offsets)
+
+    @property
+    def time_range(self) -> tuple[float, float] | None:
+        """``(first, last)`` timestamps in the file, or None if it has no events."""
+        lo = min(self._block_min_ts, default=float('inf'))
+        hi = max(self._block_max_ts, default=float('-inf'))
+        return (lo, hi) if lo <= hi else None
+
+    def candidate_blocks(
+        self,
+        tags: Iterable[str] | None = None,
+        since: float | None = None,
+        until: float | None = None,
+    ) -> list[int]:
+        """Blocks that may hold events matching the filter, in file order."""
+        if tags is None:
+            blocks: Iterable[int] = range(self.block_count)
+        else:
+            merged: set[int] = set()
+            for tag in tags:
+                merged.update(self._tag_blocks.get(tag, ()))
+            blocks = sorted(merged)
+        return [
+            b for b in blocks
+            if (since is None or self._block_max_ts[b] >= since)
+            and (until is None or self._block_min_ts[b] <= until)
+        ]
+
+    def query(
+        self,
+        tags: Iterable[str] | None = None,
+        since: float | None = None,
+        until: float | None = None,
+        *,
+        repair: bool = True,
+    ) -> Iterator[LogEvent]:
+        """Yields matching events in file order, reading only candidate blocks."""
+        tag_set = frozenset(tags) if tags is not None else None
+        blocks = self.candidate_blocks(tag_set, since, until)
+        with open(self.path, 'rb') as stream:
+            i = 0
+            while i < len(blocks):
+                # Coalesce runs of adjacent blocks into one sequential read.
+                j = i
+                while j + 1 < len(blocks) and blocks[j + 1] == blocks[j] + 1:
+                    j += 1
+                start = self._block_offsets[blocks[i]]
+                last = blocks[j] + 1
+                end = self._block_offsets[last] if last < self.block_count else None
+                yield from _scan(
+                    stream, self.encoding, start, end, self.year,
+                    tag_set, since, until, repair,
+                )
+                i = j + 1
+
+
+def _parse_bound(text: str | None, year: int | None) -> float | None:
+    return parse_clock(text, year) if text else None
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.logcat',
+        description='Filter and summarise RescueNet logcat captures.',
+    )
+    parser.add_argument('files', nargs='+', help='capture files (UTF-8 or UTF-16)')
+    parser.add_argument('--tag', action='append', dest='tags',
+                        help='only this tag (repeatable)')
+    parser.add_argument('--since', help='"MM-DD HH:MM:SS[.mmm]" lower bound')
+    parser.add_argument('--until', help='"MM-DD HH:MM:SS[.mmm]" upper bound')
+    parser.add_argument('--year', type=int, help='year of the capture (default: current)')
+    parser.add_argument('--index', action='store_true',
+                        help='use (and cache) a block index for repeated queries')
+    parser.add_argument('--stats', action='store_true',
+                        help='print per-tag line counts instead of events')
+    args = parser.parse_args(argv)
+
+    since = _parse_bound(args.since, args.year)
+    until = _parse_bound(args.until, args.year)
+    out = sys.stdout
+
+    for path in args.files:
+        if args.stats:
+            index = LogIndex.open(path, year=args.year) if args.index else LogIndex.build(path, year=args.year)
+            span = index.time_range
+            out.write(f'{path}: {index.encoding}, {index.block_count} blocks')
+            if span:
+                out.write(f', {format_clock(span[0])} .. {format_clock(span[1])}')
+            out.write('\n')
+            for tag, count in sorted(index.tag_counts.items(), key=lambda kv: -kv[1]):
+                out.write(f'  {count:8d}  {tag}\n')
+            continue
+
+        if args.index:
+            events = LogIndex.open(path, year=args.year).query(args.tags, since, until)
+        else:
+            events = iter_events(path, tags=args.tags, since=since, until=until, year=args.year)
+        prefix = f'{path}: ' if len(args.files) > 1 else ''
+        for event in events:
+            out.write(f'{prefix}{event.clock} {event.level}/{event.tag}: {event.message}\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
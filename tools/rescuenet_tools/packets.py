@@ -0,0 +1,211 @@
+"""MeshPacket / SosPayload JSON shapes and a seeded generator for test traffic.
+
+Field names, enum orders and defaults follow ``mesh_packet.dart`` and
+``sos_payload.dart``; enums travel as their Dart ``index``. The generated
+SOS packets land in the same 600-650 byte range as the packets in the
+field captures (``Packet size: 640 chars``).
+
+Usage::
+
+    python -m rescuenet_tools.packets --count 100 --seed 7 > packets.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import uuid
+from dataclasses import dataclass, field, replace
+from typing import Iterator
+
+TYPE_SOS = 'sos'
+TYPE_ACK = 'ack'
+TYPE_STATUS = 'status'
+TYPE_DATA = 'data'
+
+PRIORITY_LOW = 0
+PRIORITY_MEDIUM = 1
+PRIORITY_HIGH = 2
+PRIORITY_CRITICAL = 3
+
+DEFAULT_TTL = 20
+
+EMERGENCY_TYPES = ('medical', 'fire', 'flood', 'earthquake', 'trapped', 'injury',
+                   'other', 'general', 'rescue', 'naturalDisaster', 'security')
+TRIAGE_LEVELS = ('low', 'medium', 'high', 'critical', 'none', 'green', 'yellow', 'red')
+MEDICAL_CONDITIONS = ('bleeding', 'fracture', 'burns', 'difficultyBreathing', 'chestPain',
+                      'unconscious', 'diabetic', 'heartCondition', 'allergies', 'pregnant',
+                      'elderly', 'childInfant')
+SUPPLY_TYPES = ('firstAidKit', 'water', 'food', 'medication', 'blankets', 'flashlight',
+                'radio', 'stretcher', 'oxygen', 'defibrillator', 'ropeHarness',
+                'fireExtinguisher')
+
+# Where the field captures were taken (TXT records lat=17.470006 lng=78.721126).
+DEFAULT_CENTER = (17.470006, 78.721126)
+
+_NOTES = ('', 'Quick SOS', 'Two people trapped on second floor',
+          'Water rising, need evacuation', 'Elderly person needs medication',
+          'Road blocked, cannot reach hospital')
+
+
+@dataclass(frozen=True, slots=True)
+class MeshPacket:
+    """Python mirror of the Dart ``MeshPacket``; [payload] is a JSON string."""
+
+    id: str
+    originator_id: str
+    payload: str
+    trace: tuple[str, ...]
+    ttl: int = DEFAULT_TTL
+    timestamp: int = 0
+    priority: int = PRIORITY_MEDIUM
+    packet_type: str = TYPE_DATA
+
+    @property
+    def sender_id(self) -> str:
+        """Last node in [trace], i.e. whoever handed us the packet."""
+        return self.trace[-1] if self.trace else self.originator_id
+
+    @property
+    def hop_count(self) -> int:
+        return len(self.trace) - 1
+
+    @property
+    def is_sos(self) -> bool:
+        return self.packet_type == TYPE_SOS
+
+    def has_visited(self, node_id: str) -> bool:
+        return node_id in self.trace
+
+    def add_hop(self, node_id: str) -> MeshPacket:
+        """Same contract as ``MeshPacket.addHop``: raises on TTL 0 or a loop."""
+        if self.ttl <= 0:
+            raise ValueError(f'Cannot add hop to packet with TTL <= 0. Packet ID: {self.id}')
+        if node_id in self.trace:
+            raise ValueError(f'Loop detected: Node {node_id} already in trace. Packet ID: {self.id}')
+        return replace(self, trace=self.trace + (node_id,), ttl=self.ttl - 1)
+
+    def to_json(self) -> dict:
+        return {
+            'id': self.id,
+            'originatorId': self.originator_id,
+            'payload': self.payload,
+            'trace': list(self.trace),
+            'ttl': self.ttl,
+            'timestamp': self.timestamp,
+            'priority': self.priority,
+            'packetType': self.packet_type,
+        }
+
+    def to_json_string(self) -> str:
+        # Dart's jsonEncode emits no whitespace.
+        return json.dumps(self.to_json(), separators=(',', ':'), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data: dict) -> MeshPacket:
+        return cls(
+            id=data['id'],
+            originator_id=data['originatorId'],
+            payload=data['payload'],
+            trace=tuple(data['trace']),
+            ttl=data['ttl'],
+            timestamp=data['timestamp'],
+            priority=data['priority'],
+            packet_type=data['packetType'],
+        )
+
+    @classmethod
+    def from_json_string(cls, text: str | bytes) -> MeshPacket:
+        return cls.from_json(json.loads(text))
+
+
+@dataclass
+class PacketFactory:
+    """Deterministic source of realistic packets for load tests and simulations.
+
+    Node ids are UUIDs like the phones use; packet ids follow
+    ``MeshPacket.createSos`` (``<millis>-<hash>``). [sos_fraction] of the
+    packets are SOS, the rest small status packets.
+    """
+
+    seed: int = 0
+    center: tuple[float, float] = DEFAULT_CENTER
+    spread_deg: float = 0.02
+    start_ms: int = 1771668982192
+    sos_fraction: float = 1.0
+    _rng: random.Random = field(init=False, repr=False)
+    _clock: int = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._rng = random.Random(self.seed)
+        self._clock = self.start_ms
+
+    def node_id(self) -> str:
+        return str(uuid.UUID(int=self._rng.getrandbits(128), version=4))
+
+    def sos_payload(self, sender_id: str, timestamp: int) -> dict:
+        rng = self._rng
+        lat, lng = self.center
+        return {
+            'sosId': str(rng.randrange(10**7, 10**8)),
+            'senderId': sender_id,
+            'senderName': rng.choice(('Anonymous', 'Test User', 'Ravi', 'Priya', 'Node A')),
+            'latitude': round(lat + rng.uniform(-self.spread_deg, self.spread_deg), 6),
+            'longitude': round(lng + rng.uniform(-self.spread_deg, self.spread_deg), 6),
+            'locationAccuracy': round(rng.uniform(3, 40), 1),
+            'emergencyType': rng.randrange(len(EMERGENCY_TYPES)),
+            'triageLevel': rng.randrange(4),
+            'numberOfPeople': rng.choice((1, 1, 1, 2, 3, 5)),
+            'medicalConditions': sorted(rng.sample(range(len(MEDICAL_CONDITIONS)), rng.randrange(3))),
+            'requiredSupplies': sorted(rng.sample(range(len(SUPPLY_TYPES)), rng.randrange(4))),
+            'additionalNotes': rng.choice(_NOTES),
+            'timestamp': timestamp,
+            'isActive': True,
+            'contactPhone': rng.choice((None, f'+91{rng.randrange(7 * 10**9, 10**10)}')),
+        }
+
+    def packet(self, originator_id: str | None = None, hops: int = 0) -> MeshPacket:
+        """One packet, relayed through [hops] random nodes after the originator."""
+        rng = self._rng
+        self._clock += rng.randrange(1, 2000)
+        origin = originator_id or self.node_id()
+        packet_id = f'{self._clock}-{rng.getrandbits(29)}'
+        if rng.random() < self.sos_fraction:
+            payload = json.dumps(self.sos_payload(origin, self._clock), separators=(',', ':'))
+            packet = MeshPacket(packet_id, origin, payload, (origin,), DEFAULT_TTL,
+                                self._clock, PRIORITY_CRITICAL, TYPE_SOS)
+        else:
+            payload = json.dumps({'nodeId': origin, 'battery': rng.randrange(5, 101),
+                                  'hasInternet': rng.random() < 0.2}, separators=(',', ':'))
+            packet = MeshPacket(packet_id, origin, payload, (origin,), DEFAULT_TTL,
+                                self._clock, PRIORITY_LOW, TYPE_STATUS)
+        for _ in range(hops):
+            packet = packet.add_hop(self.node_id())
+        return packet
+
+    def packets(self, count: int, max_hops: int = 3) -> Iterator[MeshPacket]:
+        for _ in range(count):
+            yield self.packet(hops=self._rng.randrange(max_hops + 1))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.packets',
+        description='Write realistic MeshPacket JSON lines.',
+    )
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-hops', type=int, default=3)
+    parser.add_argument('--sos-fraction', type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    factory = PacketFactory(seed=args.seed, sos_fraction=args.sos_fraction)
+    for packet in factory.packets(args.count, args.max_hops):
+        sys.stdout.write(packet.to_json_string() + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,504 @@
+"""Deterministic replay of captured sessions through the routing pipeline.
+
+One streaming pass over a device's capture rebuilds what the app knew at
+each moment:
+
+* its own id, from the ``Metadata: {...}`` lines it logs when it
+  advertises;
+* its neighbour table, as ``WifiP2pSource._nodeCache``. The latest
+  ``Data: {sig=..., id=...}`` TXT record per id, and a ``Node discovered:
+  <id> (<mac>) [TXT|service]`` event that (re)inserts the node with
+  ``lastSeen`` at the time of the event. A ``[service]`` discovery has no
+  TXT fields, so it gets the Dart defaults (battery 0, -70 dBm);
+* its outbox, the SOS ids from ``Adding packet to outbox`` and
+  ``Persisting relay packet``, until they are marked sent. A relay
+  packet's originator comes from the ``SocketServer`` ``Data:`` line when
+  it is logged. Only the first 200 characters are logged, so the rest of
+  the trace is unknown.
+
+The [Router] runs again at every decision the device logged:
+
+``immediate``
+    ``_forwardPacket``: ``Checking neighbors``, then ``Forwarding packet
+    to <id>``, ``No neighbors available`` or ``No viable route``;
+``relay``
+    a ``CONNECT AND SEND PACKET`` that no immediate forward announced,
+    i.e. a ``RelayOrchestrator`` send of the oldest pending packet.
+
+A decision is *divergent* when the replayed choice differs from the
+logged one. It is a *table mismatch* when the ``Neighbors: [...]`` line
+lists other MACs than the rebuilt table, as at the start of a capture
+taken after discovery. A divergence is *unexplained* when the table
+matched and the packet's trace was known; ``--fail-on-divergence`` exits
+1 on those, so a routing change can be checked against field captures.
+
+The router also runs on every table change and on a 10 s relay tick
+while packets are pending and the radio is idle. An *opportunity* is a
+packet that had a route for longer than one tick before the device tried
+to send it, or that never got the attempt. A packet never attempted counts
+as missed until the end of the capture.
+
+Usage::
+
+    python -m rescuenet_tools.replay device1_oppo_logs.txt d2_full.txt
+    python -m rescuenet_tools.replay d1_*.txt d2_*.txt --weights internet=0 --fail-on-divergence
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Iterable, Sequence
+
+from .logcat import LogEvent, format_clock, iter_events
+from .packets import DEFAULT_TTL, PRIORITY_CRITICAL, TYPE_SOS, MeshPacket
+from .routing import NodeInfo, Router, Weights
+
+TICK_S = 10.0  # RelayOrchestrator.relayInterval
+BUSY_TIMEOUT_S = 60.0  # a connect that never logs its outcome stops counting as busy
+
+_UNKNOWN = '?'
+
+_RECORD = re.compile(r'\s*Data: \{(.*)\}\s*$')
+_OWN_METADATA = re.compile(r'\W*(?:Updating metadata|Metadata): \{(.*)\}\s*$')
+_DISCOVERED = re.compile(r'\W*Node discovered: (\S+) \(([0-9a-fA-F:]*)\) \[(TXT|service)\]')
+_OWN_SOS = re.compile(r'\W*Repository: Adding packet to outbox: (\S+)')
+_RELAY_SOS = re.compile(r'\W*Persisting relay packet (\S+) to outbox')
+_RECEIVED_JSON = re.compile(r'\s*Data: \{"id":"([^"]+)","originatorId":"([^"]+)"')
+_CHECKING = re.compile(r'\W*_forwardPacket: Checking neighbors \(count: (\d+)\)')
+_NEIGHBORS = re.compile(r'\W*Neighbors: \[(.*)\]')
+_NO_NEIGHBORS = re.compile(r'\W*No neighbors available for forwarding')
+_NO_ROUTE = re.compile(r'\W*No viable route found by AI router')
+_FORWARDING = re.compile(r'\W*Forwarding packet to (\S+) \(([0-9a-fA-F:]*)\)')
+_CONNECT_AND_SEND = re.compile(r'\W*CONNECT AND SEND PACKET$')
+_TARGET = re.compile(r'\s*Target: ([0-9a-fA-F:]+)')
+_FORWARD_FAILED = re.compile(r'\W*Forward failed: (\w+)')
+_RELAY_SENT = re.compile(r'\W*Relay packet (\S+) forwarded immediately')
+_MARKED_SENT = re.compile(r'\W*Repository: Marked as sent in outbox')
+_SOS_DONE = re.compile(r'\W*MeshBloc: SOS sent successfully, ID: (\S+)')
+_ACK = re.compile(r'\W*ACK received')
+_NAK = re.compile(r'\W*NAK received')
+_HANDLER_SEND = re.compile(r'\W*CONNECT AND SEND$')
+_HANDLER_FAILED = re.compile(r'\W*(Connection failed|Socket error)')
+
+
+def parse_record(text: str) -> dict[str, str]:
+    """``k=v, k=v`` (Kotlin ``Map.toString``) or ``k: v, k: v`` (Dart) into a dict."""
+    record = {}
+    for part in text.split(','):
+        key, sep, value = part.partition('=')
+        if not sep:
+            key, sep, value = part.partition(':')
+        if sep:
+            record[key.strip()] = value.strip()
+    return record
+
+
+@dataclass
+class Decision:
+    ts: float
+    kind: str  # 'immediate' or 'relay'
+    packet_id: str | None
+    actual: str | None  # neighbour id the device chose; None for no route
+    predicted: str | None
+    reason: str | None  # AiRouter failure reason when [predicted] is None
+    scores: list[tuple[str, float]] = field(default_factory=list)
+    logged_neighbors: list[str] | None = None  # MACs from the Neighbors: line
+    table: list[str] = field(default_factory=list)  # MACs in the rebuilt table
+    trace_known: bool = True
+    target: str | None = None  # MAC the device sent to
+
+    @property
+    def diverged(self) -> bool:
+        return self.actual != self.predicted
+
+    @property
+    def table_mismatch(self) -> bool:
+        if self.target is not None and self.target not in self.table:
+            return True
+        return self.logged_neighbors is not None and sorted(self.logged_neighbors) != sorted(self.table)
+
+    @property
+    def unexplained(self) -> bool:
+        """Diverged although the replay had the device's table and trace."""
+        return self.diverged and self.trace_known and not self.table_mismatch
+
+
+@dataclass
+class Opportunity:
+    packet_id: str
+    route_at: float  # first time the rebuilt table had a route while the radio was idle
+    target: str
+    attempted_at: float | None  # next logged send attempt for the packet, None if never
+
+    @property
+    def delay_s(self) -> float | None:
+        return None if self.attempted_at is None else self.attempted_at - self.route_at
+
+
+@dataclass
+class ReplayResult:
+    path: str
+    node_id: str | None
+    events: int = 0
+    decisions: list[Decision] = field(default_factory=list)
+    opportunities: list[Opportunity] = field(default_factory=list)
+    ticks: int = 0
+    ticks_with_route: int = 0
+    elapsed_s: float = 0.0
+    ended_at: float | None = None  # time of the last event in the capture
+
+    @property
+    def divergences(self) -> list[Decision]:
+        return [d for d in self.decisions if d.diverged]
+
+    @property
+    def unexplained(self) -> list[Decision]:
+        return [d for d in self.decisions if d.unexplained]
+
+    def missed_s(self, opportunity: Opportunity) -> float:
+        """How long [opportunity] waited; a send never attempted waits until the capture ends."""
+        if opportunity.delay_s is not None:
+            return opportunity.delay_s
+        return max(0.0, (self.ended_at or opportunity.route_at) - opportunity.route_at)
+
+    def summary(self) -> dict:
+        return {
+            'path': self.path,
+            'node_id': self.node_id,
+            'events': self.events,
+            'decisions': len(self.decisions),
+            'divergent': len(self.divergences),
+            'unexplained': len(self.unexplained),
+            'table_mismatches': sum(d.table_mismatch for d in self.decisions),
+            'ticks': self.ticks,
+            'ticks_with_route': self.ticks_with_route,
+            'opportunities': len(self.opportunities),
+            'never_attempted': sum(o.attempted_at is None for o in self.opportunities),
+            'missed_s': sum(self.missed_s(o) for o in self.opportunities),
+            'elapsed_s': self.elapsed_s,
+        }
+
+
+class Replayer:
+    """Rebuilds one device's routing state from its events, in order."""
+
+    def __init__(self, router: Router | None = None, tick_s: float = TICK_S) -> None:
+        self.router = router or Router()
+        self.tick_s = tick_s
+        self.node_id: str | None = None
+        self.records: dict[str, dict[str, str]] = {}
+        self.table: dict[str, NodeInfo] = {}
+        self.mac_to_id: dict[str, str] = {}
+        self.pending: dict[str, MeshPacket] = {}
+        self.originators: dict[str, str] = {}
+        self.decisions: list[Decision] = []
+        self.opportunities: list[Opportunity] = []
+        self.ticks = 0
+        self.ticks_with_route = 0
+        self._route_at: dict[str, tuple[float, str]] = {}
+        self._open: Decision | None = None  # immediate forward awaiting its outcome
+        self._expect_target = False  # the next flutter line should be '   Target: <mac>'
+        self._announced: str | None = None  # MAC of the last Forwarding packet to
+        self._relay_packet: str | None = None  # packet of the send in flight from the orchestrator
+        self._busy_until = 0.0
+        self._last_flutter = ''
+        self._next_tick: float | None = None
+        self.ended_at: float | None = None
+
+    # -- state ------------------------------------------------------------
+
+    def _packet(self, packet_id: str, relay: bool) -> MeshPacket:
+        me = self.node_id or _UNKNOWN
+        if relay:
+            origin = self.originators.get(packet_id, _UNKNOWN)
+            trace = (origin, me)
+        else:
+            origin, trace = me, (me,)
+        return MeshPacket(packet_id, origin, '{}', trace, DEFAULT_TTL, 0, PRIORITY_CRITICAL, TYPE_SOS)
+
+    def _decide(self, packet: MeshPacket | None, now: float) -> tuple[NodeInfo | None, str | None]:
+        if packet is None:
+            return None, 'No pending packet'
+        neighbors = list(self.table.values())
+        node = self.router.select_best_node(neighbors, packet, self.node_id or _UNKNOWN, now)
+        if node is None:
+            return None, self.router.failure_reason(neighbors, packet, self.node_id or _UNKNOWN, now)
+        return node, None
+
+    def _head(self) -> MeshPacket | None:
+        return next(iter(self.pending.values()), None)
+
+    def _sent(self, packet_id: str | None) -> None:
+        if packet_id is not None:
+            self.pending.pop(packet_id, None)
+            self._route_at.pop(packet_id, None)
+
+    def _attempted(self, packet_id: str | None, now: float) -> None:
+        """Closes the opportunity window of [packet_id] at a real send attempt."""
+        if packet_id is None:
+            return
+        route = self._route_at.pop(packet_id, None)
+        if route is not None and now - route[0] > self.tick_s:
+            self.opportunities.append(Opportunity(packet_id, route[0], route[1], now))
+
+    def _check_routes(self, now: float) -> bool:
+        """Notes when each pending packet first had a route; True if any had one."""
+        if now < self._busy_until:
+            return False
+        found = False
+        for packet_id, packet in self.pending.items():
+            node, _ = self._decide(packet, now)
+            if node is not None:
+                found = True
+                self._route_at.setdefault(packet_id, (now, node.id))
+        return found
+
+    def _advance(self, now: float) -> None:
+        if self._next_tick is None:
+            self._next_tick = now + self.tick_s
+        while self._next_tick <= now:
+            if self.pending:
+                self.ticks += 1
+                self.ticks_with_route += self._check_routes(self._next_tick)
+            self._next_tick += self.tick_s
+
+    # -- events -----------------------------------------------------------
+
+    def feed(self, event: LogEvent) -> None:
+        now = event.ts
+        self.ended_at = now
+        self._advance(now)
+        message = event.message
+        if event.tag == 'flutter':
+            self._flutter(message, now)
+            self._last_flutter = message
+        elif event.tag == 'WifiP2pHandler':
+            self._handler(message, now)
+        elif event.tag == 'SocketServer':
+            m = _RECEIVED_JSON.match(message)
+            if m:
+                self.originators[m.group(1)] = m.group(2)
+
+    def _handler(self, message: str, now: float) -> None:
+        m = _OWN_METADATA.match(message)
+        if m:
+            self.node_id = parse_record(m.group(1)).get('id', self.node_id)
+            return
+        m = _RECORD.match(message)
+        if m:
+            record = parse_record(m.group(1))
+            if 'id' in record:
+                self.records[record['id']] = record
+            return
+        if _HANDLER_SEND.match(message):
+            self._busy_until = now + BUSY_TIMEOUT_S
+        elif _ACK.match(message):
+            self._busy_until = 0.0
+            self._sent(self._relay_packet)
+            self._relay_packet = None
+        elif _NAK.match(message) or _HANDLER_FAILED.match(message):
+            self._busy_until = 0.0
+            self._relay_packet = None
+
+    def _flutter(self, message: str, now: float) -> None:
+        if self._expect_target:
+            m = _TARGET.match(message)
+            self._expect_target = False
+            if m:
+                self._target(m.group(1).lower(), now)
+                return
+
+        m = _DISCOVERED.match(message)
+        if m:
+            node_id, mac, source = m.group(1), m.group(2).lower(), m.group(3)
+            record = self.records.get(node_id, {}) if source == 'TXT' else {}
+            node = NodeInfo.from_txt_record({**record, 'id': node_id}, now,
+                                            None if source == 'TXT' else -70, mac)
+            self.table.pop(node_id, None)
+            self.table[node_id] = node
+            self.mac_to_id[mac] = node_id
+            self._check_routes(now)
+            return
+        m = _OWN_METADATA.match(message)
+        if m:
+            self.node_id = parse_record(m.group(1)).get('id', self.node_id)
+            return
+        m = _OWN_SOS.match(message) or _RELAY_SOS.match(message)
+        if m:
+            packet = self._packet(m.group(1), relay=m.re is _RELAY_SOS)
+            self.pending[packet.id] = packet
+            return
+        m = _CHECKING.match(message)
+        if m:
+            packet = self._head_for_immediate()
+            node, reason = self._decide(packet, now)
+            self._open = Decision(
+                now, 'immediate', packet.id if packet else None, None,
+                node.id if node else None, reason, self._scores(packet, now),
+                table=[n.device_address for n in self.table.values()],
+                trace_known=packet is not None and _UNKNOWN not in packet.trace,
+            )
+            return
+        m = _NEIGHBORS.match(message)
+        if m and self._open is not None:
+            self._open.logged_neighbors = [s.strip().lower() for s in m.group(1).split(',') if s.strip()]
+            return
+        if _NO_NEIGHBORS.match(message) or _NO_ROUTE.match(message):
+            self._close(None)
+            return
+        m = _FORWARDING.match(message)
+        if m:
+            self._announced = m.group(2).lower()
+            opened = self._open
+            if opened is not None:
+                opened.target = self._announced
+            self._close(m.group(1))
+            if opened is not None:
+                self._attempted(opened.packet_id, now)
+            return
+        if _CONNECT_AND_SEND.match(message):
+            self._expect_target = True
+            return
+        m = _RELAY_SENT.match(message)
+        if m:
+            self._sent(m.group(1))
+            return
+        m = _SOS_DONE.match(message)
+        if m and _MARKED_SENT.match(self._last_flutter):
+            self._sent(m.group(1))
+            return
+        m = _FORWARD_FAILED.match(message)
+        if m and m.group(1) != 'BUSY':
+            self._busy_until = 0.0
+
+    def _head_for_immediate(self) -> MeshPacket | None:
+        # _forwardPacket runs right after the packet was added to the outbox.
+        return next(reversed(self.pending.values()), None)
+
+    def _scores(self, packet: MeshPacket | None, now: float) -> list[tuple[str, float]]:
+        if packet is None or not self.table:
+            return []
+        scored = self.router.scored_candidates(list(self.table.values()), packet, self.node_id or _UNKNOWN, now)
+        return [(s.node.id, round(s.score, 2)) for s in scored]
+
+    def _close(self, actual: str | None) -> None:
+        if self._open is None:
+            return
+        self._open.actual = actual
+        self.decisions.append(self._open)
+        self._open = None
+
+    def _target(self, mac: str, now: float) -> None:
+        if self._announced == mac:
+            self._announced = None  # the immediate forward announced this send
+            return
+        packet = self._head()
+        node, reason = self._decide(packet, now)
+        self.decisions.append(Decision(
+            now, 'relay', packet.id if packet else None, self.mac_to_id.get(mac, mac),
+            node.id if node else None, reason, self._scores(packet, now),
+            table=[n.device_address for n in self.table.values()],
+            trace_known=packet is not None and _UNKNOWN not in packet.trace, target=mac,
+        ))
+        self._relay_packet = packet.id if packet else None
+        self._attempted(self._relay_packet, now)
+
+    def finish(self) -> None:
+        """Reports the packets that had a route but were never attempted.
+
+        Opportunities are then in [Opportunity.route_at] order.
+        """
+        for packet_id, (route_at, target) in self._route_at.items():
+            self.opportunities.append(Opportunity(packet_id, route_at, target, None))
+        self._route_at.clear()
+        self.opportunities.sort(key=lambda o: o.route_at)
+
+
+def replay_events(events: Iterable[LogEvent], router: Router | None = None, path: str = '',
+                  tick_s: float = TICK_S) -> ReplayResult:
+    started = time.perf_counter()
+    replayer = Replayer(router, tick_s)
+    count = 0
+    for event in events:
+        replayer.feed(event)
+        count += 1
+    replayer.finish()
+    return ReplayResult(path, replayer.node_id, count, replayer.decisions, replayer.opportunities,
+                        replayer.ticks, replayer.ticks_with_route, time.perf_counter() - started,
+                        replayer.ended_at)
+
+
+def replay_file(path: str, router: Router | None = None, year: int | None = None,
+                tick_s: float = TICK_S) -> ReplayResult:
+    """Replays one capture in a single streaming pass."""
+    return replay_events(iter_events(path, year=year), router, path, tick_s)
+
+
+def format_result(result: ReplayResult, verbose: bool = False) -> str:
+    s = result.summary()
+    lines = [
+        f'{s["path"]}: node {(s["node_id"] or "?")[:8]}, {s["events"]} events in {s["elapsed_s"] * 1000:.0f} ms; '
+        f'{s["decisions"]} decisions, {s["divergent"]} divergent ({s["unexplained"]} unexplained), '
+        f'{s["table_mismatches"]} table mismatches; '
+        f'{s["ticks"]} ticks ({s["ticks_with_route"]} with a route); '
+        f'{s["opportunities"]} opportunities, {s["never_attempted"]} never attempted ({s["missed_s"]:.1f} s)',
+    ]
+    for d in result.decisions:
+        if not (verbose or d.diverged or d.table_mismatch):
+            continue
+        flags = ' '.join(f for f, on in (('DIVERGED', d.diverged), ('TABLE', d.table_mismatch),
+                                         ('trace?', not d.trace_known)) if on)
+        lines.append(f'  {format_clock(d.ts)} {d.kind:<9} {(d.packet_id or "-"):<26} '
+                     f'actual {_short(d.actual)} replay {_short(d.predicted)}'
+                     f'{" (" + d.reason + ")" if d.reason and d.predicted is None else ""} {flags}')
+    for o in result.opportunities:
+        waited = (f'attempted {o.delay_s:.1f} s later' if o.attempted_at is not None
+                  else f'never attempted, {result.missed_s(o):.1f} s to the end of the capture')
+        lines.append(f'  {format_clock(o.route_at)} opportunity {o.packet_id}: route via {_short(o.target)}, {waited}')
+    return '\n'.join(lines)
+
+
+def _short(node_id: str | None) -> str:
+    return '-' if node_id is None else node_id[:8]
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.replay',
+        description='Replay captures through AiRouter and flag decisions that differ from the device.',
+    )
+    parser.add_argument('files', nargs='+', help='one capture per device')
+    parser.add_argument('--weights', default='', help='replay with changed weights, e.g. internet=0')
+    parser.add_argument('--tick', type=float, default=TICK_S, help='relay tick for opportunity checks (s)')
+    parser.add_argument('--year', type=int)
+    parser.add_argument('--verbose', action='store_true', help='print every decision')
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--fail-on-divergence', action='store_true',
+                        help='exit 1 if a decision differs with the full table and trace known')
+    args = parser.parse_args(argv)
+
+    from .sim import parse_weights
+
+    try:
+        weights = parse_weights(args.weights, Weights())
+    except ValueError as e:
+        parser.error(str(e))
+    results = [replay_file(path, Router(weights), args.year, args.tick) for path in args.files]
+    if args.json:
+        print(json.dumps([{**r.summary(), 'decisions': [asdict(d) for d in r.decisions],
+                           'opportunities': [asdict(o) for o in r.opportunities]} for r in results], indent=2))
+    else:
+        for result in results:
+            print(format_result(result, args.verbose))
+    if args.fail_on_divergence and any(r.unexplained for r in results):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
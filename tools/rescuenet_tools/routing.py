@@ -0,0 +1,231 @@
+"""Scalar Python port of ``NeighborScorer`` and ``AiRouter``.
+
+Every rule, constant and comparison follows ``neighbor_scorer.dart`` and
+``ai_router.dart`` so that simulations and log replays make the same
+decisions as the phones. Differences from the Dart code are deliberate and
+limited to plumbing:
+
+* time is explicit: staleness is ``now - last_seen > STALE_TIMEOUT_S``
+  instead of ``DateTime.now()``, so a simulator or replay can supply its
+  own clock;
+* the weights live in a [Weights] value so a sweep can vary them; the
+  defaults are the Dart ``static const`` values.
+
+Ties keep neighbour order. Dart's ``List.sort`` is only guaranteed stable
+for short lists (insertion sort up to 32 elements), which a neighbour table
+always is.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Sequence
+
+from .packets import MeshPacket
+
+ROLE_SENDER = 'sender'
+ROLE_RELAY = 'relay'
+ROLE_GOAL = 'goal'
+ROLE_IDLE = 'idle'
+
+# TXT record 'rol' is the first letter of the role.
+ROLE_FROM_TXT = {'s': ROLE_SENDER, 'r': ROLE_RELAY, 'g': ROLE_GOAL, 'i': ROLE_IDLE}
+
+STALE_TIMEOUT_S = 120.0  # NodeInfo.staleTimeoutMinutes = 2
+
+
+@dataclass(frozen=True, slots=True)
+class Weights:
+    """``NeighborScorer`` constants; override fields to try new weights."""
+
+    internet: float = 50.0
+    sos_priority: float = 30.0
+    battery: float = 25.0
+    signal: float = 10.0
+    penalty_stale: float = -100.0
+    penalty_low_battery: float = -20.0
+    penalty_in_trace: float = -1000.0
+    penalty_sender: float = -1000.0
+    bonus_goal_role: float = 15.0
+    bonus_relay_role: float = 5.0
+    minimum_viable_score: float = 0.0
+    low_battery_threshold: int = 20
+
+
+DEFAULT_WEIGHTS = Weights()
+
+
+@dataclass(slots=True)
+class NodeInfo:
+    """What one node knows about a neighbour, as advertised in its TXT record.
+
+    [last_seen] and [signal_strength] are per observer; everything else is
+    what the neighbour advertised. Mutable so a simulator can refresh
+    [last_seen] in place.
+    """
+
+    id: str
+    battery_level: int = 100
+    has_internet: bool = False
+    signal_strength: int = -50
+    role: str = ROLE_IDLE
+    is_available_for_relay: bool = True
+    last_seen: float = 0.0
+    latitude: float = 0.0
+    longitude: float = 0.0
+    device_address: str = ''
+
+    def is_stale(self, now: float) -> bool:
+        return now - self.last_seen > STALE_TIMEOUT_S
+
+    @property
+    def normalized_signal(self) -> float:
+        return (min(max(self.signal_strength, -90), -30) + 90) / 60.0
+
+    @property
+    def normalized_battery(self) -> float:
+        return self.battery_level / 100.0
+
+    @classmethod
+    def from_txt_record(cls, record: dict[str, str], last_seen: float,
+                        signal_strength: int | None = None, device_address: str = '') -> NodeInfo:
+        """Mirrors ``NodeInfo.fromTxtRecord`` (bad numbers fall back to 0)."""
+        def _int(key: str, default: int = 0) -> int:
+            try:
+                return int(record.get(key, default))
+            except ValueError:
+                return default
+
+        def _float(key: str) -> float:
+            try:
+                return float(record.get(key, 0))
+            except ValueError:
+                return 0.0
+
+        return cls(
+            id=record.get('id', ''),
+            battery_level=_int('bat'),
+            has_internet=record.get('net') == '1',
+            signal_strength=signal_strength if signal_strength is not None else _int('sig', -100),
+            role=ROLE_FROM_TXT.get(record.get('rol', ''), ROLE_IDLE),
+            is_available_for_relay=record.get('rel') != '0',
+            last_seen=last_seen,
+            latitude=_float('lat'),
+            longitude=_float('lng'),
+            device_address=device_address,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class ScoredNode:
+    node: NodeInfo
+    score: float
+
+
+def score_node(neighbor: NodeInfo, packet: MeshPacket, current_node_id: str, now: float,
+               weights: Weights = DEFAULT_WEIGHTS) -> float:
+    """``NeighborScorer.scoreNode``; [current_node_id] is unused there too."""
+    score = 0.0
+
+    if neighbor.id in packet.trace:
+        return weights.penalty_in_trace
+    if packet.sender_id == neighbor.id:
+        return weights.penalty_sender
+    if packet.originator_id == neighbor.id:
+        return weights.penalty_in_trace
+    if neighbor.is_stale(now):
+        score += weights.penalty_stale
+    if not neighbor.is_available_for_relay:
+        return weights.penalty_in_trace
+
+    if neighbor.has_internet:
+        score += weights.internet
+
+    if packet.is_sos:
+        if neighbor.has_internet:
+            score += weights.sos_priority
+        if neighbor.role == ROLE_GOAL:
+            score += weights.sos_priority * 0.5
+
+    score += weights.battery * neighbor.normalized_battery
+    if neighbor.battery_level < weights.low_battery_threshold:
+        score += weights.penalty_low_battery
+
+    score += weights.signal * neighbor.normalized_signal
+
+    if neighbor.role == ROLE_GOAL:
+        score += weights.bonus_goal_role
+    elif neighbor.role == ROLE_RELAY:
+        score += weights.bonus_relay_role
+
+    return score
+
+
+def score_neighbors(neighbors: Sequence[NodeInfo], packet: MeshPacket, current_node_id: str,
+                    now: float, weights: Weights = DEFAULT_WEIGHTS) -> list[ScoredNode]:
+    """Viable candidates (score above the minimum), best first."""
+    scored = []
+    for neighbor in neighbors:
+        score = score_node(neighbor, packet, current_node_id, now, weights)
+        if score > weights.minimum_viable_score:
+            scored.append(ScoredNode(neighbor, score))
+    scored.sort(key=lambda s: s.score, reverse=True)
+    return scored
+
+
+def filter_eligible(neighbors: Sequence[NodeInfo], packet: MeshPacket, current_node_id: str,
+                    now: float) -> list[NodeInfo]:
+    """``AiRouter._filterEligibleNodes``."""
+    sender = packet.sender_id
+    return [
+        node for node in neighbors
+        if node.id not in packet.trace
+        and node.id != packet.originator_id
+        and node.id != sender
+        and not node.is_stale(now)
+        and (node.is_available_for_relay or packet.is_sos)
+    ]
+
+
+@dataclass
+class Router:
+    """``AiRouter`` with an explicit clock and replaceable [weights]."""
+
+    weights: Weights = field(default_factory=Weights)
+
+    def select_best_node(self, neighbors: Sequence[NodeInfo], packet: MeshPacket,
+                         current_node_id: str, now: float) -> NodeInfo | None:
+        eligible = filter_eligible(neighbors, packet, current_node_id, now)
+        if not eligible:
+            return None
+        scored = score_neighbors(eligible, packet, current_node_id, now, self.weights)
+        return scored[0].node if scored else None
+
+    def get_routing_candidates(self, neighbors: Sequence[NodeInfo], packet: MeshPacket,
+                               current_node_id: str, now: float) -> list[NodeInfo]:
+        eligible = filter_eligible(neighbors, packet, current_node_id, now)
+        return [s.node for s in score_neighbors(eligible, packet, current_node_id, now, self.weights)]
+
+    def scored_candidates(self, neighbors: Sequence[NodeInfo], packet: MeshPacket,
+                          current_node_id: str, now: float) -> list[ScoredNode]:
+        """What ``makeRoutingDecision`` records as ``scoredCandidates``."""
+        eligible = filter_eligible(neighbors, packet, current_node_id, now)
+        return score_neighbors(eligible, packet, current_node_id, now, self.weights)
+
+    def failure_reason(self, neighbors: Sequence[NodeInfo], packet: MeshPacket,
+                       current_node_id: str, now: float) -> str | None:
+        """``AiRouter.getRoutingFailureReason`` (same strings)."""
+        if not neighbors:
+            return 'No neighbors discovered'
+        eligible = filter_eligible(neighbors, packet, current_node_id, now)
+        if not eligible:
+            if all(n.id in packet.trace for n in neighbors):
+                return 'All neighbors already in packet trace'
+            if all(n.is_stale(now) for n in neighbors):
+                return 'All neighbors are stale (not seen recently)'
+            if all(not n.is_available_for_relay for n in neighbors):
+                return 'No neighbors available for relay'
+            return 'All neighbors filtered out by routing rules'
+        if not score_neighbors(eligible, packet, current_node_id, now, self.weights):
+            return 'All candidates scored below minimum threshold'
+        return None
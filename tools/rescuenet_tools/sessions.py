@@ -0,0 +1,147 @@
+"""Benchmark: one connection per packet vs. multi-packet sessions.
+
+``RelayOrchestrator._attemptSend`` calls ``connectAndSendPacket`` for every
+packet and waits 500 ms between packets. Each call forms the group,
+resolves the peer IP, connects, sends, waits for the ACK and disconnects.
+This module drains the same queue of packets to one neighbour in four
+ways, against a stand-in receiver in a child process:
+
+``per-packet``
+    today's behaviour: connect per packet, ``--gap-ms`` between packets;
+``session``
+    one connection, stop-and-wait (one frame in flight);
+``pipelined``
+    one connection, up to ``--window`` frames in flight;
+``fallback``
+    the session client against a receiver without session support, as
+    when only the sender has been upgraded.
+
+``--setup-ms`` is slept before every connection. It stands in for group
+formation and IP resolution, which on the phones take seconds and which
+localhost does not have. Every per-packet result is passed to an
+[OutboxMarks] the way the orchestrator calls ``markSent``/``markFailed``.
+
+Usage::
+
+    python -m rescuenet_tools.sessions --count 20
+    python -m rescuenet_tools.sessions --count 2000 --setup-ms 0 --gap-ms 0
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+
+from .loadgen import LocalServer, generate_payloads, load_payloads
+from .wire import send_packet, send_session
+
+MODES = ('per-packet', 'session', 'pipelined', 'fallback')
+
+# RelayOrchestrator: Future.delayed(const Duration(milliseconds: 500)) between packets.
+ORCHESTRATOR_GAP_S = 0.5
+
+
+@dataclass
+class OutboxMarks:
+    """Records what the orchestrator would tell ``OutboxBox`` per packet."""
+
+    sent: list[int] = field(default_factory=list)
+    failed: list[int] = field(default_factory=list)
+
+    def __call__(self, index: int, acked: bool) -> None:
+        (self.sent if acked else self.failed).append(index)
+
+
+async def drain_per_packet(port: int, payloads: list[bytes], marks: OutboxMarks,
+                           setup_s: float, gap_s: float) -> int:
+    """Current orchestrator loop; returns the number of connections."""
+    for i, payload in enumerate(payloads):
+        if i:
+            await asyncio.sleep(gap_s)
+        await asyncio.sleep(setup_s)
+        try:
+            acked = await send_packet('127.0.0.1', payload, port)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            acked = False
+        marks(i, acked)
+    return len(payloads)
+
+
+async def drain_session(port: int, payloads: list[bytes], marks: OutboxMarks,
+                        setup_s: float, window: int) -> int:
+    async def open_connection(host: str, port: int):
+        await asyncio.sleep(setup_s)
+        return await asyncio.open_connection(host, port)
+
+    result = await send_session('127.0.0.1', payloads, port, window=window,
+                                on_result=marks, open_connection=open_connection)
+    return result.connections
+
+
+def run_mode(mode: str, payloads: list[bytes], setup_s: float = 0.0,
+             gap_s: float = ORCHESTRATOR_GAP_S, window: int = 8) -> dict:
+    """Drains [payloads] with one [mode] against a fresh stand-in receiver."""
+    marks = OutboxMarks()
+    with LocalServer(sessions=mode != 'fallback') as server:
+        started = time.perf_counter()
+        if mode == 'per-packet':
+            connections = asyncio.run(drain_per_packet(server.port, payloads, marks, setup_s, gap_s))
+        else:
+            connections = asyncio.run(drain_session(server.port, payloads, marks, setup_s,
+                                                    1 if mode == 'session' else window))
+        elapsed = time.perf_counter() - started
+    return {
+        'mode': mode,
+        'packets': len(payloads),
+        'connections': connections,
+        'mark_sent': len(marks.sent),
+        'mark_failed': len(marks.failed),
+        'received': server.stats.get('acked', 0),
+        'elapsed_s': elapsed,
+        'packets_per_s': len(payloads) / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.sessions',
+        description='Compare per-packet connections with multi-packet sessions.',
+    )
+    parser.add_argument('--count', type=int, default=20, help='queued packets for one neighbour')
+    parser.add_argument('--input', help='JSON-lines packets (default: generated SOS packets)')
+    parser.add_argument('--setup-ms', type=float, default=200.0,
+                        help='simulated group formation + IP resolution per connection')
+    parser.add_argument('--gap-ms', type=float, default=ORCHESTRATOR_GAP_S * 1000,
+                        help='pause between per-packet sends')
+    parser.add_argument('--window', type=int, default=8)
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    modes = args.modes.split(',')
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f'unknown mode(s): {", ".join(sorted(unknown))}')
+    payloads = load_payloads(args.input)[:args.count] if args.input else generate_payloads(args.count, args.seed)
+
+    rows = [run_mode(mode, payloads, args.setup_ms / 1000, args.gap_ms / 1000, args.window)
+            for mode in modes]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    base = rows[0]['elapsed_s']
+    print(f'{len(payloads)} packets, setup {args.setup_ms:g} ms/connection, gap {args.gap_ms:g} ms')
+    print(f'{"mode":<12} {"conns":>6} {"sent":>5} {"failed":>6} {"seconds":>8} {"pkt/s":>9} {"speedup":>8}')
+    for row in rows:
+        print(f'{row["mode"]:<12} {row["connections"]:>6} {row["mark_sent"]:>5} {row["mark_failed"]:>6} '
+              f'{row["elapsed_s"]:>8.2f} {row["packets_per_s"]:>9.1f} {base / row["elapsed_s"]:>7.1f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
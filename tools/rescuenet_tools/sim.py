@@ -0,0 +1,730 @@
+"""Discrete-event mesh simulator driven by the phones' routing logic.
+
+Each simulated phone runs the same pieces the app does:
+
+* ``MeshRepositoryImpl.sendSos`` / ``_handleForwardOrDeliver``: persist to
+  the outbox, then one immediate forward with ``AiRouter.selectBestNode``;
+  a node with internet that receives an SOS is the goal and stops it there.
+* ``RelayOrchestrator``: a 10 s periodic loop (skipped while the previous
+  loop is still running) that walks a snapshot of the pending packets in
+  priority order, 500 ms apart, and pauses 30 s after 3 consecutive
+  failures. As on the phone, the snapshot is not re-checked, so a packet the
+  immediate forward already delivered can be sent again.
+* ``OutboxBox``: ``markFailed`` re-queues until ``maxRetries = 3``; "no
+  route" leaves the packet pending without using a retry.
+* ``SeenPacketCache``: a received id already among the last
+  ``seen_capacity`` (1000) ids in insertion order is dropped after the ACK;
+  an older one has been evicted and is processed again.
+* ``WifiP2pHandler``: one connect-and-send at a time; a send while the
+  radio is busy fails at once (the "busy, skipping" path in the logs).
+* ``InternetProbe``: neighbours see the ``net`` flag from the last probe
+  (every 30 s while online, 10 s while offline), while the goal/relay
+  decision on receipt and ``tryDeliverLocally`` force a fresh probe that
+  costs ``probe_cost_s``. Uplinks can flap (``goal_uptime_s``) and a probe
+  can miss a working uplink (``probe_miss``), as seen in the captures.
+
+With ``redundancy`` k > 1, an SOS is forwarded to the top k of
+``AiRouter.getRoutingCandidates`` in one decision instead of to
+``selectedNode`` only (see :mod:`rescuenet_tools.kpath`). Sends still
+share the one radio, so they go back to back.
+
+With ``route_learning``, every phone has its own
+:class:`rescuenet_tools.routelearn.LearningRouter` and reports each send
+result to it; ``flaky_fraction`` adds neighbours it can learn to avoid.
+
+Routing decisions come from :mod:`rescuenet_tools.routing`, so changing a
+[Weights] field here is the same as changing the Dart constant.
+
+The radio is abstract: nodes in range (unit disk) see each other, RSSI falls
+off with a log-distance model, a send takes ``connect_s`` (uniform 0.5x to
+1.5x) and succeeds with a probability that falls with signal. A node that
+drops out keeps its last TXT record in its neighbours' tables until it goes
+stale after 2 minutes, which is what makes ``isStale`` matter.
+
+Usage::
+
+    python -m rescuenet_tools.sim --nodes 2000 --sos 200 --seed 3
+    python -m rescuenet_tools.sim --nodes 10000 --weights internet=60,battery=15 --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import math
+import random
+import sys
+import time
+import uuid
+from collections import Counter, deque
+from dataclasses import asdict, dataclass, field, replace
+from typing import Callable, Generator, Iterable
+
+from .dedupe import LRU_CAPACITY, LruDedupe
+from .packets import DEFAULT_TTL, PRIORITY_CRITICAL, TYPE_SOS, MeshPacket
+from .routing import (
+    DEFAULT_WEIGHTS,
+    ROLE_GOAL,
+    ROLE_IDLE,
+    ROLE_RELAY,
+    ROLE_SENDER,
+    NodeInfo,
+    Router,
+    Weights,
+)
+from .routelearn import LearningRouter
+from .stats import ascii_histogram, summarize
+
+Process = Generator[float, None, bool]
+
+
+@dataclass(frozen=True)
+class SimConfig:
+    nodes: int = 1000
+    radio_range_m: float = 100.0
+    mean_degree: float = 8.0  # sets the area side when [area_m] is None
+    area_m: float | None = None
+    goal_fraction: float = 0.02
+    relay_fraction: float = 0.5  # non-goal nodes advertising 'relay' (the rest 'idle')
+    unavailable_fraction: float = 0.05  # nodes advertising rel=0
+    churn: float = 0.05  # nodes that drop out at a random time during the run
+    sos_count: int = 100
+    sos_window_s: float = 600.0
+    duration_s: float = 3600.0
+    connect_s: float = 4.0
+    fail_s: float = 12.0
+    link_success: float = 0.95  # at -30 dBm
+    weak_link_success: float = 0.6  # at -90 dBm
+    relay_interval_s: float = 10.0
+    retry_delay_s: float = 30.0
+    max_consecutive_failures: int = 3
+    packet_gap_s: float = 0.5
+    max_retries: int = 3
+    goal_uptime_s: float = math.inf  # mean time an uplink stays up; inf = never drops
+    goal_downtime_s: float = 60.0
+    probe_online_s: float = 30.0  # InternetProbe._normalProbeInterval
+    probe_offline_s: float = 10.0  # InternetProbe._offlineProbeInterval
+    probe_cost_s: float = 0.5  # forced probe before each goal/relay decision
+    probe_miss: float = 0.0  # chance a probe reports offline on a working uplink
+    flaky_fraction: float = 0.0  # nodes whose group formation mostly fails
+    flaky_success: float = 0.2  # link success towards a flaky node
+    route_learning: bool = False  # each phone uses a routelearn.LearningRouter
+    redundancy: int = 1  # SOS next hops per decision (top k of getRoutingCandidates)
+    hedge_s: float = 0.0  # > 0: abandon a connect after this long and try the next candidate
+    redundancy_hops: int = 0  # fan out only while the trace is at most this long; 0 = at every hop
+    seen_capacity: int = LRU_CAPACITY  # SeenPacketCache ids per phone
+    ttl: int = DEFAULT_TTL
+    weights: Weights = DEFAULT_WEIGHTS
+    seed: int = 0
+
+    @property
+    def side_m(self) -> float:
+        if self.area_m is not None:
+            return self.area_m
+        return math.sqrt(self.nodes * math.pi * self.radio_range_m ** 2 / self.mean_degree)
+
+
+def signal_at(distance_m: float) -> int:
+    """Log-distance path loss: -40 dBm at 1 m, exponent 2.5 (-90 dBm at 100 m)."""
+    return round(-40 - 25 * math.log10(max(distance_m, 1.0)))
+
+
+class _Entry:
+    __slots__ = ('packet', 'retry_count', 'status')
+
+    def __init__(self, packet: MeshPacket) -> None:
+        self.packet = packet
+        self.retry_count = 0
+        self.status = 'pending'
+
+
+class _Node:
+    __slots__ = ('index', 'id', 'x', 'y', 'has_internet', 'online', 'uplink', 'role',
+                 'base_role', 'battery', 'available', 'down_at', 'table', 'table_index',
+                 'views', 'outbox', 'seen', 'radio_free_at', 'processing', 'ticking',
+                 'phase', 'consecutive_failures', 'router', 'flaky')
+
+    def __init__(self, index: int, node_id: str, x: float, y: float,
+                 seen_capacity: int = LRU_CAPACITY) -> None:
+        self.index = index
+        self.id = node_id
+        self.x = x
+        self.y = y
+        self.has_internet = False  # as advertised: the last probe result
+        self.online = False  # whether the uplink actually works
+        self.uplink = False  # has an uplink at all (may flap)
+        self.role = ROLE_IDLE
+        self.base_role = ROLE_IDLE  # role while not a goal
+        self.battery = 100
+        self.available = True
+        self.down_at = math.inf
+        self.table: list[NodeInfo] = []
+        self.table_index: list[int] = []
+        self.views: list[NodeInfo] = []  # this node's entry in each neighbour's table
+        self.outbox: dict[str, _Entry] = {}
+        self.seen = LruDedupe(seen_capacity)
+        self.radio_free_at = 0.0
+        self.processing = False
+        self.ticking = False
+        self.phase = 0.0
+        self.consecutive_failures = 0
+        self.router: Router | None = None
+        self.flaky = False
+
+    def alive(self, now: float) -> bool:
+        return now < self.down_at
+
+    def pending(self) -> list[MeshPacket]:
+        # OutboxBox.getPendingPackets: filter, then sort by priority desc.
+        entries = [e for e in self.outbox.values() if e.status == 'pending']
+        entries.sort(key=lambda e: e.packet.priority, reverse=True)
+        return [e.packet for e in entries]
+
+
+@dataclass
+class SosRecord:
+    origin: int
+    created_at: float
+    delivered_at: float | None = None
+    hops: int | None = None
+    transmissions: int = 0
+    deliveries: int = 0
+    reachable: bool = False
+
+    @property
+    def time_to_goal(self) -> float | None:
+        return None if self.delivered_at is None else self.delivered_at - self.created_at
+
+
+@dataclass
+class SimResult:
+    config: SimConfig
+    sos: dict[str, SosRecord]
+    counters: Counter = field(default_factory=Counter)
+    wall_s: float = 0.0
+
+    @property
+    def delivery_ratio(self) -> float:
+        return sum(r.delivered_at is not None for r in self.sos.values()) / len(self.sos) if self.sos else math.nan
+
+    def report(self) -> dict:
+        delivered = [r for r in self.sos.values() if r.delivered_at is not None]
+        reachable = [r for r in self.sos.values() if r.reachable]
+        return {
+            'nodes': self.config.nodes,
+            'sos': len(self.sos),
+            'delivered': len(delivered),
+            'delivery_ratio': self.delivery_ratio,
+            'reachable': len(reachable),
+            'delivery_ratio_reachable': (sum(r.delivered_at is not None for r in reachable) / len(reachable)
+                                         if reachable else math.nan),
+            'time_to_goal_s': summarize(r.time_to_goal for r in delivered),
+            'hops': summarize(r.hops for r in delivered),
+            'hop_counts': dict(sorted(Counter(r.hops for r in delivered).items())),
+            'transmissions_per_sos': summarize(r.transmissions for r in self.sos.values()),
+            'wasted_attempts_per_delivered': (self.counters.get('send_failures', 0) / len(delivered)
+                                              if delivered else math.nan),
+            'counters': dict(sorted(self.counters.items())),
+            'wall_s': self.wall_s,
+        }
+
+
+class Simulation:
+    """One seeded run; call [run] once."""
+
+    def __init__(self, config: SimConfig) -> None:
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.router = Router(config.weights)
+        self.now = 0.0
+        self.counters: Counter = Counter()
+        self.sos: dict[str, SosRecord] = {}
+        self._queue: list[tuple[float, int, Callable, object]] = []
+        self._seq = 0
+        self.nodes = self._build_nodes()
+        for node in self.nodes:
+            node.router = LearningRouter(config.weights) if config.route_learning else self.router
+
+    # -- topology -------------------------------------------------------------
+
+    def _build_nodes(self) -> list[_Node]:
+        cfg, rng = self.config, self.rng
+        side = cfg.side_m
+        nodes = [
+            _Node(i, str(_uuid(rng)), rng.uniform(0, side), rng.uniform(0, side), cfg.seen_capacity)
+            for i in range(cfg.nodes)
+        ]
+        goals = max(1, round(cfg.nodes * cfg.goal_fraction))
+        for node in rng.sample(nodes, goals):
+            node.uplink = node.online = node.has_internet = True
+        for node in nodes:
+            node.battery = rng.randint(5, 100)
+            node.available = rng.random() >= cfg.unavailable_fraction
+            node.phase = rng.uniform(0, cfg.relay_interval_s)
+            if rng.random() < cfg.relay_fraction:
+                node.base_role = ROLE_RELAY
+            node.role = ROLE_GOAL if node.has_internet else node.base_role
+            if rng.random() < cfg.churn:
+                node.down_at = rng.uniform(0, cfg.duration_s)
+        if cfg.flaky_fraction > 0:
+            # Own stream, so the rest of the topology matches runs without flaky nodes.
+            flaky_rng = random.Random(f'flaky-{cfg.seed}')
+            for node in nodes:
+                node.flaky = flaky_rng.random() < cfg.flaky_fraction
+
+        # Grid hash with cell = range, so neighbours are in the 3x3 block.
+        cell = cfg.radio_range_m
+        grid: dict[tuple[int, int], list[_Node]] = {}
+        for node in nodes:
+            grid.setdefault((int(node.x // cell), int(node.y // cell)), []).append(node)
+        r2 = cfg.radio_range_m ** 2
+        for node in nodes:
+            cx, cy = int(node.x // cell), int(node.y // cell)
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for other in grid.get((cx + dx, cy + dy), ()):
+                        if other is node:
+                            continue
+                        d2 = (node.x - other.x) ** 2 + (node.y - other.y) ** 2
+                        if d2 <= r2:
+                            view = NodeInfo(
+                                id=other.id, battery_level=other.battery,
+                                has_internet=other.has_internet,
+                                signal_strength=signal_at(math.sqrt(d2)), role=other.role,
+                                is_available_for_relay=other.available,
+                            )
+                            node.table.append(view)
+                            node.table_index.append(other.index)
+                            other.views.append(view)
+        return nodes
+
+    def _goal_component(self) -> set[int]:
+        """Nodes with a path to any goal at t=0 (ignoring churn)."""
+        reached = {n.index for n in self.nodes if n.uplink}
+        frontier = deque(reached)
+        while frontier:
+            for j in self.nodes[frontier.popleft()].table_index:
+                if j not in reached:
+                    reached.add(j)
+                    frontier.append(j)
+        return reached
+
+    # -- scheduler ------------------------------------------------------------
+
+    def _at(self, t: float, callback: Callable, arg: object = None) -> None:
+        self._seq += 1
+        heapq.heappush(self._queue, (t, self._seq, callback, arg))
+
+    def _spawn(self, process: Process) -> None:
+        self._at(self.now, self._step, process)
+
+    def _step(self, process: Process) -> None:
+        try:
+            delay = next(process)
+        except StopIteration:
+            return
+        self._at(self.now + delay, self._step, process)
+
+    def run(self) -> SimResult:
+        cfg = self.config
+        started = time.perf_counter()
+        connected = self._goal_component()
+
+        for node in self.nodes:
+            if node.uplink:
+                self._spawn(self._probe_loop(node))
+                if math.isfinite(cfg.goal_uptime_s):
+                    self._spawn(self._flap(node))
+
+        candidates = [n for n in self.nodes if not n.uplink]
+        for _ in range(cfg.sos_count):
+            origin = self.rng.choice(candidates)
+            self._at(self.rng.uniform(0, cfg.sos_window_s), self._originate, (origin, origin.index in connected))
+
+        while self._queue:
+            t, _, callback, arg = heapq.heappop(self._queue)
+            if t > cfg.duration_s:
+                break
+            self.now = t
+            callback(arg)
+
+        return SimResult(cfg, self.sos, self.counters, time.perf_counter() - started)
+
+    # -- connectivity ---------------------------------------------------------
+
+    def _advertise(self, node: _Node) -> None:
+        """Pushes [node]'s TXT fields into every neighbour's table."""
+        node.role = ROLE_GOAL if node.has_internet else node.base_role
+        for view in node.views:
+            view.has_internet = node.has_internet
+            view.role = node.role
+
+    def _probe(self, node: _Node) -> bool:
+        result = node.online and self.rng.random() >= self.config.probe_miss
+        if result != node.has_internet:
+            node.has_internet = result
+            self._advertise(node)  # MeshBloc updates metadata on every change
+        return result
+
+    def _forced_probe(self, node: _Node) -> Generator[float, None, bool]:
+        """``checkConnectivity(forceRefresh: true)``."""
+        yield self.config.probe_cost_s
+        return self._probe(node)
+
+    def _probe_loop(self, node: _Node) -> Process:
+        cfg = self.config
+        yield self.rng.uniform(0, cfg.probe_online_s)
+        while node.alive(self.now):
+            self._probe(node)
+            yield cfg.probe_online_s if node.has_internet else cfg.probe_offline_s
+        return False
+
+    def _flap(self, node: _Node) -> Process:
+        cfg = self.config
+        while node.alive(self.now):
+            yield self.rng.expovariate(1 / cfg.goal_uptime_s)
+            node.online = False
+            yield self.rng.expovariate(1 / cfg.goal_downtime_s)
+            node.online = True
+        return False
+
+    # -- app behaviour --------------------------------------------------------
+
+    def _originate(self, arg: tuple[_Node, bool]) -> None:
+        node, reachable = arg
+        if not node.alive(self.now):
+            return
+        self._seq += 1
+        packet_id = f'{int(self.now * 1000)}-{self._seq}'
+        packet = MeshPacket(packet_id, node.id, '{}', (node.id,), self.config.ttl,
+                            int(self.now * 1000), PRIORITY_CRITICAL, TYPE_SOS)
+        self.sos[packet_id] = SosRecord(node.index, self.now, reachable=reachable)
+        node.base_role = ROLE_SENDER  # sendSos sets role 's' and updates metadata
+        self._advertise(node)
+        self._enqueue(node, packet)
+        self._spawn(self._immediate_forward(node, packet))
+
+    def _receive(self, node: _Node, packet: MeshPacket) -> Process:
+        """``_processIncomingPacket`` after the ACK has been sent."""
+        if not node.seen.check_and_mark(packet.id):
+            self.counters['duplicates'] += 1
+            return False
+
+        online = yield from self._forced_probe(node)
+        if packet.is_sos and online:
+            self._deliver(packet, hops=len(packet.trace))
+            return True
+
+        if packet.ttl <= 0:
+            self.counters['ttl_expired'] += 1
+            return False
+        if not node.alive(self.now):
+            return False
+
+        self._enqueue(node, packet)
+        return (yield from self._immediate_forward(node, packet.add_hop(node.id), original_id=packet.id))
+
+    def _deliver(self, packet: MeshPacket, hops: int) -> None:
+        record = self.sos[packet.id]
+        record.deliveries += 1
+        if record.delivered_at is None:
+            record.delivered_at = self.now
+            record.hops = hops
+
+    def _enqueue(self, node: _Node, packet: MeshPacket) -> None:
+        node.outbox[packet.id] = _Entry(packet)
+        node.seen.mark_as_seen(packet.id)
+        if not node.ticking:
+            node.ticking = True
+            interval = self.config.relay_interval_s
+            k = math.floor((self.now - node.phase) / interval) + 1
+            self._at(node.phase + k * interval, self._tick, node)
+
+    def _neighbors(self, node: _Node) -> list[NodeInfo]:
+        now = self.now
+        for info, j in zip(node.table, node.table_index):
+            info.last_seen = min(now, self.nodes[j].down_at)
+        return node.table
+
+    def _immediate_forward(self, node: _Node, packet: MeshPacket, original_id: str | None = None) -> Process:
+        ok = yield from self._forward(node, packet, packet)
+        if ok is None:
+            self.counters['immediate_no_route'] += 1
+            return False
+        if ok:
+            entry = node.outbox.get(original_id or packet.id)
+            if entry is not None:
+                entry.status = 'sent'
+        return ok
+
+    def _tick(self, node: _Node) -> None:
+        if not node.alive(self.now):
+            node.ticking = False
+            return
+        has_pending = any(e.status == 'pending' for e in node.outbox.values())
+        if not has_pending and not node.processing:
+            node.ticking = False
+            return
+        self._at(self.now + self.config.relay_interval_s, self._tick, node)
+        if not node.processing:
+            self._spawn(self._relay_loop(node))
+
+    def _relay_loop(self, node: _Node) -> Process:
+        cfg = self.config
+        node.processing = True
+        try:
+            packets = node.pending()
+            if not packets:
+                return False
+            for packet in packets:
+                if not node.alive(self.now):
+                    break
+                result = yield from self._process_packet(node, packet)
+                self.counters[f'relay_{result}'] += 1
+                if result == 'sent':
+                    node.consecutive_failures = 0
+                elif result == 'expired':
+                    node.consecutive_failures = 0
+                else:
+                    node.consecutive_failures += 1
+                if node.consecutive_failures >= cfg.max_consecutive_failures:
+                    self.counters['relay_pauses'] += 1
+                    yield cfg.retry_delay_s
+                    node.consecutive_failures = 0
+                yield cfg.packet_gap_s
+            return True
+        finally:
+            node.processing = False
+
+    def _process_packet(self, node: _Node, packet: MeshPacket) -> Generator[float, None, str]:
+        if packet.ttl <= 0:
+            node.outbox.pop(packet.id, None)
+            return 'expired'
+        if packet.is_sos:
+            # tryDeliverLocally: this node may have gained internet since.
+            online = yield from self._forced_probe(node)
+            if online:
+                self._deliver(packet, hops=len(packet.trace) - packet.has_visited(node.id))
+                self._mark_sent(node, packet.id)
+                return 'sent'
+        outgoing = packet if packet.has_visited(node.id) else packet.add_hop(node.id)
+        ok = yield from self._forward(node, packet, outgoing)
+        if ok is None:
+            return 'no_route'
+        if ok:
+            self._mark_sent(node, packet.id)
+            return 'sent'
+        entry = node.outbox.get(packet.id)
+        if entry is None:
+            return 'permanent_fail'
+        entry.retry_count += 1
+        if entry.retry_count >= self.config.max_retries:
+            entry.status = 'failed'
+            return 'permanent_fail'
+        entry.status = 'pending'
+        return 'retrying'
+
+    def _fan_out(self, packet: MeshPacket) -> int:
+        cfg = self.config
+        if cfg.redundancy <= 1 or not packet.is_sos:
+            return 1
+        if cfg.redundancy_hops and len(packet.trace) > cfg.redundancy_hops:
+            return 1
+        return cfg.redundancy
+
+    def _forward(self, node: _Node, packet: MeshPacket, outgoing: MeshPacket) -> Generator[float, None, bool | None]:
+        """One routing decision for [packet]; None when there is no route.
+
+        Sends [outgoing] to ``selectedNode``, or for an SOS with
+        [SimConfig.redundancy] k to the top k candidates. Without a hedge
+        every one of them gets a copy; with one, the next candidate is
+        tried only when the previous send failed or timed out (the last one
+        runs to completion). True when any copy was ACKed.
+        """
+        k = self._fan_out(packet)
+        if k == 1:
+            target = node.router.select_best_node(self._neighbors(node), packet, node.id, self.now)
+            if target is None:
+                return None
+            return (yield from self._send(node, outgoing, target))
+        candidates = node.router.get_routing_candidates(self._neighbors(node), packet, node.id, self.now)[:k]
+        if not candidates:
+            return None
+        hedge = self.config.hedge_s
+        acked = 0
+        for i, target in enumerate(candidates):
+            if i and self.now < node.radio_free_at:
+                yield node.radio_free_at - self.now  # another process took the radio in between
+            last = i == len(candidates) - 1
+            if (yield from self._send(node, outgoing, target, timeout_s=None if last or not hedge else hedge)):
+                acked += 1
+                if hedge:
+                    break
+        if acked > 1:
+            self.counters['redundant_copies'] += acked - 1
+        return acked > 0
+
+    def _mark_sent(self, node: _Node, packet_id: str) -> None:
+        entry = node.outbox.get(packet_id)
+        if entry is not None:
+            entry.status = 'sent'
+
+    def _send(self, node: _Node, packet: MeshPacket, target_info: NodeInfo,
+              timeout_s: float | None = None) -> Process:
+        """``connectAndSendPacket``: True when the target ACKs within [timeout_s]."""
+        cfg = self.config
+        if self.now < node.radio_free_at:
+            self.counters['busy_skips'] += 1
+            return False
+        self.counters['send_attempts'] += 1
+        target = self.nodes[node.table_index[node.table.index(target_info)]]
+        p_ok = cfg.weak_link_success + (cfg.link_success - cfg.weak_link_success) * target_info.normalized_signal
+        if target.flaky:
+            p_ok = cfg.flaky_success
+        duration = cfg.connect_s * self.rng.uniform(0.5, 1.5)
+        ok = target.alive(self.now + duration) and self.rng.random() < p_ok
+        if not ok:
+            duration = cfg.fail_s
+        if timeout_s is not None and duration > timeout_s:
+            ok, duration = False, timeout_s
+            self.counters['hedge_timeouts'] += 1
+        node.radio_free_at = self.now + duration
+        self.counters['airtime_ms'] += round(duration * 1000)
+        yield duration
+        if cfg.route_learning:
+            node.router.record(packet, target.id, ok, duration, self.now)
+        if not ok:
+            self.counters['send_failures'] += 1
+            if target.flaky:
+                self.counters['flaky_failures'] += 1
+            return False
+        self.counters['send_ok'] += 1
+        record = self.sos.get(packet.id)
+        if record is not None:
+            record.transmissions += 1
+        self._spawn(self._receive(target, packet))
+        return True
+
+
+def simulate(config: SimConfig) -> SimResult:
+    return Simulation(config).run()
+
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def parse_weights(text: str, base: Weights = DEFAULT_WEIGHTS) -> Weights:
+    """``internet=60,battery=15`` -> a [Weights] with those fields replaced."""
+    if not text:
+        return base
+    changes = {}
+    for part in text.split(','):
+        key, _, value = part.partition('=')
+        key = key.strip().replace('-', '_')
+        if key not in Weights.__dataclass_fields__:
+            raise ValueError(f'unknown weight {key!r}')
+        changes[key] = type(getattr(base, key))(float(value))
+    return replace(base, **changes)
+
+
+def parse_overrides(items: Iterable[str]) -> dict[str, str]:
+    """``--set`` arguments (``NAME=VALUE``) -> a [with_overrides] dict."""
+    overrides = {}
+    for item in items:
+        name, sep, value = item.partition('=')
+        if not sep or not name:
+            raise ValueError(f'expected NAME=VALUE but got {item!r}')
+        overrides[name] = value
+    return overrides
+
+
+def with_overrides(config: SimConfig, overrides: dict[str, float | str]) -> SimConfig:
+    """[config] with fields replaced by name; ``weights.<name>`` sets a weight.
+
+    Values are cast to the type of the field they replace, so sweep grids
+    and ``--set`` can pass plain numbers or strings.
+    """
+    fields, weights = {}, {}
+    for name, value in overrides.items():
+        if name.startswith('weights.'):
+            key = name[len('weights.'):]
+            if key not in Weights.__dataclass_fields__:
+                raise ValueError(f'unknown weight {key!r}')
+            weights[key] = _cast(getattr(config.weights, key), value)
+        elif name in SimConfig.__dataclass_fields__ and name != 'weights':
+            fields[name] = _cast(getattr(config, name), value)
+        else:
+            raise ValueError(f'unknown simulation parameter {name!r}')
+    if weights:
+        fields['weights'] = replace(config.weights, **weights)
+    return replace(config, **fields)
+
+
+def _cast(current: object, value: float | str) -> object:
+    if isinstance(current, bool):
+        return str(value).lower() in ('1', 'true', 'yes')
+    if isinstance(current, int):
+        return int(float(value))
+    return float(value)
+
+
+def format_report(report: dict) -> str:
+    ttg, hops = report['time_to_goal_s'], report['hops']
+    lines = [
+        f'{report["nodes"]} nodes, {report["sos"]} SOS: delivered {report["delivered"]} '
+        f'({report["delivery_ratio"]:.1%}); {report["reachable"]} had a path to a goal '
+        f'({report["delivery_ratio_reachable"]:.1%} of those delivered)',
+        f'  time to goal (s)  p50 {ttg["p50"]:.1f}  p95 {ttg["p95"]:.1f}  p99 {ttg["p99"]:.1f}  max {ttg["max"]:.1f}',
+        f'  hops              p50 {hops["p50"]:.1f}  p95 {hops["p95"]:.1f}  max {hops["max"]:.0f}',
+        f'  transmissions/SOS mean {report["transmissions_per_sos"]["mean"]:.2f}',
+        '  ' + '  '.join(f'{k}={v}' for k, v in report['counters'].items()),
+        f'  ({report["wall_s"]:.1f} s wall)',
+    ]
+    return '\n'.join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.sim',
+        description='Simulate SOS delivery through AiRouter/RelayOrchestrator at scale.',
+    )
+    defaults = SimConfig()
+    parser.add_argument('--nodes', type=int, default=defaults.nodes)
+    parser.add_argument('--sos', type=int, default=defaults.sos_count)
+    parser.add_argument('--duration', type=float, default=defaults.duration_s)
+    parser.add_argument('--degree', type=float, default=defaults.mean_degree, help='mean neighbours per node')
+    parser.add_argument('--goals', type=float, default=defaults.goal_fraction, help='fraction with internet')
+    parser.add_argument('--churn', type=float, default=defaults.churn)
+    parser.add_argument('--weights', default='', help='e.g. internet=60,battery=15')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help='any SimConfig field, e.g. relay_interval_s=5 or goal_uptime_s=300')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--histogram', action='store_true', help='print the time-to-goal histogram')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    try:
+        weights = parse_weights(args.weights)
+        config = SimConfig(nodes=args.nodes, sos_count=args.sos, duration_s=args.duration,
+                           mean_degree=args.degree, goal_fraction=args.goals, churn=args.churn,
+                           weights=weights, seed=args.seed)
+        config = with_overrides(config, parse_overrides(args.set))
+    except ValueError as e:
+        parser.error(str(e))
+    result = simulate(config)
+    report = result.report()
+    if args.json:
+        report['config'] = asdict(config)
+        print(json.dumps(report, indent=2))
+        return 0
+    print(format_report(report))
+    if args.histogram:
+        for row in ascii_histogram([r.time_to_goal for r in result.sos.values() if r.delivered_at is not None]):
+            print('  ' + row)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,476 @@
+"""Spatial index for SOS and responder positions behind the tactical map.
+
+``SosPayload`` and TXT-record ``NodeInfo`` both carry latitude and
+longitude, and the map pages draw them. The command post needs "nearest N
+unassigned SOS to this responder" and "every SOS within R metres" over
+tens of thousands of positions that keep moving. [GeoIndex] answers both
+without scanning every point:
+
+* the globe is cut into fixed grids of cells, like geohashes of a few
+  precisions. A cell is [cell_m] metres high on the finest grid, and
+  [LEVELS] times that on the coarser ones, and as wide in degrees as it is
+  high at [ref_lat]. Each cell is a dict of ids and a point is in one cell
+  per grid, so insert, move and remove are O(1);
+* a radius query visits only the cells that can hold a point within R,
+  using exact haversine bounds, so it works at any latitude and across the
+  antimeridian. It uses the grid with the least expected work: block
+  cells visited plus the points in them. On sparse data, where a wide
+  radius would cover more fine cells than are occupied, that is a coarse
+  grid, not a scan of every cell. Candidates are compared against
+  ``sin²(R / 2r)`` before any square root or arcsine;
+* a k-nearest query runs radius queries with a growing radius, starting
+  at one cell, until at least k matching points are inside. Those include
+  the k nearest. The radius at least doubles each round, more when the
+  points found so far are sparse.
+
+Distances are haversine on a sphere of radius 6378137 m, as in
+``Geolocator.distanceBetween``. [LinearIndex] is the same API as a scan
+over every point, for checking and benchmarking.
+
+[SpatialFeed] keeps an index up to date from packets as they arrive.
+An SOS is keyed by its sender, so a person's newer SOS moves their point,
+and an SOS with ``isActive: false`` removes it. Neighbours are keyed by
+node id from their TXT records.
+
+Usage::
+
+    python -m rescuenet_tools.spatial --points 50000 --queries 2000
+    python -m rescuenet_tools.spatial --points 100000 --spread-km 40 --k 20 --radius-m 1000 --json
+    python -m rescuenet_tools.spatial --points 20000 --spread-km 4000 --k 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from .packets import DEFAULT_CENTER, MeshPacket, PacketFactory
+from .routing import NodeInfo
+from .stats import summarize
+
+EARTH_RADIUS_M = 6378137.0  # Geolocator.distanceBetween
+M_PER_DEG = math.pi * EARTH_RADIUS_M / 180
+CELL_M = 250.0
+LEVELS = (1, 32, 1024)  # cell sizes of the grids, in multiples of cell_m
+
+Where = Callable[[str, Any], bool]
+
+
+def distance_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Haversine distance in metres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    h = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(h)))
+
+
+def _check(lat: float, lng: float) -> None:
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+        raise ValueError(f'not a position: {lat}, {lng}')
+
+
+class _Grid:
+    """One level of [GeoIndex]: cells of [cell_m] metres, each a dict of points."""
+
+    __slots__ = ('cell_m', 'dlat', 'columns', 'dlng', 'cells')
+
+    def __init__(self, cell_m: float, ref_lat: float) -> None:
+        self.cell_m = cell_m
+        self.dlat = cell_m / M_PER_DEG
+        # Whole columns around the globe, so that column indexes wrap at the antimeridian.
+        self.columns = math.ceil(360.0 / min(360.0, self.dlat / math.cos(math.radians(ref_lat))))
+        self.dlng = 360.0 / self.columns
+        self.cells: dict[tuple[int, int], dict[str, tuple[float, float, float]]] = {}
+
+    def cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return math.floor((lat + 90.0) / self.dlat), math.floor((lng + 180.0) / self.dlng) % self.columns
+
+    def discard(self, cell: tuple[int, int], point_id: str) -> None:
+        bucket = self.cells[cell]
+        del bucket[point_id]
+        if not bucket:
+            del self.cells[cell]
+
+    def span(self, lat: float, lng: float, radius_m: float) -> tuple[int, int, tuple[int, int] | None, int]:
+        """Rows, columns (None for all) and cell count of the block that can hold a point within [radius_m]."""
+        span = radius_m / M_PER_DEG
+        lo, hi = max(-90.0, lat - span), min(90.0, lat + span)
+        i0, i1 = math.floor((lo + 90.0) / self.dlat), math.floor((hi + 90.0) / self.dlat)
+        # Two points within d differ in longitude by at most
+        # 2 asin(sin(d / 2r) / sqrt(cos phi1 cos phi2)); use the widest row.
+        c = min(math.cos(math.radians(lo)), math.cos(math.radians(hi)))
+        s = math.sin(min(math.pi / 2, radius_m / (2 * EARTH_RADIUS_M)))
+        columns = None
+        if c > s:
+            half = math.degrees(2 * math.asin(s / c))
+            j0 = math.floor((lng - half + 180.0) / self.dlng)
+            j1 = math.floor((lng + half + 180.0) / self.dlng)
+            if j1 - j0 + 1 < self.columns:
+                columns = (j0, j1)
+        width = self.columns if columns is None else columns[1] - columns[0] + 1
+        return i0, i1, columns, (i1 - i0 + 1) * width
+
+    def buckets(self, i0: int, i1: int, columns: tuple[int, int] | None,
+                block: int) -> list[dict[str, tuple[float, float, float]]]:
+        cells = self.cells
+        if columns is not None and block <= len(cells):
+            n = self.columns
+            return [b for i in range(i0, i1 + 1) for j in range(columns[0], columns[1] + 1)
+                    if (b := cells.get((i, j % n))) is not None]
+        return [b for (i, j), b in cells.items()
+                if i0 <= i <= i1 and (columns is None or _in_columns(j, columns, self.columns))]
+
+
+class GeoIndex:
+    """Grids of [cell_m]-metre cells and coarser, with incremental insert, move and remove.
+
+    Each point is stored as ``(phi, lambda, cos phi)`` in radians next to
+    its [value], which the ``where`` filters of the queries receive.
+    """
+
+    def __init__(self, cell_m: float = CELL_M, ref_lat: float = DEFAULT_CENTER[0]) -> None:
+        if cell_m <= 0 or not -90 < ref_lat < 90:
+            raise ValueError(f'need cell_m > 0 and -90 < ref_lat < 90, got {cell_m}, {ref_lat}')
+        self.cell_m = cell_m
+        self._grids = [_Grid(cell_m * factor, ref_lat) for factor in LEVELS]
+        self._where: dict[str, tuple[tuple[int, int], ...]] = {}  # id -> its cell on every level
+        self._values: dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, point_id: str) -> bool:
+        return point_id in self._where
+
+    def get(self, point_id: str) -> tuple[float, float, Any] | None:
+        """``(lat, lng, value)`` of [point_id], or None."""
+        cells = self._where.get(point_id)
+        if cells is None:
+            return None
+        phi, lam, _ = self._grids[0].cells[cells[0]][point_id]
+        return math.degrees(phi), math.degrees(lam), self._values[point_id]
+
+    def upsert(self, point_id: str, lat: float, lng: float, value: Any = None) -> bool:
+        """Inserts [point_id] or moves it to ([lat], [lng]); True when it was new."""
+        _check(lat, lng)
+        phi = math.radians(lat)
+        entry = (phi, math.radians(lng), math.cos(phi))
+        old = self._where.get(point_id)
+        cells = tuple(grid.cell(lat, lng) for grid in self._grids)
+        for level, (grid, cell) in enumerate(zip(self._grids, cells)):
+            if old is not None and old[level] != cell:
+                grid.discard(old[level], point_id)
+            bucket = grid.cells.get(cell)
+            if bucket is None:
+                bucket = grid.cells[cell] = {}
+            bucket[point_id] = entry
+        self._where[point_id] = cells
+        self._values[point_id] = value
+        return old is None
+
+    def remove(self, point_id: str) -> bool:
+        cells = self._where.pop(point_id, None)
+        if cells is None:
+            return False
+        for grid, cell in zip(self._grids, cells):
+            grid.discard(cell, point_id)
+        del self._values[point_id]
+        return True
+
+    def within(self, lat: float, lng: float, radius_m: float, where: Where | None = None,
+               sort: bool = True) -> list[tuple[float, str]]:
+        """``(distance_m, id)`` of every point within [radius_m], nearest first."""
+        _check(lat, lng)
+        points = len(self._where)
+        if not points:
+            return []
+        # The level with the least expected work: cells visited (the block,
+        # or every occupied cell when that is fewer) plus the points in them.
+        best = None
+        for grid in self._grids:
+            i0, i1, columns, block = grid.span(lat, lng, radius_m)
+            occupied = len(grid.cells)
+            cost = min(block, occupied) + min(points, block * points / occupied)
+            if best is None or cost < best[0]:
+                best = cost, grid, i0, i1, columns, block
+        _, grid, i0, i1, columns, block = best
+        phi, lam = math.radians(lat), math.radians(lng)
+        cos_phi = math.cos(phi)
+        limit = math.sin(min(math.pi / 2, radius_m / (2 * EARTH_RADIUS_M))) ** 2
+        sin, values = math.sin, self._values
+        found = []
+        for bucket in grid.buckets(i0, i1, columns, block):
+            for point_id, (p, l, c) in bucket.items():
+                h = sin((p - phi) / 2) ** 2 + cos_phi * c * sin((l - lam) / 2) ** 2
+                if h <= limit and (where is None or where(point_id, values[point_id])):
+                    found.append((h, point_id))
+        if sort:
+            found.sort()
+        return [(2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(1.0, h))), i) for h, i in found]
+
+    def nearest(self, lat: float, lng: float, k: int, where: Where | None = None,
+                max_m: float = math.inf) -> list[tuple[float, str]]:
+        """The [k] nearest points within [max_m] that pass [where], nearest first."""
+        if k <= 0 or not self._where:
+            return []
+        radius = self.cell_m
+        cap = min(max_m, math.pi * EARTH_RADIUS_M)
+        while True:
+            radius = min(radius, cap)
+            found = self.within(lat, lng, radius, where, sort=False)
+            if len(found) >= k or radius >= cap:
+                found.sort()
+                return found[:k]
+            # Jump towards the radius that holds k at the density seen so far.
+            grow = 2.0 if not found else max(2.0, math.sqrt(k / len(found)))
+            radius *= grow
+
+
+def _in_columns(j: int, columns: tuple[int, int], n: int) -> bool:
+    return (j - columns[0]) % n <= columns[1] - columns[0]
+
+
+class LinearIndex:
+    """[GeoIndex] API as a scan over every point (the baseline)."""
+
+    def __init__(self) -> None:
+        self._points: dict[str, tuple[float, float, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, point_id: str) -> bool:
+        return point_id in self._points
+
+    def get(self, point_id: str) -> tuple[float, float, Any] | None:
+        return self._points.get(point_id)
+
+    def upsert(self, point_id: str, lat: float, lng: float, value: Any = None) -> bool:
+        _check(lat, lng)
+        new = point_id not in self._points
+        self._points[point_id] = (lat, lng, value)
+        return new
+
+    def remove(self, point_id: str) -> bool:
+        return self._points.pop(point_id, None) is not None
+
+    def within(self, lat: float, lng: float, radius_m: float, where: Where | None = None,
+               sort: bool = True) -> list[tuple[float, str]]:
+        found = [(d, i) for i, (la, ln, v) in self._points.items()
+                 if (d := distance_m(lat, lng, la, ln)) <= radius_m and (where is None or where(i, v))]
+        if sort:
+            found.sort()
+        return found
+
+    def nearest(self, lat: float, lng: float, k: int, where: Where | None = None,
+                max_m: float = math.inf) -> list[tuple[float, str]]:
+        return heapq.nsmallest(max(k, 0), self.within(lat, lng, max_m, where, sort=False))
+
+
+@dataclass
+class Located:
+    """What the map shows for one point."""
+
+    kind: str  # 'sos' or 'node'
+    key: str  # senderId for an SOS, node id for a neighbour
+    updated_at: int  # SosPayload.timestamp, or NodeInfo.last_seen in ms
+    info: dict = field(default_factory=dict)
+    assigned_to: str | None = None
+
+
+class SpatialFeed:
+    """Keeps a [GeoIndex] current from packets and TXT records as they arrive."""
+
+    def __init__(self, index: GeoIndex | LinearIndex | None = None) -> None:
+        self.index = index if index is not None else GeoIndex()
+        self.updates = 0
+        self.removed = 0
+        self.skipped = 0  # not an SOS, no position fix, or older than what is indexed
+
+    def on_packet(self, packet: MeshPacket | str | bytes) -> bool:
+        """Indexes the SOS in [packet]; True when the index changed."""
+        if not isinstance(packet, MeshPacket):
+            packet = MeshPacket.from_json_string(packet)
+        if not packet.is_sos:
+            self.skipped += 1
+            return False
+        sos = json.loads(packet.payload)
+        key = f'sos:{sos.get("senderId") or packet.originator_id}'
+        timestamp = int(sos.get('timestamp') or packet.timestamp)
+        current = self.index.get(key)
+        if current is not None and current[2].updated_at > timestamp:
+            self.skipped += 1  # a copy that took a slower path
+            return False
+        if sos.get('isActive') is False:
+            if self.index.remove(key):
+                self.removed += 1
+                return True
+            return False
+        lat, lng = sos.get('latitude'), sos.get('longitude')
+        if lat is None or lng is None or lat == lng == 0:
+            self.skipped += 1
+            return False
+        assigned = current[2].assigned_to if current is not None else None
+        self.index.upsert(key, float(lat), float(lng), Located('sos', key, timestamp, sos, assigned))
+        self.updates += 1
+        return True
+
+    def on_node(self, node: NodeInfo) -> bool:
+        """Indexes a neighbour from its TXT record; nodes without a fix are skipped."""
+        if node.latitude == node.longitude == 0:
+            self.skipped += 1
+            return False
+        key = f'node:{node.id}'
+        self.index.upsert(key, node.latitude, node.longitude,
+                          Located('node', key, int(node.last_seen * 1000),
+                                  {'role': node.role, 'battery': node.battery_level}))
+        self.updates += 1
+        return True
+
+    def assign(self, sos_key: str, responder: str | None) -> None:
+        point = self.index.get(sos_key)
+        if point is None:
+            raise KeyError(sos_key)
+        point[2].assigned_to = responder
+
+    def nearest_unassigned(self, lat: float, lng: float, k: int) -> list[tuple[float, str]]:
+        return self.index.nearest(lat, lng, k, _unassigned_sos)
+
+    def sos_within(self, lat: float, lng: float, radius_m: float) -> list[tuple[float, str]]:
+        return self.index.within(lat, lng, radius_m, _sos)
+
+
+def _sos(point_id: str, value: Located) -> bool:
+    return value.kind == 'sos'
+
+
+def _unassigned_sos(point_id: str, value: Located) -> bool:
+    return value.kind == 'sos' and value.assigned_to is None
+
+
+def scatter(count: int, spread_km: float, seed: int = 0,
+            center: tuple[float, float] = DEFAULT_CENTER) -> list[tuple[str, float, float]]:
+    """[count] points clustered around a few sites within [spread_km] of [center]."""
+    rng = random.Random(seed)
+    half = spread_km * 500 / M_PER_DEG
+    lng_scale = 1 / math.cos(math.radians(center[0]))
+    sites = [(center[0] + rng.uniform(-half, half), center[1] + rng.uniform(-half, half) * lng_scale)
+             for _ in range(max(1, count // 2000))]
+    points = []
+    for i in range(count):
+        if rng.random() < 0.7:
+            lat, lng = rng.choice(sites)
+            lat += rng.gauss(0, half / 10)
+            lng += rng.gauss(0, half / 10) * lng_scale
+        else:
+            lat = center[0] + rng.uniform(-half, half)
+            lng = center[1] + rng.uniform(-half, half) * lng_scale
+        points.append((f'p{i}', lat, lng))
+    return points
+
+
+def benchmark(points: int, queries: int, k: int, radius_m: float, spread_km: float = 20.0,
+              cell_m: float = CELL_M, seed: int = 0, linear_queries: int = 50) -> dict:
+    """Per-operation latency of [GeoIndex] and [LinearIndex] on the same data."""
+    rng = random.Random(seed + 1)
+    data = scatter(points, spread_km, seed)
+    probes = [(lat, lng) for _, lat, lng in rng.sample(data, min(queries, len(data)))]
+    moves = [(pid, lat + rng.gauss(0, 2e-4), lng + rng.gauss(0, 2e-4)) for pid, lat, lng in rng.sample(data, min(queries, len(data)))]
+    results: dict[str, dict] = {}
+    for name, index, n_queries in (('grid', GeoIndex(cell_m), len(probes)),
+                                   ('linear', LinearIndex(), min(linear_queries, len(probes)))):
+        t0 = time.perf_counter()
+        for pid, lat, lng in data:
+            index.upsert(pid, lat, lng)
+        insert_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for pid, lat, lng in moves:
+            index.upsert(pid, lat, lng)
+        move_us = (time.perf_counter() - t0) / len(moves) * 1e6
+        knn, radius, hits = [], [], []
+        for lat, lng in probes[:n_queries]:
+            t0 = time.perf_counter()
+            index.nearest(lat, lng, k)
+            t1 = time.perf_counter()
+            hits.append(len(index.within(lat, lng, radius_m)))
+            t2 = time.perf_counter()
+            knn.append((t1 - t0) * 1000)
+            radius.append((t2 - t1) * 1000)
+        results[name] = {
+            'insert_us': insert_s / len(data) * 1e6,
+            'move_us': move_us,
+            'knn_ms': summarize(knn),
+            'radius_ms': summarize(radius),
+            'radius_hits': summarize(hits),
+            'queries': n_queries,
+        }
+    # Both must agree: distances of the k nearest and the radius hits.
+    grid, linear = GeoIndex(cell_m), LinearIndex()
+    for pid, lat, lng in data:
+        grid.upsert(pid, lat, lng)
+        linear.upsert(pid, lat, lng)
+    for lat, lng in probes[:20]:
+        a = [round(d, 3) for d, _ in grid.nearest(lat, lng, k)]
+        b = [round(d, 3) for d, _ in linear.nearest(lat, lng, k)]
+        if a != b or {i for _, i in grid.within(lat, lng, radius_m)} != {i for _, i in linear.within(lat, lng, radius_m)}:
+            raise AssertionError(f'grid and linear scan disagree at {lat}, {lng}')
+    return {'points': points, 'k': k, 'radius_m': radius_m, 'spread_km': spread_km, 'cell_m': cell_m, **results}
+
+
+def feed_benchmark(count: int, seed: int = 0) -> dict:
+    """SOS packets per second through [SpatialFeed.on_packet] from JSON text."""
+    factory = PacketFactory(seed=seed, spread_deg=0.1)
+    texts = [factory.packet(hops=2).to_json_string() for _ in range(count)]
+    feed = SpatialFeed()
+    t0 = time.perf_counter()
+    for text in texts:
+        feed.on_packet(text)
+    elapsed = time.perf_counter() - t0
+    return {'packets': count, 'packets_per_s': count / elapsed if elapsed else 0.0, 'indexed': len(feed.index)}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.spatial',
+        description='k-nearest and radius queries: grid index vs. linear scan.',
+    )
+    parser.add_argument('--points', type=int, default=50_000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--radius-m', type=float, default=500.0)
+    parser.add_argument('--spread-km', type=float, default=20.0, help='side of the area the points cover')
+    parser.add_argument('--cell-m', type=float, default=CELL_M)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    try:
+        report = benchmark(args.points, args.queries, args.k, args.radius_m, args.spread_km, args.cell_m, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    report['feed'] = feed_benchmark(min(args.points, 20_000), args.seed)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    print(f'{args.points} points over {args.spread_km:g} km, cells {args.cell_m:g} m; '
+          f'k={args.k}, radius {args.radius_m:g} m')
+    print(f'{"index":<7} {"insert us":>9} {"move us":>8} {"knn p50":>8} {"knn p99":>8} '
+          f'{"rad p50":>8} {"rad p99":>8} {"hits p50":>8}  (ms)')
+    for name in ('grid', 'linear'):
+        r = report[name]
+        print(f'{name:<7} {r["insert_us"]:>9.2f} {r["move_us"]:>8.2f} {r["knn_ms"]["p50"]:>8.3f} '
+              f'{r["knn_ms"]["p99"]:>8.3f} {r["radius_ms"]["p50"]:>8.3f} {r["radius_ms"]["p99"]:>8.3f} '
+              f'{r["radius_hits"]["p50"]:>8.0f}')
+    feed = report['feed']
+    print(f'feed: {feed["packets_per_s"]:.0f} SOS packets/s from JSON ({feed["indexed"]} senders indexed)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Small summary-statistics helpers shared by the analysis and benchmark tools."""
+
+from __future__ import annotations
+
+import math
+import random
+from typing import Iterable, Iterator, Sequence
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile of an already sorted sequence.
+
+    [q] is in 0-100. Returns NaN for an empty sequence.
+    """
+    if not sorted_values:
+        return math.nan
+    if len(sorted_values) == 1:
+        return float(sorted_values[0])
+    rank = (len(sorted_values) - 1) * q / 100.0
+    lo = math.floor(rank)
+    hi = math.ceil(rank)
+    if lo == hi:
+        return float(sorted_values[lo])
+    frac = rank - lo
+    return sorted_values[lo] * (1 - frac) + sorted_values[hi] * frac
+
+
+def summarize(values: Iterable[float]) -> dict[str, float]:
+    """Count, mean and the p50/p95/p99 tail of [values]."""
+    data = sorted(values)
+    if not data:
+        return {'count': 0, 'mean': math.nan, 'min': math.nan, 'p50': math.nan,
+                'p95': math.nan, 'p99': math.nan, 'max': math.nan}
+    return {
+        'count': len(data),
+        'mean': sum(data) / len(data),
+        'min': float(data[0]),
+        'p50': percentile(data, 50),
+        'p95': percentile(data, 95),
+        'p99': percentile(data, 99),
+        'max': float(data[-1]),
+    }
+
+
+class Reservoir:
+    """A uniform sample of at most [size] values from an unbounded stream.
+
+    Count, mean, min and max are exact; the percentiles of [summary] come
+    from the sample (Vitter's algorithm R), so memory stays fixed however
+    long a process runs. Iterating yields the sampled values.
+    """
+
+    def __init__(self, size: int = 4096, seed: int = 0) -> None:
+        if size < 1:
+            raise ValueError(f'need size >= 1, got {size}')
+        self.size = size
+        self.count = 0
+        self.total = 0.0
+        self.min = math.nan
+        self.max = math.nan
+        self._sample: list[float] = []
+        self._rng = random.Random(seed)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if self.count == 1:
+            self.min = self.max = value
+        else:
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+        if len(self._sample) < self.size:
+            self._sample.append(value)
+        else:
+            slot = self._rng.randrange(self.count)
+            if slot < self.size:
+                self._sample[slot] = value
+
+    def __len__(self) -> int:
+        return len(self._sample)
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self._sample)
+
+    def summary(self, scale: float = 1.0) -> dict[str, float]:
+        """[summarize] of the stream, every value multiplied by [scale]."""
+        result = summarize(v * scale for v in self._sample)
+        if self.count:
+            result.update(count=self.count, mean=self.total / self.count * scale,
+                          min=float(self.min * scale), max=float(self.max * scale))
+        return result
+
+
+def ascii_histogram(values: Iterable[float], bins: int = 10, width: int = 40) -> list[str]:
+    """Renders [values] as text rows of ``lo-hi | ####  count``."""
+    data = sorted(values)
+    if not data:
+        return []
+    lo, hi = data[0], data[-1]
+    if hi == lo:
+        return [f'{lo:9.3f}           | {"#" * width} {len(data)}']
+    step = (hi - lo) / bins
+    counts = [0] * bins
+    for v in data:
+        counts[min(int((v - lo) / step), bins - 1)] += 1
+    peak = max(counts)
+    rows = []
+    for i, count in enumerate(counts):
+        bar = '#' * (round(count / peak * width) if count else 0)
+        rows.append(f'{lo + i * step:9.3f}-{lo + (i + 1) * step:<9.3f} | {bar:<{width}} {count}')
+    return rows
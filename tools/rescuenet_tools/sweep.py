@@ -0,0 +1,390 @@
+"""Parallel parameter sweeps over the mesh simulator.
+
+A sweep is a deterministic plan of simulator runs. A grid (``--grid``) is
+crossed with random samples (``--random``), and every point is run
+[replicates] times. Any [SimConfig] field or ``weights.<name>`` can be
+swept, including the RelayOrchestrator timings (``relay_interval_s``,
+``retry_delay_s``, ``max_consecutive_failures``, ``packet_gap_s``) and the
+InternetProbe intervals (``probe_online_s``, ``probe_offline_s``).
+
+Runs are spread over a process pool, one worker per core by default.
+Results are streamed to a columnar file (see :mod:`rescuenet_tools.colfile`)
+as runs finish. Re-running the same command resumes the sweep: run ids
+already in the file are skipped, and a torn final block left by a crash is
+discarded.
+
+Replicate *r* gets the same seed at every point, so points are compared
+on the same placement and SOS schedule wherever the node count matches
+(common random numbers).
+
+Usage::
+
+    python -m rescuenet_tools.sweep run out.rncol --nodes 300 --sos 40 \\
+        --grid relay_interval_s=5,10,20 --grid retry_delay_s=15,30,60 \\
+        --random weights.internet=30:70 --samples 8 --replicates 3
+    python -m rescuenet_tools.sweep summary out.rncol --top 10 --csv points.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Iterable, Iterator
+
+from .colfile import ColumnWriter, read_file
+from .sim import SimConfig, parse_overrides, simulate, with_overrides
+
+FORMAT = 'rescuenet-sweep/1'
+
+METRICS = ('sos', 'delivered', 'delivery_ratio', 'delivery_ratio_reachable',
+           'ttg_p50', 'ttg_p95', 'hops_p50', 'hops_p95', 'tx_per_sos',
+           'send_attempts', 'wasted_per_delivered', 'busy_skips', 'relay_pauses', 'wall_s')
+
+
+@dataclass(frozen=True)
+class Range:
+    """Uniform random range for one parameter; integer ranges include [hi]."""
+
+    lo: float
+    hi: float
+    integer: bool = False
+
+    def sample(self, rng: random.Random) -> float | int:
+        if self.integer:
+            return rng.randint(int(self.lo), int(self.hi))
+        return rng.uniform(self.lo, self.hi)
+
+
+@dataclass(frozen=True)
+class SweepSpec:
+    grid: dict[str, tuple] = field(default_factory=dict)
+    ranges: dict[str, Range] = field(default_factory=dict)
+    samples: int = 0
+    sample_seed: int = 0
+    replicates: int = 1
+    fixed: dict[str, float | str] = field(default_factory=dict)
+    seed: int = 0
+
+    @property
+    def parameters(self) -> list[str]:
+        return list(self.grid) + list(self.ranges)
+
+    def to_json(self) -> dict:
+        return {
+            'grid': {k: list(v) for k, v in self.grid.items()},
+            'ranges': {k: asdict(v) for k, v in self.ranges.items()},
+            'samples': self.samples,
+            'sample_seed': self.sample_seed,
+            'replicates': self.replicates,
+            'fixed': dict(self.fixed),
+            'seed': self.seed,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> SweepSpec:
+        return cls(
+            grid={k: tuple(v) for k, v in data['grid'].items()},
+            ranges={k: Range(**v) for k, v in data['ranges'].items()},
+            samples=data['samples'],
+            sample_seed=data['sample_seed'],
+            replicates=data['replicates'],
+            fixed=data['fixed'],
+            seed=data['seed'],
+        )
+
+
+@dataclass(frozen=True)
+class Run:
+    run: int
+    point: int
+    replicate: int
+    seed: int
+    params: dict[str, float | int]
+
+
+def run_seed(base_seed: int, replicate: int) -> int:
+    """Stable 32-bit seed for [replicate], independent of the hash seed and the platform."""
+    digest = hashlib.blake2b(f'{base_seed}:{replicate}'.encode(), digest_size=4).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def points(spec: SweepSpec) -> list[dict[str, float | int]]:
+    """Grid points crossed with [SweepSpec.samples] random draws, in plan order."""
+    grid = [dict(zip(spec.grid, values)) for values in itertools.product(*spec.grid.values())]
+    if not spec.ranges:
+        return grid
+    rng = random.Random(spec.sample_seed)
+    draws = [{name: r.sample(rng) for name, r in spec.ranges.items()} for _ in range(max(spec.samples, 1))]
+    return [{**g, **d} for g in grid for d in draws]
+
+
+def plan(spec: SweepSpec) -> list[Run]:
+    seeds = [run_seed(spec.seed, r) for r in range(spec.replicates)]
+    return [
+        Run(point * spec.replicates + r, point, r, seeds[r], params)
+        for point, params in enumerate(points(spec))
+        for r in range(spec.replicates)
+    ]
+
+
+def execute(spec: SweepSpec, run: Run) -> dict:
+    """Runs one simulation and flattens its report into a result row."""
+    config = with_overrides(SimConfig(seed=run.seed), {**spec.fixed, **run.params})
+    report = simulate(config).report()
+    counters = report['counters']
+    row = {'run': run.run, 'point': run.point, 'replicate': run.replicate, 'seed': run.seed}
+    row.update(run.params)
+    row.update(
+        sos=report['sos'],
+        delivered=report['delivered'],
+        delivery_ratio=report['delivery_ratio'],
+        delivery_ratio_reachable=report['delivery_ratio_reachable'],
+        ttg_p50=report['time_to_goal_s']['p50'],
+        ttg_p95=report['time_to_goal_s']['p95'],
+        hops_p50=report['hops']['p50'],
+        hops_p95=report['hops']['p95'],
+        tx_per_sos=report['transmissions_per_sos']['mean'],
+        send_attempts=counters.get('send_attempts', 0),
+        wasted_per_delivered=report['wasted_attempts_per_delivered'],
+        busy_skips=counters.get('busy_skips', 0),
+        relay_pauses=counters.get('relay_pauses', 0),
+        wall_s=report['wall_s'],
+    )
+    return row
+
+
+def _execute(task: tuple[SweepSpec, Run]) -> dict:
+    return execute(*task)
+
+
+def _ignore_sigint() -> None:
+    # The parent handles Ctrl-C and flushes; workers are terminated.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _results(spec: SweepSpec, runs: list[Run], jobs: int) -> Iterator[dict]:
+    if jobs <= 1:
+        for run in runs:
+            yield execute(spec, run)
+        return
+    with multiprocessing.Pool(jobs, initializer=_ignore_sigint) as pool:
+        try:
+            yield from pool.imap_unordered(_execute, [(spec, run) for run in runs], chunksize=1)
+        finally:
+            pool.terminate()
+
+
+def completed_runs(path: str, spec: SweepSpec) -> set[int]:
+    """Run ids already stored in [path]; raises ValueError if it holds another sweep."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return set()
+    metadata, columns = read_file(path)
+    stored = next((m for m in metadata if m.get('format') == FORMAT), None)
+    if stored is None:
+        return set()
+    if SweepSpec.from_json(stored['spec']) != spec:
+        raise ValueError(f'{path} holds a different sweep; use another output file')
+    return set(columns.get('run', []))
+
+
+def run_sweep(spec: SweepSpec, path: str, jobs: int | None = None, flush_rows: int = 32,
+              flush_s: float = 5.0, progress=None) -> tuple[int, int]:
+    """Runs every planned run not yet in [path]; returns ``(ran, skipped)``.
+
+    Rows are written as a row group every [flush_rows] rows or [flush_s]
+    seconds, whichever comes first, and on exit (including
+    KeyboardInterrupt). [progress] is called with ``(done, total)``.
+    """
+    done = completed_runs(path, spec)
+    todo = [run for run in plan(spec) if run.run not in done]
+    jobs = jobs or os.cpu_count() or 1
+    buffer: list[dict] = []
+    ran = 0
+    with ColumnWriter(path) as writer:
+        if not done:
+            writer.write_metadata({'format': FORMAT, 'spec': spec.to_json()})
+
+        def flush() -> None:
+            if buffer:
+                writer.write_group(_columns(buffer))
+                buffer.clear()
+
+        last = time.monotonic()
+        try:
+            for row in _results(spec, todo, min(jobs, max(len(todo), 1))):
+                buffer.append(row)
+                ran += 1
+                if len(buffer) >= flush_rows or time.monotonic() - last >= flush_s:
+                    flush()
+                    last = time.monotonic()
+                if progress:
+                    progress(len(done) + ran, len(done) + len(todo))
+        finally:
+            flush()
+    return ran, len(done)
+
+
+def _columns(rows: list[dict]) -> dict[str, list]:
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    return {name: [row.get(name) for row in rows] for name in names}
+
+
+def summarize_points(columns: dict[str, list], parameters: list[str]) -> list[dict]:
+    """One row per point: its parameters, the run count and each metric's replicate mean."""
+    groups: dict[int, list[int]] = defaultdict(list)
+    for i, point in enumerate(columns['point']):
+        groups[point].append(i)
+    out = []
+    for point, rows in sorted(groups.items()):
+        summary = {'point': point, **{p: columns[p][rows[0]] for p in parameters}, 'runs': len(rows)}
+        for metric in METRICS:
+            values = [columns[metric][i] for i in rows if not math.isnan(columns[metric][i])]
+            summary[metric] = sum(values) / len(values) if values else math.nan
+        out.append(summary)
+    return out
+
+
+def parse_grid(items: Iterable[str]) -> dict[str, tuple]:
+    grid = {}
+    for item in items:
+        name, _, values = item.partition('=')
+        if not values:
+            raise ValueError(f'expected NAME=V1,V2,... but got {item!r}')
+        grid[name] = tuple(_number(v) for v in values.split(','))
+    return grid
+
+
+def parse_ranges(items: Iterable[str]) -> dict[str, Range]:
+    ranges = {}
+    for item in items:
+        name, _, text = item.partition('=')
+        integer = text.startswith('int:')
+        parts = text[4:].split(':') if integer else text.split(':')
+        if len(parts) != 2:
+            raise ValueError(f'expected NAME=LO:HI or NAME=int:LO:HI but got {item!r}')
+        ranges[name] = Range(float(parts[0]), float(parts[1]), integer)
+    return ranges
+
+
+def _number(text: str) -> float | int | str:
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _format_value(value: object) -> str:
+    if isinstance(value, float):
+        return f'{value:.3f}'
+    return str(value)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.sweep',
+        description='Sweep simulator parameters across all cores into a resumable columnar file.',
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='run (or resume) a sweep')
+    run.add_argument('output')
+    run.add_argument('--grid', action='append', default=[], metavar='NAME=V1,V2,...')
+    run.add_argument('--random', action='append', default=[], metavar='NAME=LO:HI',
+                     help='uniform range; NAME=int:LO:HI for integers')
+    run.add_argument('--samples', type=int, default=16, help='random draws per grid point')
+    run.add_argument('--sample-seed', type=int, default=0)
+    run.add_argument('--replicates', type=int, default=1)
+    run.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                     help='fixed override for every run')
+    run.add_argument('--nodes', type=int, help='shorthand for --set nodes=N')
+    run.add_argument('--sos', type=int, help='shorthand for --set sos_count=N')
+    run.add_argument('--seed', type=int, default=0, help='base seed for the replicate seeds')
+    run.add_argument('--jobs', type=int, default=os.cpu_count(), help='worker processes')
+
+    summary = sub.add_parser('summary', help='per-point means of a sweep file')
+    summary.add_argument('input')
+    summary.add_argument('--sort', default='delivery_ratio', choices=METRICS)
+    summary.add_argument('--ascending', action='store_true')
+    summary.add_argument('--top', type=int, default=20)
+    summary.add_argument('--csv', help='write every point to this CSV file')
+
+    args = parser.parse_args(argv)
+    if args.command == 'summary':
+        return _summary(args)
+
+    try:
+        fixed = parse_overrides(args.set)
+        if args.nodes is not None:
+            fixed['nodes'] = args.nodes
+        if args.sos is not None:
+            fixed['sos_count'] = args.sos
+        spec = SweepSpec(grid=parse_grid(args.grid), ranges=parse_ranges(args.random),
+                         samples=args.samples if args.random else 0, sample_seed=args.sample_seed,
+                         replicates=args.replicates, fixed=fixed, seed=args.seed)
+        # Validate every name and value before starting the pool.
+        for params in points(spec)[:1]:
+            with_overrides(SimConfig(), {**spec.fixed, **params})
+        completed_runs(args.output, spec)
+    except ValueError as e:
+        parser.error(str(e))
+
+    total = len(plan(spec))
+    started = time.monotonic()
+
+    def progress(done: int, total: int) -> None:
+        print(f'\r{done}/{total} runs, {time.monotonic() - started:.0f} s', end='', file=sys.stderr)
+
+    try:
+        ran, skipped = run_sweep(spec, args.output, args.jobs, progress=progress)
+    except KeyboardInterrupt:
+        print(f'\ninterrupted; finished runs are in {args.output}, re-run to resume', file=sys.stderr)
+        return 130
+    print(file=sys.stderr)
+    print(f'{ran} runs in {time.monotonic() - started:.1f} s ({skipped} already done, {total} planned) '
+          f'on {min(args.jobs, max(ran, 1))} workers -> {args.output}')
+    return 0
+
+
+def _summary(args: argparse.Namespace) -> int:
+    metadata, columns = read_file(args.input)
+    stored = next((m for m in metadata if m.get('format') == FORMAT), None)
+    if stored is None or 'point' not in columns:
+        print(f'{args.input}: no sweep results', file=sys.stderr)
+        return 1
+    parameters = SweepSpec.from_json(stored['spec']).parameters
+    rows = summarize_points(columns, parameters)
+    nan_last = math.inf if args.ascending else -math.inf
+    rows.sort(key=lambda r: nan_last if math.isnan(r[args.sort]) else r[args.sort],
+              reverse=not args.ascending)
+
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    shown = ['point', *parameters, 'runs', 'delivery_ratio', 'ttg_p50', 'ttg_p95', 'hops_p50', 'tx_per_sos']
+    table = [shown] + [[_format_value(r[name]) for name in shown] for r in rows[:args.top]]
+    widths = [max(len(line[i]) for line in table) for i in range(len(shown))]
+    for line in table:
+        print('  '.join(cell.rjust(w) for cell, w in zip(line, widths)))
+    print(f'{len(rows)} points, {len(columns["run"])} runs; spec {json.dumps(stored["spec"]["fixed"])}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,409 @@
+"""Asyncio implementation of the phone-to-phone socket protocol.
+
+Mirrors ``SocketServerManager.handleClient`` and the sender half of
+``WifiP2pHandler.connectAndSendPacket``::
+
+    client -> server   [4-byte size][4-byte CRC32][size bytes UTF-8 MeshPacket JSON]
+    server -> client   0x06 (ACK) or 0x15 (NAK), then the server closes
+
+Both header fields are big-endian Java ``int`` values, so the size is
+signed and the CRC is the two's-complement of ``CRC32.value``. The server
+NAKs a size outside ``1..MAX_PACKET_SIZE`` without reading the body and
+NAKs a CRC mismatch after reading it; a stream that ends early is closed
+without a reply. Only after the ACK is written and the socket closed is the
+packet handed to the application, exactly as the Kotlin handler posts to
+Flutter after ``socket.close()``.
+
+Session mode (``MeshServer(sessions=True)``, [send_session]) carries any
+number of frames on one connection with the same framing. The server
+replies to every frame and keeps reading. A CRC NAK leaves the stream in
+sync, so the session continues; a size NAK cannot, so the server closes.
+The client ends the session by closing at a frame boundary. The sender may
+pipeline frames: replies come back in frame order. A server without
+session support closes after its first reply. [send_session] then resends
+the unconfirmed frames on a new connection, so it works against the
+phones as they are today.
+
+Usage::
+
+    python -m rescuenet_tools.wire serve --port 8888 --out received.jsonl
+    python -m rescuenet_tools.wire send 192.168.49.1 packet.json
+    python -m rescuenet_tools.wire send 192.168.49.1 a.json b.json c.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import inspect
+import json
+import struct
+import sys
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Sequence, Union
+
+DEFAULT_PORT = 8888
+ACK = 0x06
+NAK = 0x15
+MAX_PACKET_SIZE = 1048576  # 1 MB, same bound as SocketServerManager
+HEADER = struct.Struct('>iI')
+
+# WifiP2pHandler: socket.connect(..., 10000) and soTimeout = 5000.
+CONNECT_TIMEOUT_S = 10.0
+ACK_TIMEOUT_S = 5.0
+
+# The Kotlin handler blocks on readFully() forever. A command-post relay
+# serving dozens of phones drops silent peers instead; set to None for the
+# exact phone behaviour.
+DEFAULT_READ_TIMEOUT_S = 30.0
+
+PacketHandler = Callable[[str, 'tuple[str, int]'], Union[Awaitable[None], None]]
+Opener = Callable[[str, int], Awaitable['tuple[asyncio.StreamReader, asyncio.StreamWriter]']]
+
+
+def crc32(data: bytes) -> int:
+    """Unsigned CRC32, equal to ``java.util.zip.CRC32.value``."""
+    return zlib.crc32(data) & 0xFFFFFFFF
+
+
+def encode_frame(payload: bytes | str) -> bytes:
+    """Header plus body for one packet, ready to write to the socket."""
+    data = payload.encode('utf-8') if isinstance(payload, str) else payload
+    return HEADER.pack(len(data), crc32(data)) + data
+
+
+@dataclass
+class ServerStats:
+    """Counters kept by [MeshServer]; all are totals since start."""
+
+    connections: int = 0
+    acked: int = 0
+    nak_size: int = 0
+    nak_crc: int = 0
+    truncated: int = 0
+    timeouts: int = 0
+    handler_errors: int = 0
+    bytes_received: int = 0
+    sessions_closed: int = 0  # session connections ended by the client at a frame boundary
+
+    def as_dict(self) -> dict[str, int]:
+        return dict(self.__dict__)
+
+
+class MeshServer:
+    """Accepts framed packets from any number of concurrent senders.
+
+    [on_packet] receives the decoded JSON text and the peer address; it may
+    be a plain function or a coroutine function. Each connection carries one
+    packet, as on the phones, unless [sessions] is set.
+    """
+
+    def __init__(
+        self,
+        on_packet: PacketHandler | None = None,
+        *,
+        host: str = '0.0.0.0',
+        port: int = DEFAULT_PORT,
+        read_timeout: float | None = DEFAULT_READ_TIMEOUT_S,
+        backlog: int = 50,
+        sessions: bool = False,
+    ) -> None:
+        self._on_packet = on_packet
+        self.sessions = sessions
+        self.host = host
+        self.port = port
+        self.read_timeout = read_timeout
+        self.backlog = backlog
+        self.stats = ServerStats()
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        if self._server is not None:
+            return
+        self._server = await asyncio.start_server(
+            self._handle_client, self.host, self.port, backlog=self.backlog,
+        )
+        # Report the real port when bound to 0 (tests, benchmarks).
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        assert self._server is not None
+        await self._server.serve_forever()
+
+    async def __aenter__(self) -> MeshServer:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        await self.stop()
+
+    async def _read(self, reader: asyncio.StreamReader, n: int) -> bytes:
+        if self.read_timeout is None:
+            return await reader.readexactly(n)
+        return await asyncio.wait_for(reader.readexactly(n), self.read_timeout)
+
+    async def _handle_client(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        self.stats.connections += 1
+        peer = writer.get_extra_info('peername') or ('?', 0)
+        frames = 0
+        while True:
+            try:
+                try:
+                    header = await self._read(reader, HEADER.size)
+                except asyncio.IncompleteReadError as e:
+                    if frames and not e.partial:
+                        self.stats.sessions_closed += 1
+                        _close(writer)
+                        return
+                    raise
+                size, expected_crc = HEADER.unpack(header)
+                frames += 1
+
+                if size <= 0 or size > MAX_PACKET_SIZE:
+                    self.stats.nak_size += 1
+                    await _reply(writer, NAK)
+                    return
+
+                data = await self._read(reader, size)
+                if crc32(data) != expected_crc:
+                    self.stats.nak_crc += 1
+                    await _reply(writer, NAK, close=not self.sessions)
+                    if self.sessions:
+                        continue
+                    return
+
+                await _reply(writer, ACK, close=not self.sessions)
+                self.stats.acked += 1
+                self.stats.bytes_received += size
+            except asyncio.IncompleteReadError:
+                self.stats.truncated += 1
+                _close(writer)
+                return
+            except asyncio.TimeoutError:
+                self.stats.timeouts += 1
+                _close(writer)
+                return
+            except OSError:
+                self.stats.truncated += 1
+                _close(writer)
+                return
+
+            if self._on_packet is not None:
+                try:
+                    result = self._on_packet(data.decode('utf-8', errors='replace'), peer[:2])
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception:  # noqa: BLE001 - one bad packet must not kill the relay
+                    self.stats.handler_errors += 1
+            if not self.sessions:
+                return
+
+
+async def _reply(writer: asyncio.StreamWriter, code: int, close: bool = True) -> None:
+    writer.write(bytes((code,)))
+    try:
+        await writer.drain()
+    finally:
+        if close:
+            _close(writer)
+
+
+def _close(writer: asyncio.StreamWriter) -> None:
+    try:
+        writer.close()
+    except OSError:
+        pass
+
+
+async def send_packet(
+    host: str,
+    payload: bytes | str,
+    port: int = DEFAULT_PORT,
+    *,
+    connect_timeout: float = CONNECT_TIMEOUT_S,
+    ack_timeout: float = ACK_TIMEOUT_S,
+) -> bool:
+    """Sends one packet on a fresh connection and waits for the reply byte.
+
+    Returns True for ACK and False for NAK (or any other reply byte), like
+    ``connectAndSendPacket``. Connection problems, a timeout or the server
+    closing without a reply raise, which the phone reports as SOCKET_ERROR.
+    """
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(host, port), connect_timeout,
+    )
+    try:
+        writer.write(encode_frame(payload))
+        await writer.drain()
+        reply = await asyncio.wait_for(reader.readexactly(1), ack_timeout)
+        return reply[0] == ACK
+    finally:
+        _close(writer)
+
+
+@dataclass
+class SessionResult:
+    """Per-payload outcome of [send_session], in payload order.
+
+    An outcome is ``'ack'``, ``'nak'``, ``'timeout'`` (no reply within the
+    ACK timeout) or ``'closed'`` (the connection ended with no reply).
+    """
+
+    outcomes: list[str]
+    connections: int = 0
+    frames_sent: int = 0
+
+    @property
+    def acked(self) -> list[bool]:
+        return [o == 'ack' for o in self.outcomes]
+
+
+async def send_session(
+    host: str,
+    payloads: Sequence[bytes | str],
+    port: int = DEFAULT_PORT,
+    *,
+    window: int = 8,
+    connect_timeout: float = CONNECT_TIMEOUT_S,
+    ack_timeout: float = ACK_TIMEOUT_S,
+    on_result: Callable[[int, bool], object] | None = None,
+    open_connection: Opener = asyncio.open_connection,
+) -> SessionResult:
+    """Sends [payloads] over as few connections as the server allows.
+
+    Up to [window] frames are in flight before the oldest reply is awaited
+    (1 is stop-and-wait). Until a connection has answered two frames, only
+    one frame is in flight. A server without sessions that closes with
+    pipelined frames still unread would reset the connection, and the reset
+    can discard its ACK. [on_result] is called with the payload index and
+    whether it was ACKed as each one resolves. This is where a sender calls
+    ``OutboxBox.markSent`` or ``markFailed``. If the server closes,
+    unconfirmed frames are resent on a new connection. Each connection must
+    settle at least one payload; otherwise the oldest is given up as
+    ``'closed'``. A payload that times out is given up as ``'timeout'``.
+    Failing to connect raises, as in [send_packet]. Payloads already settled
+    have been reported through [on_result].
+    """
+    frames = [encode_frame(p) for p in payloads]
+    result = SessionResult([''] * len(frames))
+    pending = deque(range(len(frames)))
+
+    def settle(index: int, outcome: str) -> None:
+        result.outcomes[index] = outcome
+        if on_result is not None:
+            on_result(index, outcome == 'ack')
+
+    while pending:
+        reader, writer = await asyncio.wait_for(open_connection(host, port), connect_timeout)
+        result.connections += 1
+        in_flight: deque[int] = deque()
+        settled = 0
+        limit = 1
+        try:
+            while pending or in_flight:
+                while pending and len(in_flight) < limit:
+                    index = pending.popleft()
+                    writer.write(frames[index])
+                    in_flight.append(index)
+                    result.frames_sent += 1
+                await writer.drain()
+                reply = await asyncio.wait_for(reader.readexactly(1), ack_timeout)
+                settle(in_flight.popleft(), 'ack' if reply[0] == ACK else 'nak')
+                settled += 1
+                if settled == 2:
+                    limit = max(window, 1)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            if not settled and in_flight:
+                settle(in_flight.popleft(), 'closed')
+        except asyncio.TimeoutError:
+            settle(in_flight.popleft(), 'timeout')
+        finally:
+            _close(writer)
+        # Unconfirmed frames go first on the next connection, in order.
+        pending.extendleft(reversed(in_flight))
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rescuenet_tools.wire',
+        description='Host-side RescueNet socket server / client.',
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    serve = sub.add_parser('serve', help='accept packets like a phone would')
+    serve.add_argument('--host', default='0.0.0.0')
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve.add_argument('--out', help='append received packets as JSON lines here')
+    serve.add_argument('--read-timeout', type=float, default=DEFAULT_READ_TIMEOUT_S)
+
+    serve.add_argument('--sessions', action='store_true',
+                       help='keep connections open for further frames (session mode)')
+
+    send = sub.add_parser('send', help='send packet files (or - for stdin); several share one session')
+    send.add_argument('host')
+    send.add_argument('files', nargs='+')
+    send.add_argument('--port', type=int, default=DEFAULT_PORT)
+    send.add_argument('--window', type=int, default=8, help='frames in flight in a session')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'send':
+        payloads = []
+        for name in args.files:
+            if name == '-':
+                payloads.append(sys.stdin.buffer.read().strip())
+            else:
+                with open(name, 'rb') as f:
+                    payloads.append(f.read().strip())
+        if len(payloads) == 1:
+            acked = asyncio.run(send_packet(args.host, payloads[0], args.port))
+            print('ACK' if acked else 'NAK')
+            return 0 if acked else 1
+        result = asyncio.run(send_session(args.host, payloads, args.port, window=args.window))
+        for name, outcome in zip(args.files, result.outcomes):
+            print(f'{name}: {outcome.upper()}')
+        print(f'{result.connections} connection(s)', file=sys.stderr)
+        return 0 if all(result.acked) else 1
+
+    out = open(args.out, 'a', encoding='utf-8') if args.out else sys.stdout
+
+    def on_packet(text: str, peer: tuple[str, int]) -> None:
+        try:
+            packet = json.loads(text)
+            summary = f'{packet.get("id")} type={packet.get("packetType")} hops={len(packet.get("trace", []))}'
+        except ValueError:
+            summary = f'{len(text)} chars (not JSON)'
+        print(f'{peer[0]}: {summary}', file=sys.stderr)
+        out.write(text.replace('\n', ' ') + '\n')
+        out.flush()
+
+    server = MeshServer(on_packet, host=args.host, port=args.port,
+                        read_timeout=args.read_timeout, sessions=args.sessions)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats.as_dict()), file=sys.stderr)
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import os
+from collections import Counter
+
+import pytest
+
+from rescuenet_tools.archive import Archive, ArchiveWriter, device_label, ingest
+from rescuenet_tools.logcat import iter_events, parse_clock
+
+CAPTURE_1 = """\
+--------- beginning of main
+02-21 15:46:01.298  3386  3386 I MeshService: 🚀 Starting mesh
+02-21 15:46:02.100  3386  3401 W ConnectionManager: ⚠️ connect() returned ERROR (attempt 1/5)
+02-21 15:46:03.100  3386  3401 W ConnectionManager: ⚠️ connect() returned BUSY (attempt 2/5)
+02-21 15:46:04.000  3386  3401 D AiRouter: Neighbors: 2
+02-21 15:46:05.500  3386  3401 E ConnectionManager: ❌ Error reading ARP table
+02-21 15:46:06.100  3386  3401 W ConnectionManager: ⚠️ connect() returned ERROR (attempt 3/5)
+"""
+
+CAPTURE_2 = """\
+02-22 09:00:00.000  4100  4100 I MeshService: 🚀 Starting mesh
+02-22 09:00:01.000  4100  4120 W ConnectionManager: ⚠️ connect() returned ERROR (attempt 1/5)
+02-22 09:00:02.000  4100  4120 I AiRouter: Forwarding to aa:bb
+"""
+
+
+def _write(path, text, encoding='utf-16'):
+    with open(path, 'w', encoding=encoding, newline='\r\n') as f:
+        f.write(text)
+    return str(path)
+
+
+def test_ingest_once_and_query_across_sessions(tmp_path):
+    oppo = _write(tmp_path / 'device1_oppo_logs.txt', CAPTURE_1)
+    d2 = _write(tmp_path / 'd2_now.txt', CAPTURE_2, encoding='utf-8')
+    analyze = _write(tmp_path / 'analyze_output.txt', 'Analyzing ultra_pro_rescuenet...\nNo issues found!\n')
+    path = str(tmp_path / 'captures.rna')
+
+    results = ingest(path, [oppo, d2, analyze], year=2025, group_rows=2)
+    assert [s and (s.device, s.rows, s.groups) for _, s in results] == [('OPPO', 6, 3), ('d2', 3, 2), None]
+    assert [s for _, s in ingest(path, [oppo], year=2025)] == [None]  # same content again
+
+    with Archive(path) as archive:
+        assert archive.rows == 9 and [s.source for s in archive.sessions] == ['device1_oppo_logs.txt', 'd2_now.txt']
+        assert list(archive.events()) == [e.__class__(e.ts, e.level, e.tag, e.pid, e.message)
+                                          for p in (oppo, d2) for e in iter_events(p, year=2025)]
+        counts = archive.count(['device'], r'returned (\w+)', tags=['ConnectionManager'], contains='connect()')
+        assert counts == Counter({('OPPO', 'ERROR'): 2, ('OPPO', 'BUSY'): 1, ('d2', 'ERROR'): 1})
+        assert archive.count(['level', 'tag'], levels=['E']) == Counter({('E', 'ConnectionManager'): 1})
+
+        archive.chunks_read = 0
+        window = list(archive.scan(['message'], since=parse_clock('02-21 15:46:03', 2025),
+                                   until=parse_clock('02-21 15:46:05', 2025)))
+        assert [m for g in window for m in g['message']] == ['⚠️ connect() returned BUSY (attempt 2/5)',
+                                                            'Neighbors: 2']
+        assert archive.chunks_read == 1  # one group lies inside the window; the other four are skipped
+        assert list(archive.scan(['tag'], tags=['NoSuchTag'])) == []
+        with pytest.raises(ValueError):
+            list(archive.scan(['nope']))
+
+
+def test_a_torn_session_is_dropped_and_truncated(tmp_path):
+    one = _write(tmp_path / 'd1_logs.txt', CAPTURE_1)
+    two = _write(tmp_path / 'd2_logs.txt', CAPTURE_2)
+    path = str(tmp_path / 'captures.rna')
+    ingest(path, [one], year=2025)
+    complete = os.path.getsize(path)
+    ingest(path, [two], year=2025)
+    with open(path, 'r+b') as f:  # crash before the second session's record
+        f.truncate(os.path.getsize(path) - 40)
+
+    with Archive(path) as archive:
+        assert [s.device for s in archive.sessions] == ['d1'] and archive.end == complete
+        assert archive.dictionaries['device'] == ['d1']
+    with ArchiveWriter(path) as writer:
+        assert writer.recovered_bytes > 0 and os.path.getsize(path) == complete
+    assert [s.device for _, s in ingest(path, [two], year=2025)] == ['d2']
+    with Archive(path) as archive:
+        assert archive.count(['device']) == Counter({('d1',): 6, ('d2',): 3})
+    assert device_label('../device2_redmi_logs.txt') == 'Redmi' and device_label('x/d1_r6_logs.txt') == 'd1'
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from rescuenet_tools.batch_scorer import (  # noqa: E402
+    COMPONENTS,
+    IN_TRACE,
+    ORIGINATOR,
+    SENDER,
+    UNAVAILABLE,
+    NeighborTable,
+    benchmark,
+    random_neighbors,
+    random_packets,
+    score_batch,
+)
+from rescuenet_tools.routing import Router, Weights, score_node  # noqa: E402
+
+NOW = 10_000.0
+
+
+def _fixture(seed, neighbors=500, packets=12):
+    rng = random.Random(seed)
+    nodes = random_neighbors(neighbors, NOW, rng)
+    # Boundary values the scalar code branches on.
+    nodes[0].battery_level, nodes[1].battery_level = 20, 19
+    nodes[2].signal_strength, nodes[3].signal_strength = -90, -30
+    nodes[4].last_seen, nodes[5].last_seen = NOW - 120, NOW - 120.001
+    return nodes, random_packets(packets, neighbors, rng)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_scores_match_scalar_exactly(seed):
+    nodes, packets = _fixture(seed)
+    result = score_batch(NeighborTable.from_nodes(nodes), packets, NOW)
+    expected = np.array([[score_node(n, p, 'me', NOW) for n in nodes] for p in packets])
+    assert np.array_equal(result.scores, expected)
+
+
+def test_custom_weights_match_scalar():
+    nodes, packets = _fixture(9)
+    weights = Weights(internet=61.5, battery=13.0, penalty_stale=-40.0, low_battery_threshold=35)
+    result = score_batch(NeighborTable.from_nodes(nodes), packets, NOW, weights)
+    expected = np.array([[score_node(n, p, 'me', NOW, weights) for n in nodes] for p in packets])
+    assert np.array_equal(result.scores, expected)
+
+
+def test_selection_matches_router():
+    nodes, packets = _fixture(3, neighbors=60, packets=40)
+    result = score_batch(NeighborTable.from_nodes(nodes), packets, NOW)
+    router = Router()
+    for p, packet in enumerate(packets):
+        best = router.select_best_node(nodes, packet, 'me', NOW)
+        assert result.best()[p] == (-1 if best is None else nodes.index(best))
+        assert [nodes[i].id for i in result.ranked(p)] == \
+            [n.id for n in router.get_routing_candidates(nodes, packet, 'me', NOW)]
+
+
+def test_reasons_and_explanations():
+    nodes, packets = _fixture(4)
+    table = NeighborTable.from_nodes(nodes)
+    result = score_batch(table, packets, NOW)
+    packet = packets[0]
+    p = 0
+    assert result.reason[p, table.index_of(packet.sender_id)] in (IN_TRACE, SENDER)
+    assert result.reason[p, table.index_of(packet.originator_id)] in (IN_TRACE, ORIGINATOR)
+    unavailable = [i for i, n in enumerate(nodes)
+                   if not n.is_available_for_relay and n.id not in packet.trace]
+    assert all(result.reason[p, i] == UNAVAILABLE for i in unavailable)
+
+    ok = int(np.flatnonzero(result.reason[p] == 0)[0])
+    explained = result.explain(p, ok)
+    assert explained['reason'] == 'ok'
+    assert sum(explained[name] for name in COMPONENTS) == pytest.approx(explained['total'])
+
+
+def test_benchmark_checks_cold_and_warm_calls_against_the_scalar_port():
+    result = benchmark(300, 2, repeat=1)
+    assert result['cold_s'] > 0 and result['vector_s'] > 0
+    assert result['cold_speedup'] == pytest.approx(result['scalar_s'] / result['cold_s'])
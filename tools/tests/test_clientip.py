@@ -0,0 +1,75 @@
+import asyncio
+
+from rescuenet_tools.clientip import (
+    arp_hit,
+    candidates,
+    discover,
+    lease_hit,
+    parse_leases,
+    probe_round,
+    race,
+)
+
+ARP = """IP address       HW type     Flags       HW address            Mask     Device
+192.168.49.1     0x1         0x2         aa:bb:cc:dd:ee:01     *        p2p-wlan0-0
+192.168.49.40    0x1         0x0         00:00:00:00:00:00     *        p2p-wlan0-0
+192.168.49.151   0x1         0x2         0A:BB:CC:DD:EE:97     *        p2p-wlan0-0
+10.0.0.5         0x1         0x2         aa:bb:cc:dd:ee:05     *        wlan0
+"""
+
+
+def test_arp_skips_incomplete_entries_and_self():
+    assert arp_hit(ARP) == '192.168.49.151'
+    assert arp_hit(ARP, mac='0a:bb:cc:dd:ee:97') == '192.168.49.151'
+    assert arp_hit(ARP.replace('0x2         0A', '0x0         0A')) is None
+
+
+def test_leases_newest_unexpired_first():
+    text = ('1000 02:00:00:00:00:01 192.168.49.20 old *\n'
+            '3000 02:00:00:00:00:02 192.168.49.30 new *\n'
+            '9000 02:00:00:00:00:03 10.1.1.1 elsewhere *\n'
+            'garbage\n')
+    assert [lease.ip for lease in parse_leases(text)] == ['10.1.1.1', '192.168.49.30', '192.168.49.20']
+    assert lease_hit(text, now=2000) == '192.168.49.30'
+    assert lease_hit(text, now=5000) is None
+
+
+def test_connect_probe_returns_first_listener():
+    async def run():
+        server = await asyncio.start_server(lambda r, w: w.close(), '127.0.0.3', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            hosts = ['127.0.0.2', '127.0.0.3', '127.0.0.4']
+            return (await probe_round(hosts, port, 1.0, refused_is_alive=False),
+                    await probe_round(hosts, port, 1.0, refused_is_alive=True))
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    strict, any_host = asyncio.run(run())
+    assert strict == '127.0.0.3'
+    assert any_host in ('127.0.0.2', '127.0.0.3', '127.0.0.4')
+
+
+def test_race_ignores_failed_sources_and_reports_the_winner(tmp_path):
+    async def broken():
+        raise PermissionError('no ICMP')
+
+    async def slow():
+        await asyncio.sleep(5)
+        return '192.168.49.9'
+
+    async def fast():
+        await asyncio.sleep(0.01)
+        return '192.168.49.7'
+
+    found = asyncio.run(race({'ping': broken, 'slow': slow, 'fast': fast}, timeout_s=2))
+    assert (found.ip, found.strategy) == ('192.168.49.7', 'fast')
+    assert asyncio.run(race({'ping': broken}, timeout_s=1)) is None
+
+    arp = tmp_path / 'arp'
+    arp.write_text(ARP)
+    found = asyncio.run(discover(strategies=('arp', 'leases'), arp_path=str(arp),
+                                 leases_path=str(tmp_path / 'missing'), timeout_s=1))
+    assert (found.ip, found.strategy) == ('192.168.49.151', 'arp')
+    assert len(candidates()) == 253
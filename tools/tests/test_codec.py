@@ -0,0 +1,64 @@
+import pytest
+
+from rescuenet_tools.codec import DEFLATE, MAX_PAYLOAD, NONE, ZLIB, decode, decode_body, encode
+from rescuenet_tools.packets import MeshPacket, PacketFactory
+from rescuenet_tools.wire import crc32, encode_frame
+
+
+@pytest.mark.parametrize('compression,dictionary', [(NONE, False), (ZLIB, False),
+                                                    (DEFLATE, False), (DEFLATE, True)])
+def test_round_trip_generated_packets(compression, dictionary):
+    packets = list(PacketFactory(seed=3, sos_fraction=0.7).packets(200, max_hops=8))
+    for packet in packets:
+        assert decode(encode(packet, compression, dictionary)) == packet
+
+
+def test_round_trip_unusual_strings():
+    packet = MeshPacket('not-a-millis-id', 'ORIGIN-UPPER', '{"x":"héllo"}',
+                        ('ORIGIN-UPPER', '0123-45', '00000000-0000-0000-0000-00000000000A'),
+                        0, 0, 0, 'custom')
+    assert decode(encode(packet, ZLIB)) == packet
+    # Leading zeros would not survive the millis-hash encoding.
+    assert decode(encode(MeshPacket('01-2', 'a', '', ('a',)))).id == '01-2'
+    # Numbers too large for a varint fall back to UTF-8.
+    for big in ('1771668982189-' + '9' * 25, f'{2 ** 63}-1', f'1-{2 ** 63 - 1}'):
+        assert decode(encode(MeshPacket(big, 'a', '', ('a',)))).id == big
+
+
+def test_binary_is_smaller_and_grows_slower_per_hop():
+    factory = PacketFactory(seed=1)
+    packet = factory.packet()
+    relayed = packet.add_hop(factory.node_id())
+    json_growth = len(relayed.to_json_string()) - len(packet.to_json_string())
+    binary_growth = len(encode(relayed)) - len(encode(packet))
+    assert (json_growth, binary_growth) == (39, 18)
+    assert len(encode(packet, DEFLATE, True)) < len(packet.to_json_string()) / 2
+
+
+def test_decode_body_selects_format_and_keeps_crc_framing():
+    packet = PacketFactory(seed=2).packet(hops=2)
+    for body in (packet.to_json_string().encode(), encode(packet, DEFLATE, True)):
+        frame = encode_frame(body)
+        assert frame[8:] == body and int.from_bytes(frame[4:8], 'big') == crc32(body)
+        assert decode_body(body) == packet
+
+
+def test_malformed_input_raises_value_error():
+    body = encode(PacketFactory(seed=4).packet(hops=1), ZLIB)
+    for bad in (body[:-3], body + b'\x00', b'\x09' + body[1:], body[:-8] + b'\xff' * 8):
+        with pytest.raises(ValueError):
+            decode(bad)
+
+
+def test_reserved_compression_and_oversized_payloads_are_rejected():
+    body = bytearray(encode(PacketFactory(seed=5).packet(), DEFLATE))
+    body[1] |= 0x03  # compression 3 is reserved
+    with pytest.raises(ValueError, match='compression 3'):
+        decode(bytes(body))
+
+    bomb = encode(MeshPacket('p', 'a', ' ' * (MAX_PAYLOAD + 1), ('a',)), ZLIB)
+    assert len(bomb) < 4096
+    with pytest.raises(ValueError, match='inflates past'):
+        decode(bomb)
+    fits = MeshPacket('p', 'a', ' ' * MAX_PAYLOAD, ('a',))
+    assert decode(encode(fits, ZLIB)) == fits
@@ -0,0 +1,65 @@
+import pytest
+
+from rescuenet_tools import dedupe as dedupe_module
+from rescuenet_tools.codec import DEFLATE, encode, peek_id
+from rescuenet_tools.dedupe import (
+    Deduplicator,
+    LruDedupe,
+    ReceiveFilter,
+    flood,
+    replay,
+)
+from rescuenet_tools.packets import PacketFactory
+
+
+def test_bloom_does_not_leak_where_the_lru_does():
+    events = flood(5000, rate_per_s=100, copies=3, spread_s=60, seed=1)
+    lru = replay(events, lambda clock: LruDedupe(1000))
+    bloom = replay(events, lambda clock: Deduplicator(100_000, 1e-4, 3600, clock=clock))
+    assert lru['leaked'] > 0
+    assert bloom['leaked'] == 0 and bloom['false_drops'] == 0
+
+
+def test_ids_are_forgotten_after_the_window():
+    now = [0.0]
+    dedupe = Deduplicator(10_000, 1e-4, window_s=100, generations=4, recent=2, clock=lambda: now[0])
+    assert dedupe.check_and_mark('a') and not dedupe.check_and_mark('a')
+    for i in range(5):
+        dedupe.check_and_mark(f'x{i}')  # push 'a' out of the exact tier
+    now[0] = 70.0
+    assert dedupe.has_seen('a')
+    now[0] = 101.0
+    assert not dedupe.has_seen('a')
+    with pytest.raises(ValueError):
+        Deduplicator(10, fp_rate=1.5)
+
+
+def test_receive_filter_drops_duplicates_before_parsing():
+    factory = PacketFactory(seed=5)
+    first, second = factory.packet(hops=2), factory.packet(hops=1)
+    json_body = first.to_json_string().encode()
+    binary_body = encode(second, DEFLATE, True)
+    assert peek_id(json_body) == first.id and peek_id(binary_body) == second.id
+    assert peek_id(b'{"ttl":3,"id":"x"}') is None
+
+    front = ReceiveFilter(Deduplicator(1000))
+    with pytest.raises(ValueError):
+        front.receive(binary_body[:-4])
+    assert front.receive(json_body) == first
+    assert front.receive(binary_body) == second
+    assert front.receive(json_body) is None and front.receive(binary_body) is None
+    assert (front.parsed, front.dropped) == (2, 2)
+
+
+def test_a_new_id_is_hashed_once(monkeypatch):
+    calls = []
+    digest = dedupe_module._digest
+    monkeypatch.setattr(dedupe_module, '_digest', lambda packet_id: calls.append(packet_id) or digest(packet_id))
+    dedupe = Deduplicator(1000, recent=1)
+    assert dedupe.check_and_mark('a') and calls == ['a']
+    front = ReceiveFilter(dedupe)
+    packet = PacketFactory(seed=6).packet()
+    assert front.receive(packet.to_json_string().encode()) == packet and calls == ['a', packet.id]
+    assert not dedupe.has_seen('b') and dedupe.check_and_mark('c') and not dedupe.mark_as_seen('a')
+    assert calls == ['a', packet.id, 'b', 'c', 'a']
+    assert dedupe.mark_as_seen('b') and dedupe.has_seen('b')
@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+from rescuenet_tools.gateway import Gateway, GatewayConfig, HttpConnection, StandInUplink, batch_body, upload_item
+from rescuenet_tools.packets import PacketFactory
+from rescuenet_tools.stats import Reservoir
+
+
+def test_duplicates_are_dropped_and_batches_share_connections():
+    factory = PacketFactory(seed=1, sos_fraction=0.8)
+    packets = [factory.packet(hops=2) for _ in range(300)]
+    sos = [p for p in packets if p.is_sos]
+
+    async def run():
+        async with StandInUplink() as server:
+            config = GatewayConfig(max_batch=50, window_s=0.05, connections=2)
+            async with Gateway(server.url, config) as gateway:
+                for packet in packets + sos[:40]:
+                    gateway.ingest(packet)
+                assert not gateway.ingest_json('{"not": "a packet"}')
+        return server, gateway.stats
+
+    server, stats = asyncio.run(run())
+    assert len(server.received) == stats.uploaded == len(sos) and server.duplicates == 0
+    assert stats.duplicates == 40 and stats.rejected == len(packets) - len(sos) + 1
+    assert stats.requests <= len(sos) // 50 + 2 and stats.connections <= 2
+    assert stats.requests_saved == len(sos) - stats.requests
+
+
+def test_outage_spools_to_disk_and_the_next_start_drains_it(tmp_path):
+    spool = str(tmp_path / 'sos.spool')
+    factory = PacketFactory(seed=2)
+    first, second = [factory.packet() for _ in range(30)], [factory.packet() for _ in range(20)]
+    config = GatewayConfig(max_batch=10, window_s=0.01, backoff_base_s=0.05, backoff_max_s=0.1)
+    skew = [0.0]
+
+    def clock():
+        return time.time() + skew[0]
+
+    async def outage():
+        async with StandInUplink() as server:
+            server.down = True
+            gateway = Gateway(server.url, config, spool=spool, clock=clock)
+            await gateway.start()
+            for packet in first:
+                gateway.ingest(packet)
+            skew[0] = 60.0  # the first SOS are spooled a minute after they arrived
+            while gateway.up:
+                await asyncio.sleep(0.01)
+            for packet in second:
+                gateway.ingest(packet)
+            left = await gateway.close(timeout=0.5)
+        return left, gateway.stats, server
+
+    left, stats, server = asyncio.run(outage())
+    assert left == 50 and stats.uploaded == 0 and stats.failed_requests >= 1
+    assert not server.received and stats.spooled >= 50
+
+    async def recovery():
+        async with StandInUplink() as server:
+            gateway = Gateway(server.url, config, spool=spool, clock=clock)
+            await gateway.start()
+            gateway.ingest(first[0])  # already spooled, so a duplicate
+            left = await gateway.close(timeout=5.0)
+        return left, gateway.stats, server
+
+    left, stats, server = asyncio.run(recovery())
+    assert left == 0 and stats.uploaded == 50 and stats.duplicates == 1
+    assert set(server.received) == {p.id for p in first + second}
+    latency = stats.as_dict()['latency_ms']
+    assert latency['count'] == 50 and latency['min'] > 0 and latency['max'] >= 60_000
+
+
+def test_latency_reservoir_stays_bounded():
+    reservoir = Reservoir(size=100)
+    for i in range(10_000):
+        reservoir.add(i / 1000)
+    summary = reservoir.summary(1000)
+    assert len(reservoir) == 100 and summary['count'] == 10_000
+    assert (summary['min'], summary['max'], summary['mean']) == (0.0, 9999.0, 4999.5)
+    assert 4000 < summary['p50'] < 6000
+
+
+def test_a_slow_response_on_a_reused_connection_is_not_sent_again():
+    factory = PacketFactory(seed=3)
+    a, b, c = (factory.packet() for _ in range(3))
+
+    async def run():
+        async with StandInUplink() as server:
+            conn = HttpConnection(server.host, server.port, timeout=0.2)
+            assert (await conn.post('/sos', batch_body([upload_item(a, 0)])))[0] == 200
+            server.latency_s = 0.5
+            started = time.monotonic()
+            try:
+                await conn.post('/sos', batch_body([upload_item(b, 0)]))
+            except asyncio.TimeoutError:
+                elapsed = time.monotonic() - started
+            server.latency_s = 0.0
+            await asyncio.sleep(0.4)  # the server answers b on the closed connection
+            for writer in server._handlers.values():  # idle keep-alive closed by the server
+                writer.close()
+            await asyncio.sleep(0.01)
+            reopened = await conn.post('/sos', batch_body([upload_item(c, 0)]))
+            conn.close()
+        return server, elapsed, reopened
+
+    server, elapsed, reopened = asyncio.run(run())
+    assert elapsed < 0.4 and reopened[0] == 200
+    assert server.requests == 3 and server.duplicates == 0 and set(server.received) == {a.id, b.id, c.id}
+
+
+def test_close_timeout_keeps_the_batch_in_flight(tmp_path):
+    spool = str(tmp_path / 'sos.spool')
+    factory = PacketFactory(seed=4)
+    packets = [factory.packet() for _ in range(5)]
+    config = GatewayConfig(max_batch=10, window_s=0.01, connections=1)
+
+    async def run(path):
+        async with StandInUplink(latency_s=1.0) as server:
+            gateway = Gateway(server.url, config, spool=path)
+            await gateway.start()
+            for packet in packets:
+                gateway.ingest(packet)
+            await asyncio.sleep(0.05)  # the batch is now waiting for the slow response
+            left = await gateway.close(timeout=0.3)
+        return left, gateway.stats
+
+    left, stats = asyncio.run(run(spool))
+    assert left == 5 and stats.uploaded == 0 and stats.spooled == 5
+
+    async def recovery():
+        async with StandInUplink() as server:
+            async with Gateway(server.url, config, spool=spool):
+                pass
+        return server
+
+    assert set(asyncio.run(recovery()).received) == {p.id for p in packets}
+    # Without a spool, the batch is counted as left over rather than lost.
+    assert asyncio.run(run(None))[0] == 5
@@ -0,0 +1,42 @@
+import pytest
+
+from rescuenet_tools.kpath import evaluate, variants
+from rescuenet_tools.sim import SimConfig, simulate, with_overrides
+
+SMALL = {'nodes': 150, 'mean_degree': 10, 'goal_fraction': 0.05, 'sos_count': 30, 'duration_s': 900}
+
+
+def _run(**overrides):
+    return simulate(with_overrides(SimConfig(seed=2), {**SMALL, **overrides}))
+
+
+def test_redundancy_one_is_single_path_and_modes_behave_as_described():
+    single = _run()
+    assert _run(redundancy=1, hedge_s=5).counters == single.counters
+    assert single.counters['redundant_copies'] == 0 and single.counters['airtime_ms'] > 0
+
+    fanout = _run(redundancy=3)
+    assert fanout.counters['redundant_copies'] > 0
+    assert fanout.counters['send_attempts'] > single.counters['send_attempts']
+
+    hedged = _run(redundancy=3, hedge_s=3)
+    assert hedged.counters['redundant_copies'] == 0 and hedged.counters['hedge_timeouts'] > 0
+
+    origin_only = _run(redundancy=3, redundancy_hops=1)
+    assert 0 < origin_only.counters['redundant_copies'] < fanout.counters['redundant_copies']
+
+    # Copies that outlive the receive-path LRU are processed and forwarded again.
+    forgetful = _run(redundancy=3, seen_capacity=1)
+    assert forgetful.counters['send_attempts'] > fanout.counters['send_attempts']
+
+
+def test_evaluation_pairs_modes_on_the_same_sos():
+    report = evaluate([1], SMALL, variants(2, 7.0, 1))
+    modes = report['modes']
+    assert list(modes) == ['single', 'fanout-2', 'fanout-2-all', 'hedged-2', 'hedged-2-all']
+    assert len({row['sos'] for row in modes.values()}) == 1 and report['common'] > 0
+    assert modes['single']['extra_airtime'] == 0 and modes['fanout-2-all']['extra_airtime'] > 0
+    for row in modes.values():
+        assert row['delivered'] >= report['common'] and row['goal_copies_per_delivered'] >= 1
+    with pytest.raises(ValueError):
+        variants(1, 7.0, 1)
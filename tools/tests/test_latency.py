@@ -0,0 +1,51 @@
+import pytest
+
+from rescuenet_tools.latency import correlate, phase_report
+from rescuenet_tools.logcat import parse_line
+
+# Sender (A) runs as P2P client; receiver (B) clock is 0.250 s ahead.
+SENDER = """\
+02-21 16:16:10.000 I/flutter (1): Repository: Adding packet to outbox: 1-2
+02-21 16:16:12.798 D/WifiP2pHandler(1): CONNECT AND SEND
+02-21 16:16:12.798 D/WifiP2pHandler(1):    Target: 9e:56:a1:e8:e9:44
+02-21 16:16:12.798 D/WifiP2pHandler(1):    Packet size: 639 chars
+02-21 16:16:15.304 D/ConnectionManager(1): connect() attempt 1/5 (GO intent=0)
+02-21 16:16:18.534 D/ConnectionManager(1):    Group Formed: true
+02-21 16:16:18.534 D/ConnectionManager(1): CONNECTED (client mode) - Target IP: 192.168.49.1
+02-21 16:16:18.534 D/WifiP2pHandler(1): Connected, sending to IP: 192.168.49.1
+02-21 16:16:18.560 D/WifiP2pHandler(1): Sent 639 bytes, waiting for ACK...
+02-21 16:16:18.570 D/WifiP2pHandler(1): ACK received, disconnecting...
+"""
+
+RECEIVER = """\
+02-21 16:16:18.805 D/SocketServer(2): Expecting packet size: 639 bytes, CRC32: 1
+02-21 16:16:18.815 D/SocketServer(2): PACKET RECEIVED
+02-21 16:16:18.830 I/flutter (2): PACKET RECEIVED (639 bytes)
+"""
+
+
+def _events(text):
+    return [e for e in (parse_line(line, 2026) for line in text.splitlines()) if e]
+
+
+def test_aligns_receiver_clock_from_ack_exchange():
+    result = correlate(_events(SENDER), _events(RECEIVER))
+    # t2 - (t1 + t4) / 2 = 18.815 - 18.565
+    assert result.offset_b_minus_a == pytest.approx(0.250, abs=1e-6)
+    hop, = result.hops
+    assert hop.outcome == 'ack'
+    assert hop.delivered_at == pytest.approx(hop.marks['sent'] + 0.005, abs=1e-6)
+
+
+def test_phase_durations():
+    hop, = correlate(_events(SENDER), _events(RECEIVER)).hops
+    phases = hop.phases()
+    assert phases['discovery'] == pytest.approx(2.798)
+    assert phases['connect'] == pytest.approx(5.736)
+    assert phases['send'] == pytest.approx(0.026)
+    assert phases['ack'] == pytest.approx(0.010)
+    assert hop.total == pytest.approx(5.772)
+
+    report = phase_report([hop])
+    assert report['connect']['p50'] == pytest.approx(5.736)
+    assert report['outcomes']['ack'] == 1
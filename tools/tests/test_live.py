@@ -0,0 +1,76 @@
+import io
+import os
+
+import pytest
+
+from rescuenet_tools.live import METRICS, FileTail, LiveView, RollingWindow, parse_sources, run
+from rescuenet_tools.logcat import parse_clock
+
+LINES = [
+    '02-21 15:46:00.100 D/WifiP2pHandler( 3386): 📡 SERVICE FOUND (Name callback)',
+    '02-21 15:46:01.000 D/ConnectionManager( 3386): ➡️ connect() attempt 1/5 (GO intent=0)',
+    '02-21 15:46:01.010 W/ConnectionManager( 3386): ⚠️ connect() returned ERROR (attempt 1/5)',
+    '02-21 15:46:04.000 D/ConnectionManager( 3386): ➡️ connect() attempt 2/5 (GO intent=0)',
+    '02-21 15:46:04.010 W/ConnectionManager( 3386): ⚠️ connect() returned BUSY (attempt 2/5)',
+    '02-21 15:46:05.000 D/WifiP2pHandler( 3386): ✅ ACK received, disconnecting...',
+    '02-21 15:46:06.000 D/WifiP2pHandler( 3386): ❌ NAK received',
+    '02-21 15:46:07.000 D/WifiP2pHandler( 3386): 📥 Packet received from socket, forwarding to Flutter...',
+    '02-21 15:46:08.000 I/flutter ( 3386): [paused] Pausing after 3 consecutive failures',
+    '02-21 15:48:00.000 D/WifiP2pHandler( 3386): 📡 SERVICE FOUND (Name callback)',
+]
+
+
+def test_rolling_window_forgets_old_buckets_in_fixed_memory():
+    window = RollingWindow(window_s=10, bucket_s=1)
+    acks = METRICS.index('ack')
+    for ts in range(100):
+        assert window.add(1000.0 + ts, acks, 'X' if ts % 2 else None)
+    assert window.size == 10 and len(window._counts) == 10
+    counts, codes = window.totals(1099.5)
+    assert counts[acks] == 10 and codes == {'X': 5}
+    assert not window.add(1080.0, acks)  # older than the ring holds
+    assert window.totals(1200.0)[0][acks] == 0
+    with pytest.raises(ValueError):
+        RollingWindow(window_s=1, bucket_s=2)
+
+
+def test_tailing_a_growing_utf16_file(tmp_path):
+    path = tmp_path / 'd1_log.txt'
+    data = '\r\n'.join(LINES[:5]).encode('utf-16')
+    cut = data.index('BUSY'.encode('utf-16-le'))  # stop in the middle of a line
+    path.write_bytes(data[:cut])
+    view = LiveView(parse_sources([f'oppo={path}', str(tmp_path / 'missing.txt')]), window_s=60)
+    assert [d.label for d in view.devices] == ['oppo', 'missing']
+
+    assert view.poll() == 4
+    with open(path, 'ab') as f:
+        f.write(data[cut:] + '\r\n'.join([''] + LINES[5:] + ['']).encode('utf-16-le'))
+    assert view.poll() == 6
+    s = view.snapshot()[0]
+    assert s['total'] == {'discovery': 2, 'attempts': 2, 'failures': 2, 'ack': 1, 'nak': 1,
+                          'received': 1, 'pauses': 1}
+    assert s['window']['discovery'] == 1 and s['window']['attempts'] == 0  # 15:47:00 .. 15:48:00
+    assert s['codes'] == {'ERROR': 1, 'BUSY': 1} and s['ack_ratio'] is None
+    assert s['discovery_per_min'] == pytest.approx(1.0)
+
+    path.write_bytes('\n'.join(LINES[:2] + ['']).encode('utf-8'))  # logcat -c and a new capture
+    assert view.poll() == 2 and view.tails[0].restarts == 1
+    assert view.devices[0].total[METRICS.index('attempts')] == 3
+    assert 'connect() failures: ERROR 0/1, BUSY 0/1' in view.render()
+    view.close()
+
+
+def test_stdin_stream_and_the_dashboard_loop(tmp_path):
+    stream = io.BytesIO(('\n'.join(LINES[:8])).encode('utf-8'))  # no final newline
+    view = LiveView([('redmi', '-')], window_s=30, year=2025, stdin=stream)
+    out = io.StringIO()
+    usage = run(view, out, interval_s=1.0, once=True, clear=False, poll_s=0.01)
+    s = view.snapshot()[0]
+    assert view.at_end and s['lines'] == 8 and s['ack_ratio'] == 0.5
+    assert s['window']['received'] == 1 and view.devices[0].last_ts == parse_clock('02-21 15:46:07', 2025)
+    assert out.getvalue().count('RescueNet live') >= 1 and usage['cpu_s'] >= 0
+
+    tail = FileTail(os.fspath(tmp_path / 'd2.txt'), from_end=True)
+    assert tail.poll() == [] and tail.at_end
+    with pytest.raises(ValueError):
+        parse_sources(['-', 'a=-'])
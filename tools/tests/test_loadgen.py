@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+import pytest
+
+from rescuenet_tools.loadgen import LoadConfig, generate_payloads, run_load
+from rescuenet_tools.packets import MeshPacket, PacketFactory
+from rescuenet_tools.wire import MeshServer
+
+
+def test_generated_packets_match_dart_shape():
+    packet = PacketFactory(seed=1).packet(hops=2)
+    data = json.loads(packet.to_json_string())
+    assert list(data) == ['id', 'originatorId', 'payload', 'trace', 'ttl',
+                          'timestamp', 'priority', 'packetType']
+    assert data['packetType'] == 'sos' and data['priority'] == 3
+    assert len(data['trace']) == 3 and data['ttl'] == 18
+    assert json.loads(data['payload'])['senderId'] == data['originatorId']
+    assert MeshPacket.from_json_string(packet.to_json_string()) == packet
+    assert generate_payloads(5, seed=3) == generate_payloads(5, seed=3)
+
+
+def test_add_hop_rejects_loops():
+    packet = PacketFactory(seed=2).packet()
+    with pytest.raises(ValueError):
+        packet.add_hop(packet.originator_id)
+
+
+def test_counts_acks_and_naks_against_stand_in():
+    async def run():
+        async with MeshServer(host='127.0.0.1', port=0) as server:
+            config = LoadConfig(port=server.port, concurrency=8, count=200, bad_crc=0.25, seed=4)
+            result = await run_load(config, generate_payloads(20))
+            await asyncio.sleep(0.01)
+            return result, server.stats
+
+    result, stats = asyncio.run(run())
+    assert result.sent == 200
+    assert result.outcomes['ack'] == stats.acked
+    assert result.outcomes['nak'] == stats.nak_crc > 0
+    assert len(result.latencies) == 200
+    assert result.report()['ack_latency_ms']['p99'] >= result.report()['ack_latency_ms']['p50']
+
+
+def test_rate_limit_spreads_sends():
+    async def run():
+        async with MeshServer(host='127.0.0.1', port=0) as server:
+            config = LoadConfig(port=server.port, rate=100, count=21)
+            return await run_load(config, generate_payloads(3))
+
+    result = asyncio.run(run())
+    assert result.outcomes['ack'] == 21
+    assert result.elapsed >= 0.2
@@ -0,0 +1,101 @@
+from rescuenet_tools.logcat import (
+    LogIndex,
+    detect_encoding,
+    iter_events,
+    parse_clock,
+    parse_line,
+    repair_text,
+)
+
+TIME_LINES = [
+    '--------- beginning of main',
+    '02-21 15:46:16.800 D/WifiP2pHandler(31881): TXT RECORD RECEIVED',
+    '02-21 15:46:16.801 I/flutter (31881): Node discovered: f694 [TXT]',
+    '02-21 15:46:22.200 D/ConnectionManager(31881): CONNECTING TO: 9e:56:a1:e8:e9:44',
+    '02-21 15:46:26.747 D/ConnectionManager(31881): CONNECTED (client mode) - Target IP: 192.168.49.1',
+]
+
+
+def _write(path, lines, encoding):
+    data = '\r\n'.join(lines) + '\r\n'
+    if encoding == 'utf-16':
+        path.write_bytes(b'\xff\xfe' + data.encode('utf-16-le'))
+    else:
+        path.write_bytes(data.encode('utf-8'))
+    return path
+
+
+def test_parses_time_format():
+    event = parse_line(TIME_LINES[2], year=2026)
+    assert event.level == 'I'
+    assert event.tag == 'flutter'
+    assert event.pid == 31881
+    assert event.message == 'Node discovered: f694 [TXT]'
+    assert event.clock == '02-21 15:46:16.801'
+
+
+def test_parses_threadtime_format():
+    event = parse_line(
+        '02-20 12:53:38.985 25720 25771 D SocketServer: PACKET RECEIVED', year=2026,
+    )
+    assert (event.level, event.tag, event.pid) == ('D', 'SocketServer', 25720)
+    assert event.message == 'PACKET RECEIVED'
+
+
+def test_banner_lines_are_skipped():
+    assert parse_line(TIME_LINES[0]) is None
+
+
+def test_detects_bom_and_bomless_utf16():
+    assert detect_encoding(b'\xff\xfe-\x00') == ('utf-16-le', 2)
+    assert detect_encoding('02-21 15:46'.encode('utf-16-le')) == ('utf-16-le', 0)
+    assert detect_encoding(b'02-21 15:46') == ('utf-8', 0)
+
+
+def test_repairs_powershell_mojibake():
+    assert repair_text('Γ£à Discovery nudge succeeded') == '✅ Discovery nudge succeeded'
+    assert repair_text('├ó┼í┬á├»┬╕┬Å removeGroup') == '⚠️ removeGroup'
+    assert repair_text('plain ascii') == 'plain ascii'
+
+
+def test_streams_utf16_and_utf8_identically(tmp_path):
+    a = _write(tmp_path / 'a.txt', TIME_LINES, 'utf-16')
+    b = _write(tmp_path / 'b.txt', TIME_LINES, 'utf-8')
+    events_a = [(e.ts, e.tag, e.message) for e in iter_events(a, year=2026)]
+    events_b = [(e.ts, e.tag, e.message) for e in iter_events(b, year=2026)]
+    assert events_a == events_b
+    assert len(events_a) == 4
+
+
+def test_filters_by_tag_and_window(tmp_path):
+    path = _write(tmp_path / 'a.txt', TIME_LINES, 'utf-16')
+    events = list(iter_events(
+        path,
+        tags=['ConnectionManager'],
+        since=parse_clock('02-21 15:46:20', 2026),
+        until=parse_clock('02-21 15:46:25', 2026),
+        year=2026,
+    ))
+    assert [e.message[:10] for e in events] == ['CONNECTING']
+
+
+def test_index_query_matches_full_scan(tmp_path):
+    lines = [
+        f'02-21 15:{m:02d}:{s:02d}.000 D/{tag}(1): line {m} {s}'
+        for m in range(10)
+        for s in range(60)
+        for tag in ('WifiP2pHandler', 'SocketServer' if s % 7 == 0 else 'flutter')
+    ]
+    path = _write(tmp_path / 'big.txt', lines, 'utf-16')
+    index = LogIndex.build(path, year=2026, block_size=2048)
+    since = parse_clock('02-21 15:03:00', 2026)
+    until = parse_clock('02-21 15:04:30', 2026)
+
+    expected = list(iter_events(path, tags=['SocketServer'], since=since, until=until, year=2026))
+    assert list(index.query(['SocketServer'], since, until)) == expected
+    assert len(index.candidate_blocks(['SocketServer'], since, until)) < index.block_count // 4
+
+    index.save()
+    reloaded = LogIndex.open(path, year=2026)
+    assert reloaded.tag_counts == index.tag_counts
+    assert list(reloaded.query(['SocketServer'], since, until)) == expected
@@ -0,0 +1,164 @@
+import itertools
+
+from rescuenet_tools.outbox import (
+    FAILED,
+    PENDING,
+    SENT,
+    OutboxBox,
+    ScanOutbox,
+)
+from rescuenet_tools.packets import MeshPacket, PacketFactory
+
+
+def _packets(n, seed=0):
+    factory = PacketFactory(seed=seed, sos_fraction=0.5)
+    out = []
+    for i in range(n):
+        p = factory.packet()
+        out.append(MeshPacket(f'{p.id}-{i}', p.originator_id, p.payload, p.trace,
+                              p.ttl, p.timestamp, i % 4, p.packet_type))
+    return out
+
+
+def test_matches_scan_baseline_through_random_operations():
+    clock = itertools.count(1_000_000).__next__
+    indexed, scan = OutboxBox(clock=clock), ScanOutbox(clock=clock)
+    packets = _packets(300)
+    for p in packets:
+        indexed.add_packet(p)
+        scan.add_packet(p)
+    for i, p in enumerate(packets):
+        for box in (indexed, scan):
+            if i % 5 == 0:
+                box.mark_sent(p.id)
+            elif i % 5 == 1:
+                box.mark_in_progress(p.id)
+            elif i % 5 == 2:
+                box.mark_failed(p.id)
+        assert indexed.get_next_packet().priority == scan.get_next_packet().priority
+    # Retried packets rejoin the back of their priority; only the priority order is shared.
+    pending = indexed.get_pending_packets()
+    assert [p.priority for p in pending] == [p.priority for p in scan.get_pending_packets()]
+    assert sorted(p.id for p in pending) == sorted(p.id for p in scan.get_pending_packets())
+    assert indexed.get_stats() == scan.get_stats()
+    assert indexed.pending_count == scan.pending_count
+
+
+def test_retries_expiry_and_removal():
+    now = [0]
+    box = OutboxBox(clock=lambda: now[0], packet_ttl_ms=1000)
+    a, b = _packets(2)
+    box.add_packet(a)
+    assert box.mark_failed(a.id) and box.mark_failed(a.id)
+    assert not box.mark_failed(a.id) and box.get_status(a.id) == FAILED
+    assert not box.mark_failed('missing')
+    now[0] = 600
+    box.add_packet(b)
+    now[0] = 1500
+    assert box.cleanup_expired() == 1
+    assert not box.contains(a.id) and box.get_status(b.id) == PENDING
+    box.remove_packet(b.id)
+    assert box.total_count == 0 and box.get_next_packet() is None
+
+
+def test_reopen_restores_state_and_resets_in_progress(tmp_path):
+    path = str(tmp_path / 'outbox.log')
+    clock = itertools.count(1_000_000).__next__
+    packets = _packets(50)
+    with OutboxBox(path, clock=clock) as box:
+        for p in packets:
+            box.add_packet(p)
+        box.mark_sent(packets[0].id)
+        box.mark_in_progress(packets[1].id)
+        box.mark_failed(packets[2].id)
+        box.remove_packet(packets[3].id)
+        expected = [p.id for p in box.get_pending_packets()]
+    with OutboxBox(path, clock=clock) as box:
+        assert box.get_status(packets[0].id) == SENT
+        assert box.get_status(packets[1].id) == PENDING
+        assert box.get_status(packets[2].id) == PENDING
+        assert not box.contains(packets[3].id)
+        assert box.get_stats().in_progress == 0
+        # Same order as before; the reset in-progress packet rejoins the back of its priority.
+        priority = {p.id: p.priority for p in packets}
+        order = sorted(expected + [packets[1].id], key=lambda i: -priority[i])
+        assert [p.id for p in box.get_pending_packets()] == order
+        box.clear()
+    with OutboxBox(path, clock=clock) as box:
+        assert box.total_count == 0
+
+
+def test_torn_tail_is_dropped_and_compaction_keeps_entries(tmp_path):
+    path = str(tmp_path / 'outbox.log')
+    clock = itertools.count(1_000_000).__next__
+    packets = _packets(20)
+    with OutboxBox(path, clock=clock) as box:
+        for p in packets:
+            box.add_packet(p)
+        end = box._log.end
+        box.mark_sent(packets[0].id)
+    with open(path, 'r+b') as f:
+        f.seek(end + 9)
+        f.write(b'\xff\xff')  # corrupt the last record
+    with OutboxBox(path, clock=clock) as box:
+        assert box.recovered_bytes > 0
+        assert box.get_status(packets[0].id) == PENDING
+        assert box.pending_count == 20
+        for _ in range(3):
+            for p in packets:
+                box.mark_in_progress(p.id)
+                box.mark_failed(p.id)
+        box.compact()
+        assert box.log_records == 20
+        stats = box.get_stats()
+    with OutboxBox(path, clock=clock) as box:
+        assert box.recovered_bytes == 0
+        assert box.get_stats() == stats and stats.failed == 20
+
+
+def test_compaction_keeps_the_pending_order(tmp_path):
+    path = str(tmp_path / 'outbox.log')
+    clock = itertools.count(1_000_000).__next__
+    packets = _packets(12)
+    with OutboxBox(path, clock=clock) as box:
+        for p in packets:
+            box.add_packet(p)
+        for p in packets[:6:2]:  # retried packets go behind their peers
+            box.mark_in_progress(p.id)
+            box.mark_failed(p.id)
+        box.mark_sent(packets[1].id)
+        expected = [p.id for p in box.get_pending_packets()]
+        assert expected[0] != packets[0].id and box.get_next_packet().id == expected[0]
+        box.compact()
+    with OutboxBox(path, clock=clock) as box:
+        assert [p.id for p in box.get_pending_packets()] == expected
+        assert box.get_next_packet().id == expected[0] and box.get_status(packets[1].id) == SENT
+
+
+def _slots(box):
+    return sum(len(bucket) for bucket in box._buckets.values())
+
+
+def test_draining_from_the_head_stays_constant_per_packet():
+    clock = itertools.count(1_000_000).__next__
+    box = OutboxBox(clock=clock)
+    packets = _packets(3000)
+    for p in packets:
+        box.add_packet(p)
+    # Removals in the middle leave stale slots behind; two in three force rebuilds.
+    sent = {p.id for i, p in enumerate(packets) if i % 3}
+    for packet_id in sent:
+        box.mark_sent(packet_id)
+    assert _slots(box) <= 2 * box.pending_count + 64 * len(box._buckets)
+    expected = [p.id for p in sorted(packets, key=lambda p: -p.priority) if p.id not in sent]
+    assert [p.id for p in box.get_pending_packets()] == expected
+    drained = []
+    while (p := box.get_next_packet()) is not None:
+        # O(1) head access: the stale slots in front are gone and the head is live.
+        ticket, entry = box._buckets[-box._levels[0]][0]
+        assert entry.ticket == ticket and entry.packet is p
+        assert _slots(box) <= 2 * box.pending_count + 64 * len(box._buckets)
+        box.mark_in_progress(p.id)
+        box.mark_sent(p.id)
+        drained.append(p.id)
+    assert drained == expected and box.pending_count == 0 and _slots(box) == 0
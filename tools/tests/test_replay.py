@@ -0,0 +1,96 @@
+import pytest
+
+from rescuenet_tools.logcat import parse_line
+from rescuenet_tools.replay import parse_record, replay_events
+from rescuenet_tools.routing import Router, Weights
+
+GOAL = 'aaaa1111-0000-0000-0000-000000000000'
+RELAY = 'bbbb2222-0000-0000-0000-000000000000'
+
+CAPTURE = f"""\
+02-21 16:00:00.000 D/WifiP2pHandler(1): 📝 Updating metadata: {{sig=-70, bat=80, rel=1, id=self0000, net=0, rol=r}}
+02-21 16:00:01.000 D/WifiP2pHandler(1): 📋 TXT RECORD RECEIVED
+02-21 16:00:01.000 D/WifiP2pHandler(1):    Data: {{sig=-90, bat=15, rel=1, tri=n, id={GOAL}, net=1, rol=g}}
+02-21 16:00:01.001 D/WifiP2pHandler(1):    Data: {{sig=-40, bat=95, rel=1, tri=n, id={RELAY}, net=0, rol=r}}
+02-21 16:00:01.010 I/flutter (1): ✅ Node discovered: {GOAL} (aa:00:00:00:00:01) [TXT]
+02-21 16:00:01.011 I/flutter (1): ✅ Node discovered: {RELAY} (bb:00:00:00:00:02) [TXT]
+02-21 16:00:05.000 I/flutter (1): 🚨 Repository: Adding packet to outbox: 100-1
+02-21 16:00:05.001 I/flutter (1): 🚨 _forwardPacket: Checking neighbors (count: 2)
+02-21 16:00:05.001 I/flutter (1): 🚨 Neighbors: [aa:00:00:00:00:01, bb:00:00:00:00:02]
+02-21 16:00:05.002 I/flutter (1): 📡 Forwarding packet to {GOAL} (aa:00:00:00:00:01)
+02-21 16:00:05.003 I/flutter (1): CONNECT AND SEND PACKET
+02-21 16:00:05.003 I/flutter (1):    Target: aa:00:00:00:00:01
+02-21 16:00:05.004 D/WifiP2pHandler(1): 📤 CONNECT AND SEND
+02-21 16:00:09.000 D/WifiP2pHandler(1): ❌ NAK received
+02-21 16:00:10.000 D/SocketServer(1):    Data: {{"id":"200-2","originatorId":"{RELAY}","payload":"{{\\"sosId
+02-21 16:00:10.010 I/flutter (1): 📦 Persisting relay packet 200-2 to outbox before forward attempt
+02-21 16:00:10.011 I/flutter (1): 🚨 _forwardPacket: Checking neighbors (count: 2)
+02-21 16:00:10.011 I/flutter (1): 🚨 Neighbors: [aa:00:00:00:00:01, bb:00:00:00:00:02]
+02-21 16:00:10.012 I/flutter (1): 📡 Forwarding packet to {GOAL} (aa:00:00:00:00:01)
+02-21 16:00:10.013 I/flutter (1): CONNECT AND SEND PACKET
+02-21 16:00:10.013 I/flutter (1):    Target: aa:00:00:00:00:01
+02-21 16:00:10.014 D/WifiP2pHandler(1): 📤 CONNECT AND SEND
+02-21 16:00:12.000 D/WifiP2pHandler(1): ✅ ACK received
+02-21 16:00:12.001 I/flutter (1): ✅ Relay packet 200-2 forwarded immediately, marking sent
+02-21 16:00:55.000 I/flutter (1): CONNECT AND SEND PACKET
+02-21 16:00:55.000 I/flutter (1):    Target: aa:00:00:00:00:01
+02-21 16:00:55.001 D/WifiP2pHandler(1): 📤 CONNECT AND SEND
+02-21 16:00:58.000 D/WifiP2pHandler(1): ✅ ACK received
+"""
+
+
+def _events():
+    return [e for e in (parse_line(line, 2026) for line in CAPTURE.splitlines()) if e]
+
+
+def test_parse_record_reads_kotlin_and_dart_maps():
+    assert parse_record('sig=-70, id=x, net=1') == {'sig': '-70', 'id': 'x', 'net': '1'}
+    assert parse_record('id: x, bat: 71') == {'id': 'x', 'bat': '71'}
+
+
+def test_replay_matches_the_device_and_rebuilds_its_table():
+    result = replay_events(_events())
+    assert result.node_id == 'self0000'
+    kinds = [(d.kind, d.packet_id, d.actual, d.predicted) for d in result.decisions]
+    assert kinds == [
+        ('immediate', '100-1', GOAL, GOAL),
+        ('immediate', '200-2', GOAL, GOAL),
+        ('relay', '100-1', GOAL, GOAL),
+    ]
+    assert not result.divergences
+    assert not any(d.table_mismatch for d in result.decisions)
+    # The relay packet came from RELAY, so only GOAL was eligible.
+    assert [node for node, _ in result.decisions[1].scores] == [GOAL]
+
+
+def test_changed_weights_diverge_and_late_sends_are_flagged():
+    router = Router(Weights(internet=0, sos_priority=0, bonus_goal_role=0))
+    result = replay_events(_events(), router)
+    first = result.decisions[0]
+    assert first.diverged and first.unexplained and first.predicted == RELAY
+
+    # After the NAK at :09, 100-1 had a route from the :10 tick but waited until :55.
+    opportunity, = replay_events(_events()).opportunities
+    assert opportunity.packet_id == '100-1' and opportunity.target == GOAL
+    assert opportunity.delay_s == pytest.approx(45.0)
+
+
+def test_opportunities_are_reported_in_time_order():
+    # 100-1 is never sent again after its NAK; 300-3 waits half a minute for its forward.
+    late = [parse_line(line, 2026) for line in f"""\
+02-21 16:00:20.000 I/flutter (1): 🚨 Repository: Adding packet to outbox: 300-3
+02-21 16:00:50.000 I/flutter (1): 🚨 _forwardPacket: Checking neighbors (count: 2)
+02-21 16:00:50.000 I/flutter (1): 🚨 Neighbors: [aa:00:00:00:00:01, bb:00:00:00:00:02]
+02-21 16:00:50.001 I/flutter (1): 📡 Forwarding packet to {GOAL} (aa:00:00:00:00:01)
+02-21 16:00:50.002 I/flutter (1): CONNECT AND SEND PACKET
+02-21 16:00:50.002 I/flutter (1):    Target: aa:00:00:00:00:01
+""".splitlines()]
+    events = _events()
+    resend = events[-4].ts  # the relay send at :55
+    result = replay_events([e for e in events if e.ts < resend] + late)
+    opportunities = result.opportunities
+    assert [(o.packet_id, o.delay_s is None) for o in opportunities] == [('100-1', True), ('300-3', False)]
+    # 100-1 still counts as missed, from its route at :10 to the last event at :50.
+    summary = result.summary()
+    assert summary['never_attempted'] == 1
+    assert summary['missed_s'] == pytest.approx(40.002 + opportunities[1].delay_s)
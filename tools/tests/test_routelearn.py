@@ -0,0 +1,63 @@
+import pytest
+
+from rescuenet_tools.packets import PRIORITY_CRITICAL, TYPE_SOS, MeshPacket
+from rescuenet_tools.routelearn import LearningRouter, RouteLearner, evaluate, main
+from rescuenet_tools.routing import ROLE_GOAL, ROLE_RELAY, NodeInfo
+
+NOW = 1000.0
+
+
+def _sos():
+    return MeshPacket('p1', 'origin', '{}', ('origin',), 20, 0, PRIORITY_CRITICAL, TYPE_SOS)
+
+
+def test_estimate_learns_from_outcomes_and_decays_to_prior():
+    learner = RouteLearner(alpha=0.5, prior=0.8, half_life_s=100, latency_ref_s=10, latency_penalty=0.2)
+    assert learner.estimate('sos', 'a', 0) == 0.8
+    entry = learner.record('sos', 'a', False, 12.0, 0)
+    assert entry.score == pytest.approx(0.4) and entry.consecutive_failures == 1
+    entry = learner.record('sos', 'a', True, 5.0, 0)  # reward 1 - 0.2 * 0.5
+    assert entry.score == pytest.approx(0.65) and entry.consecutive_failures == 0
+    assert learner.estimate('sos', 'a', 100_000) == pytest.approx(0.8 - 0.15 / 2)
+    assert learner.to_json(0)[0]['nextHopId'] == 'a'
+
+
+def test_router_demotes_a_goal_after_repeated_failures_and_skips_it_after_many():
+    goal = NodeInfo('goal', battery_level=80, has_internet=True, role=ROLE_GOAL, last_seen=NOW)
+    weak_goal = NodeInfo('weak', battery_level=40, has_internet=True, signal_strength=-80, role=ROLE_GOAL,
+                         last_seen=NOW)
+    relay = NodeInfo('relay', battery_level=90, signal_strength=-40, role=ROLE_RELAY, last_seen=NOW)
+    neighbors = [relay, weak_goal, goal]
+    router = LearningRouter()
+    assert router.select_best_node(neighbors, _sos(), 'me', NOW).id == 'goal'
+    for _ in range(2):
+        router.record(_sos(), 'goal', False, 12.0, NOW)
+    assert router.select_best_node(neighbors, _sos(), 'me', NOW).id == 'goal'
+    router.record(_sos(), 'goal', False, 12.0, NOW)
+    # Demoted below the other goal, but not below a relay.
+    assert [n.id for n in router.get_routing_candidates(neighbors, _sos(), 'me', NOW)] == ['weak', 'goal', 'relay']
+    router.record(_sos(), 'goal', True, 4.0, NOW)
+    assert router.select_best_node(neighbors, _sos(), 'me', NOW).id == 'goal'
+    for _ in range(10):
+        router.record(_sos(), 'goal', False, 12.0, NOW)
+    assert [n.id for n in router.get_routing_candidates(neighbors, _sos(), 'me', NOW)] == ['weak', 'relay']
+    # An inactive hop is still used when nothing else is left, and recovers with time.
+    assert router.select_best_node([goal], _sos(), 'me', NOW).id == 'goal'
+    later = NOW + 3 * 3600
+    for node in neighbors:
+        node.last_seen = later
+    assert router.select_best_node(neighbors, _sos(), 'me', later).id == 'goal'
+
+
+def test_evaluation_runs_both_routers_on_the_same_seeds():
+    results = evaluate([1], {'nodes': 150, 'mean_degree': 12, 'goal_fraction': 0.08,
+                             'sos_count': 20, 'duration_s': 600, 'flaky_fraction': 0.2})
+    assert set(results) == {'static', 'learning'}
+    for row in results.values():
+        assert row['delivered'] > 0 and row['attempts'] >= row['wasted'] >= row['flaky'] > 0
+
+
+def test_malformed_set_is_a_usage_error(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(['--set', 'bogus'])
+    assert exit_info.value.code == 2 and "expected NAME=VALUE but got 'bogus'" in capsys.readouterr().err
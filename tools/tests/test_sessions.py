@@ -0,0 +1,10 @@
+from rescuenet_tools.loadgen import generate_payloads
+from rescuenet_tools.sessions import run_mode
+
+
+def test_every_mode_marks_every_packet_sent():
+    payloads = generate_payloads(12, seed=1)
+    for mode, connections in (('per-packet', 12), ('pipelined', 1), ('fallback', 12)):
+        row = run_mode(mode, payloads, gap_s=0.0)
+        assert (row['connections'], row['mark_sent'], row['mark_failed']) == (connections, 12, 0)
+        assert row['received'] == 12
@@ -0,0 +1,69 @@
+import pytest
+
+from rescuenet_tools.packets import PRIORITY_CRITICAL, TYPE_DATA, TYPE_SOS, MeshPacket
+from rescuenet_tools.routing import ROLE_GOAL, ROLE_RELAY, NodeInfo, Router, Weights, score_node
+from rescuenet_tools.sim import SimConfig, parse_overrides, parse_weights, simulate
+
+NOW = 1000.0
+
+
+def _sos(trace=('origin', 'relay-1')):
+    return MeshPacket('p1', trace[0], '{}', tuple(trace), 20, 0, PRIORITY_CRITICAL, TYPE_SOS)
+
+
+def test_score_matches_neighbor_scorer():
+    goal = NodeInfo('g', battery_level=80, has_internet=True, signal_strength=-60,
+                    role=ROLE_GOAL, last_seen=NOW)
+    # internet 50 + SOS internet 30 + SOS goal 15 + battery 20 + signal 5 + goal role 15
+    assert score_node(goal, _sos(), 'me', NOW) == pytest.approx(135.0)
+
+    weak = NodeInfo('w', battery_level=10, signal_strength=-100, role=ROLE_RELAY, last_seen=NOW)
+    # battery 2.5 - low battery 20 + signal 0 + relay 5
+    assert score_node(weak, _sos(), 'me', NOW) == pytest.approx(-12.5)
+
+    stale = NodeInfo('s', battery_level=100, last_seen=NOW - 121)
+    assert score_node(stale, _sos(), 'me', NOW) == pytest.approx(-100 + 25 + 10 * 40 / 60)
+
+    assert score_node(NodeInfo('relay-1', last_seen=NOW), _sos(), 'me', NOW) == -1000
+    assert score_node(NodeInfo('x', is_available_for_relay=False, last_seen=NOW),
+                      _sos(), 'me', NOW) == -1000
+
+
+def test_router_filters_like_ai_router():
+    router = Router()
+    neighbors = [
+        NodeInfo('origin', has_internet=True, last_seen=NOW),
+        NodeInfo('relay-1', has_internet=True, last_seen=NOW),
+        NodeInfo('old', has_internet=True, last_seen=NOW - 500),
+        NodeInfo('busy', has_internet=True, is_available_for_relay=False, last_seen=NOW),
+        NodeInfo('ok', battery_level=50, last_seen=NOW),
+    ]
+    assert router.select_best_node(neighbors, _sos(), 'me', NOW).id == 'ok'
+    data = MeshPacket('p2', 'origin', '{}', ('origin',), 20, 0, 1, TYPE_DATA)
+    assert [n.id for n in router.get_routing_candidates(neighbors, data, 'me', NOW)] == ['relay-1', 'ok']
+    assert router.failure_reason(neighbors[:2], _sos(), 'me', NOW) == 'All neighbors already in packet trace'
+
+
+def test_simulation_is_deterministic_and_delivers():
+    config = SimConfig(nodes=300, mean_degree=12, goal_fraction=0.1, churn=0.0,
+                       sos_count=40, duration_s=900, seed=5)
+    first = simulate(config).report()
+    second = simulate(config).report()
+    first.pop('wall_s'), second.pop('wall_s')
+    assert first == second
+    assert first['delivered'] > 0
+    assert 1 <= first['hops']['min'] <= first['hops']['max'] <= 20
+    assert first['time_to_goal_s']['max'] <= 900
+
+
+def test_parse_weights():
+    assert parse_weights('internet=0,battery=40') == Weights(internet=0.0, battery=40.0)
+    with pytest.raises(ValueError):
+        parse_weights('nope=1')
+
+
+def test_parse_overrides():
+    assert parse_overrides(['nodes=50', 'weights.internet=a=b']) == {'nodes': '50', 'weights.internet': 'a=b'}
+    for bad in ('bogus', '=1'):
+        with pytest.raises(ValueError):
+            parse_overrides([bad])
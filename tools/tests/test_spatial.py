@@ -0,0 +1,91 @@
+import json
+import random
+
+import pytest
+
+from rescuenet_tools.packets import PRIORITY_CRITICAL, TYPE_SOS, MeshPacket
+from rescuenet_tools.routing import NodeInfo
+from rescuenet_tools.spatial import GeoIndex, LinearIndex, SpatialFeed, distance_m, scatter
+
+
+def _same(grid, linear, lat, lng, k, radius, where=None):
+    a = grid.nearest(lat, lng, k, where)
+    b = linear.nearest(lat, lng, k, where)
+    assert [round(d, 3) for d, _ in a] == [round(d, 3) for d, _ in b]
+    assert {i for _, i in grid.within(lat, lng, radius, where)} == {i for _, i in linear.within(lat, lng, radius, where)}
+
+
+def test_grid_matches_the_linear_scan_through_moves_and_removes():
+    rng = random.Random(3)
+    grid, linear = GeoIndex(cell_m=200), LinearIndex()
+    points = scatter(3000, spread_km=10, seed=3)
+    for pid, lat, lng in points:
+        grid.upsert(pid, lat, lng, int(pid[1:]) % 2)
+        linear.upsert(pid, lat, lng, int(pid[1:]) % 2)
+    for pid, lat, lng in rng.sample(points, 500):
+        moved = (lat + rng.gauss(0, 0.01), lng + rng.gauss(0, 0.01))
+        assert not grid.upsert(pid, *moved, int(pid[1:]) % 2)
+        linear.upsert(pid, *moved, int(pid[1:]) % 2)
+    for pid, _, _ in rng.sample(points, 300):
+        assert grid.remove(pid) == linear.remove(pid)
+    assert len(grid) == len(linear) == 2700 and not grid.remove('missing')
+
+    even = lambda point_id, value: value == 0  # noqa: E731
+    for _, lat, lng in rng.sample(points, 25):
+        _same(grid, linear, lat, lng, 10, 400)
+        _same(grid, linear, lat, lng, 5, 1500, even)
+    _same(grid, linear, 0.0, 0.0, 3, 10)  # far from every point
+
+
+def test_sparse_points_match_on_every_grid_level():
+    rng = random.Random(5)
+    grid, linear = GeoIndex(cell_m=100), LinearIndex()
+    points = scatter(2000, spread_km=4000, seed=5)
+    for pid, lat, lng in points:
+        grid.upsert(pid, lat, lng)
+        linear.upsert(pid, lat, lng)
+    for _, lat, lng in rng.sample(points, 15):
+        _same(grid, linear, lat, lng, 5, 150_000)
+        _same(grid, linear, lat, lng, 1, 2_000_000)
+
+
+def test_antimeridian_and_poles():
+    grid, linear = GeoIndex(cell_m=1000, ref_lat=0.0), LinearIndex()
+    for pid, lat, lng in (('east', 10.0, 179.999), ('west', 10.0, -179.999), ('pole', 89.999, 45.0),
+                          ('pole2', 89.999, -135.0), ('far', 10.0, 170.0)):
+        grid.upsert(pid, lat, lng)
+        linear.upsert(pid, lat, lng)
+    assert [i for _, i in grid.within(10.0, 179.9995, 1000)] == ['east', 'west']
+    assert {i for _, i in grid.within(89.9995, 0.0, 500)} == {'pole', 'pole2'}
+    for lat, lng in ((10.0, -179.9995), (89.9, 90.0), (-89.0, 0.0)):
+        _same(grid, linear, lat, lng, 3, 5000)
+    assert distance_m(0, 0, 0, 1) == pytest.approx(111_319.49, abs=0.01)
+    with pytest.raises(ValueError):
+        grid.upsert('x', 91.0, 0.0)
+
+
+def _sos(packet_id, sender, lat, lng, timestamp, active=True):
+    payload = json.dumps({'sosId': packet_id, 'senderId': sender, 'latitude': lat, 'longitude': lng,
+                          'timestamp': timestamp, 'isActive': active})
+    return MeshPacket(packet_id, sender, payload, (sender,), 20, timestamp, PRIORITY_CRITICAL, TYPE_SOS)
+
+
+def test_feed_tracks_senders_and_answers_unassigned_queries():
+    feed = SpatialFeed()
+    assert feed.on_packet(_sos('1', 'a', 17.470, 78.720, 1000).to_json_string())
+    assert feed.on_packet(_sos('2', 'b', 17.480, 78.720, 1000))
+    assert feed.on_packet(_sos('3', 'a', 17.471, 78.720, 2000))  # a moved
+    assert not feed.on_packet(_sos('1', 'a', 17.470, 78.720, 1000))  # late copy of the old position
+    assert not feed.on_packet(_sos('4', 'c', 0, 0, 1000))  # no fix
+    assert feed.on_node(NodeInfo('r1', latitude=17.4705, longitude=78.720, last_seen=3.0))
+
+    assert [k for _, k in feed.nearest_unassigned(17.470, 78.720, 5)] == ['sos:a', 'sos:b']
+    assert feed.index.get('sos:a')[0] == pytest.approx(17.471)
+    feed.assign('sos:a', 'r1')
+    assert [k for _, k in feed.nearest_unassigned(17.470, 78.720, 5)] == ['sos:b']
+    assert feed.on_packet(_sos('5', 'a', 17.471, 78.720, 2500))
+    assert feed.index.get('sos:a')[2].assigned_to == 'r1'  # a newer SOS keeps the assignment
+    assert [k for _, k in feed.sos_within(17.470, 78.720, 200)] == ['sos:a']
+
+    assert feed.on_packet(_sos('6', 'b', 17.480, 78.720, 3000, active=False))
+    assert 'sos:b' not in feed.index and (feed.updates, feed.removed, feed.skipped) == (5, 1, 2)
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from rescuenet_tools.colfile import ColumnWriter, read_file
+from rescuenet_tools.sweep import Range, SweepSpec, plan, run_sweep, summarize_points
+
+SPEC = SweepSpec(
+    grid={'relay_interval_s': (5, 20)},
+    ranges={'weights.internet': Range(30, 70)},
+    samples=2,
+    replicates=2,
+    fixed={'nodes': 120, 'sos_count': 8, 'duration_s': 300},
+)
+
+
+def test_columnar_round_trip_and_torn_tail(tmp_path):
+    path = str(tmp_path / 'c.rncol')
+    with ColumnWriter(path) as writer:
+        writer.write_metadata({'k': 1})
+        writer.write_group({'a': [1, 2], 'b': [0.5, float('inf')], 's': ['x', None]})
+        writer.write_group({'a': [3], 'c': [True]})
+    with open(path, 'ab') as f:
+        f.write(b'G\x00\x00\x01\x00garbage')
+
+    metadata, columns = read_file(path)
+    assert metadata == [{'k': 1}]
+    assert columns == {'a': [1, 2, 3], 'b': [0.5, float('inf'), None],
+                       's': ['x', None, None], 'c': [None, None, 1]}
+
+    with ColumnWriter(path) as writer:
+        assert writer.recovered_bytes == 12
+        writer.write_group({'a': [4]})
+    assert read_file(path)[1]['a'] == [1, 2, 3, 4]
+
+
+def test_plan_is_deterministic():
+    first, second = plan(SPEC), plan(SPEC)
+    assert first == second
+    assert [r.run for r in first] == list(range(8))
+    # Replicate r shares its seed across points; replicates differ.
+    assert {r.seed for r in first if r.replicate == 0} == {first[0].seed}
+    assert first[0].seed != first[1].seed
+    assert len({tuple(r.params.items()) for r in first}) == 4
+
+
+def test_sweep_resumes_and_matches_across_workers(tmp_path):
+    serial, parallel = str(tmp_path / 'serial.rncol'), str(tmp_path / 'parallel.rncol')
+    assert run_sweep(SPEC, serial, jobs=1, flush_rows=3) == (8, 0)
+    assert run_sweep(SPEC, parallel, jobs=2) == (8, 0)
+
+    def by_run(path):
+        columns = read_file(path)[1]
+        columns.pop('wall_s')
+        # NaN != NaN, so compare metrics of runs with nothing delivered as None.
+        return sorted(tuple(None if v != v else v for v in row) for row in zip(*columns.values()))
+
+    assert by_run(serial) == by_run(parallel)
+
+    # Chop into the last row group: the runs in it are redone, nothing else.
+    os.truncate(serial, os.path.getsize(serial) - 5)
+    ran, skipped = run_sweep(SPEC, serial, jobs=1)
+    assert ran + skipped == 8 and 0 < ran < 8
+    assert by_run(serial) == by_run(parallel)
+
+    points = summarize_points(read_file(serial)[1], SPEC.parameters)
+    assert [p['runs'] for p in points] == [2, 2, 2, 2]
+    assert all(0 <= p['delivery_ratio'] <= 1 for p in points)
+
+    with pytest.raises(ValueError):
+        run_sweep(SweepSpec(replicates=3), serial, jobs=1)
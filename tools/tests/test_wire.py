@@ -0,0 +1,174 @@
+import asyncio
+import json
+import struct
+
+from rescuenet_tools.wire import (
+    ACK,
+    HEADER,
+    MAX_PACKET_SIZE,
+    NAK,
+    MeshServer,
+    crc32,
+    encode_frame,
+    send_packet,
+    send_session,
+)
+
+PACKET = json.dumps({
+    'id': '1771668982192-510407117',
+    'originatorId': 'f69451d3-ad2e-49dd-9f67-0a69abf6df5e',
+    'payload': '{"sosId":"52609568"}',
+    'trace': ['f69451d3-ad2e-49dd-9f67-0a69abf6df5e'],
+    'ttl': 20,
+    'timestamp': 1771668982192,
+    'priority': 3,
+    'packetType': 'sos',
+})
+
+
+async def _raw_exchange(port, data):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(data)
+    writer.write_eof()
+    await writer.drain()
+    reply = await reader.read()
+    writer.close()
+    return reply
+
+
+def test_header_matches_java_bytebuffer():
+    # ByteBuffer.putInt(size).putInt(crc.value.toInt()): the CRC of b'a'
+    # (0xE8B7BE43) goes out as a negative Java Int.
+    assert crc32(b'a') == 0xE8B7BE43
+    assert encode_frame('a') == struct.pack('>ii', 1, 0xE8B7BE43 - (1 << 32)) + b'a'
+
+
+def test_ack_then_delivery():
+    received = []
+
+    async def run():
+        async with MeshServer(lambda text, peer: received.append(text),
+                              host='127.0.0.1', port=0) as server:
+            assert await send_packet('127.0.0.1', PACKET, server.port)
+            await asyncio.sleep(0.01)
+            return server.stats
+
+    stats = asyncio.run(run())
+    assert received == [PACKET]
+    assert stats.acked == 1
+
+
+def test_nak_for_bad_size_and_crc():
+    async def run():
+        async with MeshServer(host='127.0.0.1', port=0) as server:
+            body = PACKET.encode()
+            replies = [
+                await _raw_exchange(server.port, HEADER.pack(0, 0)),
+                await _raw_exchange(server.port, HEADER.pack(-5, 0)),
+                await _raw_exchange(server.port, HEADER.pack(MAX_PACKET_SIZE + 1, 0)),
+                await _raw_exchange(server.port, HEADER.pack(len(body), crc32(body) ^ 1) + body),
+                await _raw_exchange(server.port, HEADER.pack(MAX_PACKET_SIZE, 0)[:6]),
+            ]
+            await asyncio.sleep(0.01)
+            return replies, server.stats
+
+    replies, stats = asyncio.run(run())
+    assert replies[:4] == [bytes([NAK])] * 4
+    assert replies[4] == b''  # truncated header: closed without a reply
+    assert (stats.nak_size, stats.nak_crc, stats.truncated) == (3, 1, 1)
+
+
+def test_many_concurrent_senders():
+    async def run():
+        async with MeshServer(host='127.0.0.1', port=0) as server:
+            results = await asyncio.gather(*(
+                send_packet('127.0.0.1', PACKET.replace('1771668982192', str(i)), server.port)
+                for i in range(100)
+            ))
+            return results, server.stats
+
+    results, stats = asyncio.run(run())
+    assert all(results)
+    assert stats.acked == 100
+
+
+def _numbered(n):
+    return [PACKET.replace('1771668982192', str(i)) for i in range(n)]
+
+
+def test_session_carries_many_frames_with_per_frame_replies():
+    received, marks = [], []
+
+    async def run():
+        async with MeshServer(lambda text, peer: received.append(text), host='127.0.0.1', port=0,
+                              sessions=True) as server:
+            result = await send_session('127.0.0.1', _numbered(30), server.port, window=4,
+                                        on_result=lambda i, ok: marks.append((i, ok)))
+            # A CRC NAK keeps the session going; a clean close ends it.
+            body = PACKET.encode()
+            bad = HEADER.pack(len(body), crc32(body) ^ 1) + body
+            replies = await _raw_exchange(server.port, bad + encode_frame(body))
+            await asyncio.sleep(0.01)
+            return result, replies, server.stats
+
+    result, replies, stats = asyncio.run(run())
+    assert result.outcomes == ['ack'] * 30 and result.connections == 1
+    assert marks == [(i, True) for i in range(30)]
+    assert received == _numbered(30) + [PACKET]
+    assert replies == bytes([NAK, ACK])
+    assert (stats.connections, stats.acked, stats.nak_crc, stats.sessions_closed) == (2, 31, 1, 2)
+
+
+def test_session_falls_back_to_one_connection_per_packet():
+    async def run():
+        async with MeshServer(host='127.0.0.1', port=0) as server:
+            result = await send_session('127.0.0.1', _numbered(5), server.port, window=8)
+            await asyncio.sleep(0.01)
+            return result, server.stats
+
+    result, stats = asyncio.run(run())
+    assert result.outcomes == ['ack'] * 5
+    assert result.connections == 5 and stats.acked == 5
+
+
+def test_each_new_connection_starts_with_one_frame_in_flight():
+    batches = []
+
+    async def handle(reader, writer):
+        for _ in range(3):  # answers three frames, then closes the session
+            try:
+                size, _ = HEADER.unpack(await reader.readexactly(HEADER.size))
+                await reader.readexactly(size)
+            except asyncio.IncompleteReadError:
+                break
+            writer.write(bytes([ACK]))
+            await writer.drain()
+        writer.close()
+
+    async def opener(host, port):
+        # Counts the frames written on each connection before its first reply.
+        reader, writer = await asyncio.open_connection(host, port)
+        batches.append(0)
+        write, readexactly = writer.write, reader.readexactly
+
+        def counting_write(data):
+            batches[-1] += 1
+            write(data)
+
+        async def first_reply(n):
+            writer.write = write
+            reader.readexactly = readexactly
+            return await readexactly(n)
+
+        writer.write, reader.readexactly = counting_write, first_reply
+        return reader, writer
+
+    async def run():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        async with server:
+            return await send_session('127.0.0.1', _numbered(9), server.sockets[0].getsockname()[1],
+                                      window=4, open_connection=opener)
+
+    result = asyncio.run(run())
+    assert result.outcomes == ['ack'] * 9 and result.connections == 3
+    assert batches == [1, 1, 1]